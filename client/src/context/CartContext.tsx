@@ -6,6 +6,7 @@ interface CartContextType {
   addToCart: (product: Product) => void;
   removeFromCart: (productId: string) => void;
   clearCart: () => void;
+  updatePrices: (prices: Record<string, number>) => void;
   cartTotal: number;
 }
 
@@ -32,10 +33,16 @@ export const CartProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
 
   const clearCart = () => setCart([]);
 
+  const updatePrices = (prices: Record<string, number>) => {
+    setCart(prev => prev.map(item =>
+      item._id in prices ? { ...item, price: prices[item._id] } : item
+    ));
+  };
+
   const cartTotal = cart.reduce((total, item) => total + item.price * item.quantity, 0);
 
   return (
-    <CartContext.Provider value={{ cart, addToCart, removeFromCart, clearCart, cartTotal }}>
+    <CartContext.Provider value={{ cart, addToCart, removeFromCart, clearCart, updatePrices, cartTotal }}>
       {children}
     </CartContext.Provider>
   );
@@ -5,25 +5,73 @@ import { FaTrash, FaCheckCircle } from 'react-icons/fa';
 import api from '../services/api';
 import { Link } from 'react-router-dom';
 
+// One rejected order line, as returned by the backend
+interface OrderLineError {
+  item: number;
+  product_id: string | null;
+  error: string;
+  price?: number;
+  current_price?: number;
+}
+
+interface PriceChange {
+  _id: string;
+  name: string;
+  price: number;
+  currentPrice: number;
+}
+
 const Checkout: React.FC = () => {
-  const { cart, removeFromCart, cartTotal, clearCart } = useCart();
+  const { cart, removeFromCart, cartTotal, clearCart, updatePrices } = useCart();
   const { user } = useAuth();
   const [formData, setFormData] = useState({ name: '', address: '', email: user?.email || '' });
   const [ordered, setOrdered] = useState(false);
+  const [error, setError] = useState('');
+  const [priceChanges, setPriceChanges] = useState<PriceChange[]>([]);
+  const [loading, setLoading] = useState(false);
+
+  // Price changes still waiting for confirmation, for the items left in the cart
+  const pendingChanges = priceChanges.filter(change => cart.some(item => item._id === change._id));
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
+    setError('');
+    setLoading(true);
     try {
-      // Send order to Django backend
+      // Send order to Django backend; the cart prices are the ones the user confirmed
       await api.post('/orders', { 
         items: cart, 
         shippingDetails: formData,
         userEmail: user?.email || formData.email
       });
+      setPriceChanges([]);
       setOrdered(true);
       clearCart();
-    } catch (error) {
-      alert('Failed to place order');
+    } catch (err: any) {
+      const lines: OrderLineError[] = err.response?.status === 409 ? err.response.data?.items || [] : [];
+      const changed = lines.filter(line => line.product_id && line.current_price !== undefined);
+      const rejected = lines.filter(line => !changed.includes(line));
+
+      if (changed.length > 0) {
+        // The cart showed an old price: take the current one and ask the user to confirm it
+        setPriceChanges(changed.map(line => ({
+          _id: line.product_id as string,
+          name: cart.find(item => item._id === line.product_id)?.name || (line.product_id as string),
+          price: line.price ?? 0,
+          currentPrice: line.current_price as number,
+        })));
+        updatePrices(Object.fromEntries(changed.map(line => [line.product_id as string, line.current_price as number])));
+      }
+      if (rejected.length > 0) {
+        setError(rejected.map(line => {
+          const name = cart.find(item => item._id === line.product_id)?.name || line.product_id;
+          return name ? `${name}: ${line.error}` : line.error;
+        }).join('; '));
+      } else if (changed.length === 0) {
+        setError(err.response?.data?.message || err.response?.data?.error || 'Failed to place order');
+      }
+    } finally {
+      setLoading(false);
     }
   };
 
@@ -98,6 +146,28 @@ const Checkout: React.FC = () => {
               </li>
             </ul>
 
+            {/* Error Alert */}
+            {error && (
+              <div className="alert alert-danger alert-dismissible fade show" role="alert">
+                {error}
+                <button type="button" className="btn-close" onClick={() => setError('')}></button>
+              </div>
+            )}
+
+            {/* Prices that changed since the products were added to the cart */}
+            {pendingChanges.length > 0 && (
+              <div className="alert alert-warning" role="alert">
+                <strong>Some prices have changed.</strong> Please confirm the new prices to place your order.
+                <ul className="mb-0 mt-2">
+                  {pendingChanges.map(change => (
+                    <li key={change._id}>
+                      {change.name}: <del>KES {(change.price / 100).toFixed(2)}</del> KES {(change.currentPrice / 100).toFixed(2)}
+                    </li>
+                  ))}
+                </ul>
+              </div>
+            )}
+
             <h5 className="mb-3">Shipping Details</h5>
             <form onSubmit={handleSubmit}>
               <div className="mb-3">
@@ -130,7 +200,9 @@ const Checkout: React.FC = () => {
                   onChange={e => setFormData({...formData, address: e.target.value})}
                 ></textarea>
               </div>
-              <button className="w-100 btn btn-primary btn-lg" type="submit">Place Order</button>
+              <button className="w-100 btn btn-primary btn-lg" type="submit" disabled={loading}>
+                {loading ? 'Placing Order...' : pendingChanges.length > 0 ? 'Confirm New Prices & Place Order' : 'Place Order'}
+              </button>
             </form>
           </div>
         </div>
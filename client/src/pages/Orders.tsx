@@ -29,24 +29,40 @@ const Orders = () => {
   const { user } = useAuth();
   const [orders, setOrders] = useState<Order[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextPageToken, setNextPageToken] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchOrders();
   }, []);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (pageToken?: string) => {
     try {
       if (!user?.email) {
         setLoading(false);
         return;
       }
       
-      const response = await api.get(`/orders/user?email=${encodeURIComponent(user.email)}`);
-      setOrders(response.data);
-      setLoading(false);
+      // Order history is paged newest first; next_page_token fetches older orders
+      const params: Record<string, string> = { email: user.email };
+      if (pageToken) {
+        params.page_token = pageToken;
+      }
+      const response = await api.get('/orders/user', { params });
+      setOrders(previous => pageToken ? [...previous, ...response.data.results] : response.data.results);
+      setNextPageToken(response.data.next_page_token);
     } catch (error) {
       console.error('Error fetching orders:', error);
+    } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  const loadMore = () => {
+    if (nextPageToken) {
+      setLoadingMore(true);
+      fetchOrders(nextPageToken);
     }
   };
 
@@ -153,6 +169,14 @@ const Orders = () => {
           </div>
         </div>
       ))}
+
+      {nextPageToken && (
+        <div className="text-center mb-4">
+          <button className="btn btn-outline-primary" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load older orders'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -4,6 +4,7 @@ Django settings for ecommerce project.
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -80,6 +81,23 @@ DATABASES = {
 CASSANDRA_HOSTS = os.getenv('CASSANDRA_HOSTS', '127.0.0.1').split(',')
 CASSANDRA_PORT = int(os.getenv('CASSANDRA_PORT', '9042'))
 CASSANDRA_KEYSPACE = os.getenv('CASSANDRA_KEYSPACE', 'ecommerce')
+# Rows fetched per round trip when scanning the products table
+CASSANDRA_FETCH_SIZE = int(os.getenv('CASSANDRA_FETCH_SIZE', '500'))
+# Data center whose nodes are queried first; empty to use the contact points' data center
+CASSANDRA_LOCAL_DC = os.getenv('CASSANDRA_LOCAL_DC', '')
+# Native protocol version; empty to negotiate the highest version both sides support
+CASSANDRA_PROTOCOL_VERSION = int(os.getenv('CASSANDRA_PROTOCOL_VERSION', '0')) or None
+CASSANDRA_CONNECT_TIMEOUT = float(os.getenv('CASSANDRA_CONNECT_TIMEOUT', '5'))
+CASSANDRA_REQUEST_TIMEOUT = float(os.getenv('CASSANDRA_REQUEST_TIMEOUT', '10'))
+# Threads handling driver I/O callbacks
+CASSANDRA_EXECUTOR_THREADS = int(os.getenv('CASSANDRA_EXECUTOR_THREADS', '2'))
+# Seconds before a read is retried on another replica (0 disables speculative execution)
+CASSANDRA_SPECULATIVE_DELAY = float(os.getenv('CASSANDRA_SPECULATIVE_DELAY', '0'))
+CASSANDRA_SPECULATIVE_ATTEMPTS = int(os.getenv('CASSANDRA_SPECULATIVE_ATTEMPTS', '2'))
+# Queries kept in flight by one fan-out read such as a multi-get
+CASSANDRA_FANOUT_CONCURRENCY = int(os.getenv('CASSANDRA_FANOUT_CONCURRENCY', '32'))
+# Attempts of a lightweight transaction (stock reservation) that loses to concurrent writes
+CASSANDRA_LWT_RETRIES = int(os.getenv('CASSANDRA_LWT_RETRIES', '20'))
 
 # For DataStax Astra (Cloud Cassandra)
 ASTRA_DB_ID = os.getenv('ASTRA_DB_ID', '')
@@ -91,9 +109,101 @@ ASTRA_TOKEN = os.getenv('ASTRA_TOKEN', '')
 ASTRA_SECURE_BUNDLE_PATH = os.getenv('ASTRA_SECURE_BUNDLE_PATH', '')
 ASTRA_API_ENDPOINT = os.getenv('ASTRA_API_ENDPOINT', '')
 
+# Connect to the databases and load the product cache when a gunicorn
+# worker starts instead of on its first request
+CONNECTION_WARM_UP = os.getenv('CONNECTION_WARM_UP', 'true').lower() == 'true'
+
 # Mock database setting
 USE_MOCK_DB = os.getenv('USE_MOCK_DB', 'false').lower() == 'true'
 
+# Product storage backend: 'mock', 'astra' or 'cassandra', loaded once at
+# startup. Defaults to mock with USE_MOCK_DB, to Astra when its Data API
+# credentials are set and to Cassandra otherwise.
+PRODUCT_BACKEND = os.getenv('PRODUCT_BACKEND') or (
+    'mock' if USE_MOCK_DB else 'astra' if ASTRA_TOKEN and ASTRA_API_ENDPOINT else 'cassandra'
+)
+
+# Product cache shared between worker processes: 'local' keeps the catalog
+# per process, 'file' shares one snapshot and generation counter per host
+PRODUCT_CACHE_BACKEND = os.getenv('PRODUCT_CACHE_BACKEND', 'local')
+PRODUCT_CACHE_DIR = os.getenv(
+    'PRODUCT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ecommerce-product-cache')
+)
+# Writes patch the cached catalog in place; a full reload from the database
+# happens when the last one is older than this many seconds (0 disables)
+PRODUCT_CACHE_TTL = int(os.getenv('PRODUCT_CACHE_TTL', '3600'))
+# Writes are shared as a log of per-product changes that other workers
+# apply to their own copy; after this many the snapshot is stored in full
+PRODUCT_CACHE_MAX_CHANGES = int(os.getenv('PRODUCT_CACHE_MAX_CHANGES', '256'))
+# A stale catalog keeps being served for up to this many seconds while a
+# background thread reloads it (0 makes readers wait for the reload)
+PRODUCT_CACHE_MAX_STALENESS = int(os.getenv('PRODUCT_CACHE_MAX_STALENESS', '30'))
+PRODUCT_CACHE_BACKGROUND_REFRESH = os.getenv('PRODUCT_CACHE_BACKGROUND_REFRESH', 'true').lower() == 'true'
+
+# Image URLs are checked concurrently with one deadline per product, and
+# results are cached per URL (failures for a shorter time)
+IMAGE_VALIDATION_WORKERS = int(os.getenv('IMAGE_VALIDATION_WORKERS', '8'))
+IMAGE_VALIDATION_TIMEOUT = float(os.getenv('IMAGE_VALIDATION_TIMEOUT', '5'))
+IMAGE_VALIDATION_DEADLINE = float(os.getenv('IMAGE_VALIDATION_DEADLINE', '10'))
+IMAGE_VALIDATION_CACHE_TTL = int(os.getenv('IMAGE_VALIDATION_CACHE_TTL', '3600'))
+IMAGE_VALIDATION_FAILURE_TTL = int(os.getenv('IMAGE_VALIDATION_FAILURE_TTL', '60'))
+# 'deferred' saves Astra products at once with images_status 'pending' and
+# validates their images on a background pool; listings can hide products
+# whose images turned out to be broken
+IMAGE_VALIDATION_MODE = os.getenv('IMAGE_VALIDATION_MODE', 'sync')
+IMAGE_VALIDATION_BACKGROUND_WORKERS = int(os.getenv('IMAGE_VALIDATION_BACKGROUND_WORKERS', '2'))
+IMAGE_VALIDATION_HIDE_BROKEN = os.getenv('IMAGE_VALIDATION_HIDE_BROKEN', 'false').lower() == 'true'
+
+# Bulk import: rows validated and written together, and the number of
+# concurrent inserts in flight on Cassandra
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '100'))
+BULK_WRITE_CONCURRENCY = int(os.getenv('BULK_WRITE_CONCURRENCY', '32'))
+
+# Milliseconds allowed for the database read of a multi-get's cache misses,
+# which order pricing waits on during checkout
+CATALOG_LOOKUP_TIMEOUT_MS = int(os.getenv('CATALOG_LOOKUP_TIMEOUT_MS', '2000'))
+
+# Default page size of token-paged product listings (page_size/page_token)
+PRODUCT_PAGE_SIZE = int(os.getenv('PRODUCT_PAGE_SIZE', '50'))
+# Orders per page of a user's order history
+ORDER_PAGE_SIZE = int(os.getenv('ORDER_PAGE_SIZE', '20'))
+
+# 'sync' writes each order to the database within the request; 'journal'
+# acknowledges it from a local SQLite journal (fsynced) and writes it behind
+ORDER_WRITE_MODE = os.getenv('ORDER_WRITE_MODE', 'sync')
+ORDER_JOURNAL_PATH = os.getenv(
+    'ORDER_JOURNAL_PATH', os.path.join(tempfile.gettempdir(), 'ecommerce-order-journal.sqlite3')
+)
+ORDER_JOURNAL_BATCH_SIZE = int(os.getenv('ORDER_JOURNAL_BATCH_SIZE', '100'))
+# Seconds the flusher waits for new orders when the journal is empty
+ORDER_JOURNAL_FLUSH_INTERVAL = float(os.getenv('ORDER_JOURNAL_FLUSH_INTERVAL', '0.5'))
+
+# Order analytics: counters per product, brand, day and status, added to the
+# order_rollups collection every ANALYTICS_FLUSH_INTERVAL seconds and served
+# from a snapshot at most ANALYTICS_CACHE_TTL seconds old
+ANALYTICS_ENABLED = os.getenv('ANALYTICS_ENABLED', 'true').lower() == 'true'
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', '10'))
+ANALYTICS_CACHE_TTL = float(os.getenv('ANALYTICS_CACHE_TTL', '30'))
+
+# Recommendations: build_recommendations keeps the RECOMMENDATIONS_TOP_K
+# products most often bought with each product; workers reload them every
+# RECOMMENDATIONS_CACHE_TTL seconds
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', '10'))
+RECOMMENDATIONS_CACHE_TTL = float(os.getenv('RECOMMENDATIONS_CACHE_TTL', '300'))
+
+# Product response encoding: 'fast' writes product JSON directly,
+# 'drf' runs ProductSerializer. Overrides select an encoder per view name.
+PRODUCT_ENCODER = os.getenv('PRODUCT_ENCODER', 'fast')
+PRODUCT_ENCODER_OVERRIDES = {}
+
+# Encoded GET responses for products and filter options are cached until the
+# catalog version changes, and served with an ETag (304 on If-None-Match)
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+RESPONSE_CACHE_COMPRESSION = os.getenv('RESPONSE_CACHE_COMPRESSION', 'true').lower() == 'true'
+RESPONSE_CACHE_MIN_COMPRESS_SIZE = 1024
+RESPONSE_CACHE_CONTROL = os.getenv('RESPONSE_CACHE_CONTROL', 'no-cache')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
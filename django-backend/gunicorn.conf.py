@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for the backend.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8082')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Long enough for a worker to load the product catalog on start
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# Import the app once in the master; database connections are still opened
+# per worker, after the fork
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def post_worker_init(worker):
+    """Connect and load the product cache before the worker accepts requests"""
+    from django.conf import settings
+
+    if settings.CONNECTION_WARM_UP:
+        from products.connections import warm_up
+        warm_up()
@@ -0,0 +1,272 @@
+"""
+Order analytics rollups.
+
+Every order created adds to running counters per product (SKU), brand, day
+and status. Each worker process collects these deltas in memory and a
+background thread adds them to the order_rollups collection every
+ANALYTICS_FLUSH_INTERVAL seconds with upserting $inc updates, so the
+counters of all workers sum up in the database. The analytics endpoints
+read a per-process snapshot of the rollups, reloaded every
+ANALYTICS_CACHE_TTL seconds and kept sorted, so answering a request does
+not depend on how many orders there are.
+
+The rebuild_order_rollups command recomputes every counter from the raw
+orders in one streaming pass.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Dimensions rolled up, in the order the endpoint lists them
+DIMENSIONS = ('products', 'brands', 'daily', 'status')
+
+# Counters kept for each rollup
+COUNTERS = ('orders', 'units', 'revenue')
+
+# How each dimension's rollups are ranked when served
+RANKING = {
+    'products': lambda rollup: (-rollup['units'], -rollup['revenue'], rollup['key']),
+    'brands': lambda rollup: (-rollup['revenue'], rollup['key']),
+    'daily': lambda rollup: rollup['key'],
+    'status': lambda rollup: (-rollup['orders'], rollup['key']),
+}
+
+
+def rollup_id(dimension, key):
+    """Document ID of a rollup in the summary collection"""
+    return f"{dimension}:{key}"
+
+
+def merge_delta(deltas, key, delta):
+    """Add a rollup delta to the deltas collected under key"""
+    entry = deltas.setdefault(key, {'counters': dict.fromkeys(COUNTERS, 0), 'labels': {}})
+    for counter, value in delta['counters'].items():
+        entry['counters'][counter] += value
+    entry['labels'].update(delta['labels'])
+
+
+def order_deltas(order):
+    """
+    Compute the counter increments an order contributes.
+    Args:
+        order: Order document with items, total, status and created_at
+    Returns:
+        Dictionary mapping (dimension, key) to {'counters': {...}, 'labels': {...}}
+    """
+    deltas = {}
+
+    def add(dimension, key, orders=0, units=0, revenue=0, **labels):
+        if key:
+            labels = {name: value for name, value in labels.items() if value is not None}
+            merge_delta(deltas, (dimension, key), {
+                'counters': {'orders': orders, 'units': units, 'revenue': revenue}, 'labels': labels,
+            })
+
+    units = 0
+    for item in order.get('items') or []:
+        quantity = item.get('quantity') or 0
+        revenue = item.get('line_total', (item.get('price') or 0) * quantity)
+        units += quantity
+        add('products', item.get('_id'), units=quantity, revenue=revenue,
+            name=item.get('name'), brand=item.get('brand'))
+        add('brands', item.get('brand'), units=quantity, revenue=revenue)
+
+    # An order counts once per product and brand it contains
+    for entry in deltas.values():
+        entry['counters']['orders'] = 1
+
+    add('daily', (order.get('created_at') or '')[:10], orders=1, units=units, revenue=order.get('total') or 0)
+    add('status', order.get('status'), orders=1, units=units, revenue=order.get('total') or 0)
+    return deltas
+
+
+class OrderRollups:
+    """Per-process collector of rollup deltas and cache of the stored rollups"""
+
+    def __init__(self, collection, flush_interval=10, cache_ttl=30):
+        """
+        Args:
+            collection: Callable returning the summary collection
+            flush_interval: Seconds between flushes of the collected deltas
+            cache_ttl: Seconds a snapshot of the stored rollups is served
+        """
+        self._collection = collection
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_at = None
+        self.last_error = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_loaded_at = 0
+        self._pid = None
+
+    def record(self, order):
+        """Add an order's contribution to the pending deltas"""
+        deltas = order_deltas(order)
+        self.start()
+        with self._lock:
+            for key, delta in deltas.items():
+                merge_delta(self._pending, key, delta)
+
+    def flush(self):
+        """
+        Add the pending deltas to the summary collection.
+        Returns:
+            Number of rollups updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        collection = self._collection()
+        written = 0
+        try:
+            for (dimension, key), delta in pending.items():
+                collection.update_one(
+                    {"_id": rollup_id(dimension, key)},
+                    {
+                        "$inc": delta['counters'],
+                        "$set": {'dimension': dimension, 'key': key, **delta['labels']},
+                    },
+                    upsert=True
+                )
+                written += 1
+        except Exception:
+            # Put back what was not written so the next flush retries it
+            with self._lock:
+                for rollup_key, delta in list(pending.items())[written:]:
+                    merge_delta(self._pending, rollup_key, delta)
+            raise
+
+        self.flushes += 1
+        self.last_flush_at = time.time()
+        return written
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Flushing order rollups failed: {str(e)}")
+
+    def start(self):
+        """Start this process's flush thread unless it is running"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Deltas collected by the parent process are the parent's to flush
+                    self._pending = {}
+                    threading.Thread(target=self._run, name='order-rollups-flusher', daemon=True).start()
+                    if self._pid is None:
+                        atexit.register(self._flush_at_exit)
+                    self._pid = os.getpid()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Flushing order rollups at exit failed: {str(e)}")
+
+    def _load(self):
+        """Load every stored rollup, ranked per dimension"""
+        snapshot = {dimension: [] for dimension in DIMENSIONS}
+        for doc in self._collection().find({}):
+            dimension = doc.get('dimension')
+            if dimension not in snapshot:
+                continue
+            rollup = {name: value for name, value in doc.items() if name not in ('_id', 'dimension')}
+            for counter in COUNTERS:
+                rollup[counter] = rollup.get(counter) or 0
+            snapshot[dimension].append(rollup)
+        for dimension, rollups in snapshot.items():
+            rollups.sort(key=RANKING[dimension])
+        return snapshot
+
+    def get(self, dimension):
+        """
+        Return the ranked rollups of a dimension from the cached snapshot.
+        Raises:
+            KeyError: If the dimension is unknown
+        """
+        if dimension not in DIMENSIONS:
+            raise KeyError(dimension)
+        if self._snapshot is None or time.time() - self._snapshot_loaded_at > self.cache_ttl:
+            with self._lock:
+                if self._snapshot is None or time.time() - self._snapshot_loaded_at > self.cache_ttl:
+                    self._snapshot = self._load()
+                    self._snapshot_loaded_at = time.time()
+        return self._snapshot[dimension]
+
+    def invalidate(self):
+        """Reload the snapshot on the next read"""
+        self._snapshot = None
+
+    def stats(self):
+        """Return flush counters for monitoring"""
+        return {
+            'pending_rollups': len(self._pending),
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'last_flush_at': self.last_flush_at,
+            'last_error': self.last_error,
+            'snapshot_age_seconds': (
+                round(time.time() - self._snapshot_loaded_at, 3) if self._snapshot is not None else None
+            ),
+        }
+
+
+def rebuild(orders, collection):
+    """
+    Recompute every rollup from the raw orders.
+    Args:
+        orders: Iterable of order documents, consumed once
+        collection: Summary collection to replace the rollups in
+    Returns:
+        Tuple of (orders read, rollups written)
+    """
+    totals = {}
+    count = 0
+    for order in orders:
+        count += 1
+        for key, delta in order_deltas(order).items():
+            merge_delta(totals, key, delta)
+
+    documents = [
+        {'_id': rollup_id(dimension, key), 'dimension': dimension, 'key': key, **total['labels'], **total['counters']}
+        for (dimension, key), total in totals.items()
+    ]
+    collection.delete_many({})
+    if documents:
+        collection.insert_many(documents, ordered=False)
+    logger.info(f"Rebuilt {len(documents)} order rollups from {count} orders")
+    return count, len(documents)
+
+
+def analytics_enabled():
+    """Whether orders are rolled up as they are created"""
+    return getattr(settings, 'ANALYTICS_ENABLED', True)
+
+
+def _rollup_collection():
+    from .order_models import AstraOrderDB
+    return AstraOrderDB.get_rollup_collection()
+
+
+order_rollups = OrderRollups(
+    _rollup_collection,
+    flush_interval=getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 10),
+    cache_ttl=getattr(settings, 'ANALYTICS_CACHE_TTL', 30),
+)
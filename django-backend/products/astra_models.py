@@ -2,24 +2,41 @@
 Product models using AstraPy (Data API) for Astra
 """
 from astrapy import DataAPIClient
+from astrapy.constants import ReturnDocument
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-import requests
 import logging
 import uuid
 import json
 
+from .backends import ProductBackend, normalize_filters
+from .catalog_index import SPEC_FACETS
+from .connections import ConnectionManager
+from .image_validation import IMAGES_PENDING, deferred_image_validation, deferred_validation_enabled
+
 logger = logging.getLogger(__name__)
 
 
-class AstraDB:
+class AstraDB(ConnectionManager):
     """Astra Data API connection manager"""
     _client = None
     _database = None
     _collection = None
     
+    @classmethod
+    def _reset(cls):
+        cls._client = None
+        cls._database = None
+        cls._collection = None
+    
+    @classmethod
+    def connect(cls):
+        cls.get_collection()
+    
     @classmethod
     def get_client(cls):
         """Get or create Astra client"""
+        cls.ensure_process()
         if cls._client is None:
             cls._client = DataAPIClient(settings.ASTRA_TOKEN)
             logger.info("Connected to Astra Data API")
@@ -28,6 +45,7 @@ class AstraDB:
     @classmethod
     def get_database(cls):
         """Get database instance"""
+        cls.ensure_process()
         if cls._database is None:
             client = cls.get_client()
             cls._database = client.get_database_by_api_endpoint(
@@ -40,6 +58,7 @@ class AstraDB:
     @classmethod
     def get_collection(cls):
         """Get products collection"""
+        cls.ensure_process()
         if cls._collection is None:
             database = cls.get_database()
             
@@ -57,50 +76,10 @@ class AstraDB:
         return cls._collection
 
 
-class AstraProduct:
+class AstraProduct(ProductBackend):
     """Product model for Astra Data API operations"""
-    _cache = None
-    
-    @staticmethod
-    def _validate_image_urls(images):
-        """
-        Validate that image URLs are accessible.
-        Args:
-            images: List of image URL strings
-        Raises:
-            ValueError: If any image URL is not accessible
-        """
-        if not images or not isinstance(images, list):
-            raise ValueError("Images must be a non-empty list")
-        
-        for idx, url in enumerate(images):
-            try:
-                response = requests.head(url, timeout=5, allow_redirects=True)
-                if response.status_code != 200:
-                    raise ValueError(
-                        f"Image {idx + 1} URL is not accessible (status: {response.status_code}): {url}"
-                    )
-                logger.info(f"Image {idx + 1} validated: {url}")
-            except requests.RequestException as e:
-                raise ValueError(f"Failed to validate image {idx + 1} URL: {url}. Error: {str(e)}")
-    
-    @staticmethod
-    def _prepare_product_data(data):
-        """
-        Prepare product data for storage, ensuring backward compatibility.
-        Converts old 'image_url' to 'images' array if needed.
-        """
-        product_data = data.copy()
-        
-        # Handle backward compatibility: convert image_url to images array
-        if 'image_url' in product_data and 'images' not in product_data:
-            product_data['images'] = [product_data.pop('image_url')]
-        
-        # Ensure images is always a list
-        if 'images' in product_data and not isinstance(product_data['images'], list):
-            product_data['images'] = [product_data['images']]
-        
-        return product_data
+    name = 'astra'
+    source = 'Astra DB'
     
     @staticmethod
     def _format_product(doc):
@@ -120,6 +99,8 @@ class AstraProduct:
     def create(cls, data):
         """
         Create a new product with image validation.
+        In deferred mode the product is saved with images_status 'pending'
+        and its images are validated in the background.
         Args:
             data: Dictionary containing product data
         Returns:
@@ -128,9 +109,12 @@ class AstraProduct:
             ValueError: If image URLs are invalid
         """
         product_data = cls._prepare_product_data(data)
+        deferred = deferred_validation_enabled() and bool(product_data.get('images'))
         
         # Validate image URLs before saving
-        if 'images' in product_data:
+        if deferred:
+            product_data['images_status'] = IMAGES_PENDING
+        elif 'images' in product_data:
             cls._validate_image_urls(product_data['images'])
         
         collection = AstraDB.get_collection()
@@ -139,66 +123,157 @@ class AstraProduct:
         
         result = collection.insert_one(product_data)
         
-        # Invalidate cache
-        cls._cache = None
+        # Append to the cached catalog instead of invalidating it
+        cls._cache_append(cls._format_product(product_data))
+        
+        if deferred:
+            deferred_image_validation.submit(product_id, product_data['images'], cls._record_images_status)
         
         logger.info(f"Created product: {product_data.get('name')} (ID: {product_id})")
         return product_data
     
     @classmethod
-    def get_all(cls, filters=None):
+    def bulk_create(cls, items):
         """
-        Get all products with optional filtering.
+        Insert already validated products with insert_many, leaving the product cache alone.
+        Items carrying an '_id' replace the product stored under it, or are inserted with
+        that ID, with concurrent upserts. Callers refresh the cache once after the last batch.
         Args:
-            filters: Dictionary of filter criteria
+            items: List of dictionaries containing product data
         Returns:
-            List of product documents
+            Tuple of (created product documents, list of (position, error message) for items that failed)
         """
-        if cls._cache is None:
-            logger.info("Cache miss. Fetching all products from Astra DB...")
-            collection = AstraDB.get_collection()
-            cursor = collection.find({})
-            cls._cache = [cls._format_product(doc) for doc in cursor]
-            logger.info(f"Cached {len(cls._cache)} products from Astra DB")
+        inserts = []
+        replacements = []
+        for position, data in enumerate(items):
+            document = cls._prepare_product_data(data)
+            if document.get('_id'):
+                document['_id'] = str(document['_id'])
+                replacements.append((position, document))
+            else:
+                document['_id'] = str(uuid.uuid4())
+                inserts.append((position, document))
         
-        products = cls._cache.copy()
+        collection = AstraDB.get_collection()
+        created = []
+        errors = []
         
-        # Apply filters in memory
-        if filters:
-            if 'brand' in filters:
-                products = [p for p in products if p.get('brand') == filters['brand']]
-            if 'category' in filters:
-                products = [p for p in products if p.get('category') == filters['category']]
-            if 'in_stock' in filters:
-                in_stock_val = filters['in_stock']
-                if isinstance(in_stock_val, str):
-                    in_stock_val = in_stock_val.lower() == 'true'
-                products = [p for p in products if p.get('in_stock') == in_stock_val]
+        # A product exported with its ID is written back in place instead of duplicated
+        def replace(document):
+            collection.replace_one({"_id": document['_id']}, document, upsert=True)
         
-        logger.info(f"Retrieved {len(products)} products (from cache)")
-        return products
+        if replacements:
+            with ThreadPoolExecutor(max_workers=settings.BULK_WRITE_CONCURRENCY) as executor:
+                futures = [executor.submit(replace, document) for _, document in replacements]
+                for (position, document), future in zip(replacements, futures):
+                    try:
+                        future.result()
+                        created.append(document)
+                    except Exception as e:
+                        errors.append((position, str(e)))
+        
+        if inserts:
+            documents = [document for _, document in inserts]
+            try:
+                collection.insert_many(documents, ordered=False)
+                created.extend(documents)
+            except Exception as e:
+                # Unordered inserts keep going past failures; report the documents that did not make it
+                inserted_ids = getattr(e, 'inserted_ids', None)
+                if inserted_ids is None:
+                    inserted_ids = getattr(getattr(e, 'partial_result', None), 'inserted_ids', None) or []
+                inserted_ids = set(inserted_ids)
+                logger.error(f"Bulk insert of {len(documents)} products failed partially: {str(e)}")
+                
+                for position, document in inserts:
+                    if document['_id'] in inserted_ids:
+                        created.append(document)
+                    else:
+                        errors.append((position, str(e)))
+        
+        errors.sort()
+        logger.info(f"Bulk wrote {len(created)}/{len(items)} products ({len(replacements)} by ID)")
+        return created, errors
     
     @classmethod
-    def get_by_id(cls, product_id):
+    def _record_images_status(cls, product_id, images_status, error=None):
         """
-        Get a single product by ID.
+        Store the outcome of deferred image validation.
         Args:
             product_id: String representation of product ID
+            images_status: 'verified' or 'broken'
+            error: Validation error message for broken images
+        """
+        changes = {'images_status': images_status, 'images_error': error}
+        collection = AstraDB.get_collection()
+        result = collection.update_one({"_id": product_id}, {"$set": changes})
+        
+        # Nothing to record if the product was deleted in the meantime
+        if result.update_info.get('n', 0) > 0:
+            cls._cache_replace(product_id, changes)
+    
+    @classmethod
+    def resume_image_validation(cls):
+        """
+        Queue the products saved in deferred mode whose images were never validated.
         Returns:
-            Product document or None
+            Number of products queued
+        """
+        queued = 0
+        for product in cls.iter_products({'images_status': IMAGES_PENDING}):
+            deferred_image_validation.submit(product['_id'], product.get('images') or [], cls._record_images_status)
+            queued += 1
+        if queued:
+            logger.info(f"Queued image validation of {queued} pending products")
+        return queued
+    
+    @classmethod
+    def iter_products(cls, filters=None, fetch_size=None):
         """
-        if cls._cache is not None:
-            for product in cls._cache:
-                if product.get('_id') == product_id:
-                    return product
+        Stream products from Astra DB; the cursor fetches one page of documents at a time.
+        Args:
+            filters: Dictionary of filter criteria
+            fetch_size: Unused; the Data API decides its own page size
+        Yields:
+            Product documents
+        """
+        query = {}
+        for key, value in normalize_filters(filters).items():
+            query[f'specs.{key}' if key in SPEC_FACETS else key] = value
         
         collection = AstraDB.get_collection()
-        try:
-            doc = collection.find_one({"_id": product_id})
-            return cls._format_product(doc)
-        except Exception as e:
-            logger.error(f"Error fetching product {product_id}: {str(e)}")
-            return None
+        for doc in collection.find(query):
+            yield cls._format_product(doc)
+    
+    @classmethod
+    def check_health(cls):
+        """Check the Data API connection by listing the collections"""
+        collections = AstraDB.get_database().list_collection_names()
+        return {
+            'database': 'astra (connected)',
+            'message': 'Django backend is running with Astra database',
+            'collections': collections
+        }
+    
+    @classmethod
+    def _fetch_one(cls, product_id):
+        """Read one product with find_one"""
+        collection = AstraDB.get_collection()
+        return cls._format_product(collection.find_one({"_id": product_id}))
+    
+    @classmethod
+    def _fetch_many(cls, product_ids):
+        """Read several products with one $in query; a failed query raises"""
+        products = {}
+        collection = AstraDB.get_collection()
+        cursor = collection.find(
+            {"_id": {"$in": product_ids}},
+            timeout_ms=getattr(settings, 'CATALOG_LOOKUP_TIMEOUT_MS', 2000)
+        )
+        for doc in cursor:
+            product = cls._format_product(doc)
+            products[product['_id']] = product
+        return products
     
     @classmethod
     def update(cls, product_id, data, validate_images=True):
@@ -229,16 +304,76 @@ class AstraProduct:
                 {"_id": product_id},
                 {"$set": product_data}
             )
-            # For Astra Data API, check if the operation was successful
-            success = result is not None
+            # The update matched nothing if the product does not exist
+            success = result.update_info.get('n', 0) > 0
             if success:
-                cls._cache = None  # Invalidate cache
-                logger.info(f"Updated product: {product_id} and invalidated cache")
+                # Patch the cached product with the same $set payload
+                cls._cache_replace(product_id, product_data)
+                logger.info(f"Updated product: {product_id} and patched cache")
             return success
         except Exception as e:
             logger.error(f"Error updating product {product_id}: {str(e)}")
             return False
     
+    @classmethod
+    def _patch_stock(cls, product_id, stock_quantity):
+        """Patch a product's stock in the cached catalog"""
+        cls._cache_replace(product_id, {'stock_quantity': stock_quantity, 'in_stock': stock_quantity > 0})
+    
+    @classmethod
+    def reserve_stock(cls, product_id, quantity):
+        """
+        Take quantity units of a product's stock, unless fewer are left.
+        The stock check and the decrement are one conditional update, so
+        concurrent buyers can never take more than there is.
+        Args:
+            product_id: String representation of product ID
+            quantity: Number of units to reserve
+        Returns:
+            Boolean indicating whether the stock was reserved
+        """
+        collection = AstraDB.get_collection()
+        doc = collection.find_one_and_update(
+            {"_id": product_id, "stock_quantity": {"$gte": quantity}},
+            {"$inc": {"stock_quantity": -quantity}},
+            projection={"stock_quantity": True},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            return False
+        
+        stock_quantity = doc['stock_quantity']
+        if stock_quantity <= 0:
+            # Conditional, so a release that raced in between keeps the product in stock
+            collection.update_one({"_id": product_id, "stock_quantity": 0}, {"$set": {"in_stock": False}})
+        cls._patch_stock(product_id, stock_quantity)
+        logger.info(f"Reserved {quantity} units of product {product_id}, {stock_quantity} left")
+        return True
+    
+    @classmethod
+    def release_stock(cls, product_id, quantity):
+        """
+        Give quantity units back to a product's stock.
+        Args:
+            product_id: String representation of product ID
+            quantity: Number of units to release
+        Returns:
+            Boolean indicating whether the product was found
+        """
+        collection = AstraDB.get_collection()
+        doc = collection.find_one_and_update(
+            {"_id": product_id},
+            {"$inc": {"stock_quantity": quantity}, "$set": {"in_stock": True}},
+            projection={"stock_quantity": True},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            return False
+        
+        cls._patch_stock(product_id, doc['stock_quantity'])
+        logger.info(f"Released {quantity} units of product {product_id}")
+        return True
+    
     @classmethod
     def delete(cls, product_id):
         """
@@ -253,8 +388,8 @@ class AstraProduct:
             result = collection.delete_one({"_id": product_id})
             success = result.deleted_count > 0
             if success:
-                cls._cache = None  # Invalidate cache
-                logger.info(f"Deleted product: {product_id} and invalidated cache")
+                cls._cache_remove(product_id)
+                logger.info(f"Deleted product: {product_id} and patched cache")
             return success
         except Exception as e:
             logger.error(f"Error deleting product {product_id}: {str(e)}")
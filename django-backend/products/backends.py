@@ -0,0 +1,380 @@
+"""
+Product storage backends.
+
+Every product model implements ProductBackend. The backend supplies the
+storage operations (writes, streaming scans, lookups of products the cache
+does not hold); the catalog cache, the catalog index and everything that
+reads from them (filtered listings, lookups by ID, multi-gets) are written
+once here. The PRODUCT_BACKEND setting names the backend, which is loaded
+once at startup; a backend that cannot be imported stops startup instead
+of silently falling back to another one.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .catalog_index import FACETS
+from .image_validation import image_validator
+from .paging import page_of
+from .product_cache import ProductCache
+from .shared_cache import append_product, replace_product, remove_product
+
+logger = logging.getLogger(__name__)
+
+# Backend names accepted by PRODUCT_BACKEND and the model implementing each
+BACKENDS = {
+    'mock': 'products.mock_models.MockProduct',
+    'astra': 'products.astra_models.AstraProduct',
+    'cassandra': 'products.models.Product',
+}
+
+
+def normalize_filters(filters):
+    """
+    Bring filter criteria into the form every backend expects.
+    Args:
+        filters: Dictionary of facet names to values, or None
+    Returns:
+        Dictionary keeping only known facets, with in_stock as a boolean
+    """
+    normalized = {}
+    for facet, value in (filters or {}).items():
+        if facet not in FACETS:
+            continue
+        if facet == 'in_stock' and isinstance(value, str):
+            value = value.lower() == 'true'
+        normalized[facet] = value
+    return normalized
+
+
+class ProductBackend:
+    """
+    Base class of the product models.
+
+    Subclasses implement the storage methods that raise NotImplementedError
+    here. They report every change to the catalog through _cache_append,
+    _cache_replace and _cache_remove, which patch copies of the cached
+    catalog and its index instead of reloading them.
+    """
+    # Name of the backend in BACKENDS
+    name = None
+    # Name of the database, for logging and cache metrics
+    source = None
+    _cache = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.source is not None and '_cache' not in cls.__dict__:
+            cls._cache = ProductCache(cls.source, fetch=lambda: cls._fetch_all())
+
+    # Storage operations
+
+    @classmethod
+    def create(cls, data):
+        """
+        Create a product.
+        Args:
+            data: Dictionary containing product data
+        Returns:
+            Created product document
+        Raises:
+            ValueError: If image URLs are invalid
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def bulk_create(cls, items):
+        """
+        Insert already validated products, leaving the product cache alone.
+        An item carrying an '_id' is written under that ID, replacing any product
+        stored with it, so re-importing an export does not duplicate the catalog;
+        the other items get a new ID. Callers refresh the cache once after the last batch.
+        Args:
+            items: List of dictionaries containing product data
+        Returns:
+            Tuple of (created product documents, list of (position, error message) for items that failed)
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def iter_products(cls, filters=None, fetch_size=None):
+        """
+        Stream products from the database, bypassing the cache.
+        Args:
+            filters: Dictionary of filter criteria
+            fetch_size: Rows fetched per round trip, where the database supports it
+        Yields:
+            Product documents
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def update(cls, product_id, data, validate_images=True):
+        """
+        Update a product.
+        Args:
+            product_id: String representation of product ID
+            data: Dictionary containing updated product data
+            validate_images: Boolean to enable/disable image validation
+        Returns:
+            Boolean indicating whether the product was found and updated
+        Raises:
+            ValueError: If image URLs are invalid and validation is enabled
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def reserve_stock(cls, product_id, quantity):
+        """
+        Take quantity units of a product's stock, unless fewer are left.
+        Concurrent reservations must never take more than there is.
+        Args:
+            product_id: String representation of product ID
+            quantity: Number of units to reserve
+        Returns:
+            Boolean indicating whether the stock was reserved
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def release_stock(cls, product_id, quantity):
+        """
+        Give quantity units back to a product's stock.
+        Args:
+            product_id: String representation of product ID
+            quantity: Number of units to release
+        Returns:
+            Boolean indicating whether the product was found
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def delete(cls, product_id):
+        """
+        Delete a product.
+        Args:
+            product_id: String representation of product ID
+        Returns:
+            Boolean indicating whether the product was found and deleted
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def _fetch_one(cls, product_id):
+        """Read one product from the database; returns None if it does not exist"""
+        raise NotImplementedError
+
+    @classmethod
+    def _fetch_many(cls, product_ids):
+        """Read several products from the database in as few round trips as possible; returns a dict keyed by ID and raises if a read fails"""
+        raise NotImplementedError
+
+    @classmethod
+    def check_health(cls):
+        """
+        Check the database connection.
+        Returns:
+            Dictionary with 'database' and 'message' plus any backend details
+        Raises:
+            Exception: If the database cannot be reached
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def resume_image_validation(cls):
+        """
+        Queue the products whose images_status is still 'pending', such as
+        those whose background validation was lost when a worker stopped.
+        Backends that validate images before saving never leave any pending.
+        Returns:
+            Number of products queued
+        """
+        return 0
+
+    # Shared helpers for writes
+
+    @staticmethod
+    def _validate_image_urls(images):
+        """
+        Validate that image URLs are accessible, checking them concurrently.
+        Args:
+            images: List of image URL strings
+        Raises:
+            ValueError: If any image URL is not accessible
+        """
+        image_validator.validate(images)
+
+    @staticmethod
+    def _prepare_product_data(data):
+        """
+        Prepare product data for storage, ensuring backward compatibility.
+        Converts old 'image_url' to 'images' array if needed.
+        """
+        product_data = data.copy()
+
+        # Handle backward compatibility: convert image_url to images array
+        if 'image_url' in product_data and 'images' not in product_data:
+            product_data['images'] = [product_data.pop('image_url')]
+
+        # Ensure images is always a list
+        if 'images' in product_data and not isinstance(product_data['images'], list):
+            product_data['images'] = [product_data['images']]
+
+        return product_data
+
+    # Catalog cache
+
+    @classmethod
+    def _fetch_all(cls):
+        """Fetch the full catalog from the database"""
+        logger.info(f"Cache miss. Fetching all products from {cls.source}...")
+        products = list(cls.iter_products())
+        logger.info(f"Fetched {len(products)} products from {cls.source}")
+        return products
+
+    @classmethod
+    def _apply_cache_write(cls, change):
+        """Apply a write to the cached catalog and its index instead of invalidating them"""
+        cls._cache.apply_write(change)
+
+    @classmethod
+    def _cache_append(cls, product):
+        """Add a created product to the cached catalog"""
+        cls._apply_cache_write(lambda products: append_product(products, product))
+
+    @classmethod
+    def _cache_replace(cls, product_id, patch):
+        """Merge changed fields into a cached product"""
+        cls._apply_cache_write(
+            lambda products: replace_product(products, product_id, lambda product: {**product, **patch})
+        )
+
+    @classmethod
+    def _cache_remove(cls, product_id):
+        """Drop a deleted product from the cached catalog"""
+        cls._apply_cache_write(lambda products: remove_product(products, product_id))
+
+    @classmethod
+    def refresh_cache(cls, wait=False):
+        """Force a full reload of the catalog; unless waiting, the old catalog is served meanwhile"""
+        cls._cache.refresh(wait)
+
+    @classmethod
+    def cache_stats(cls):
+        """Get product cache metrics"""
+        return cls._cache.stats()
+
+    @classmethod
+    def get_version(cls):
+        """
+        Get the catalog version, bumped whenever the cached catalog changes.
+        Checks the shared generation and the TTL first, so a change made by
+        another worker changes the version here too.
+        """
+        return cls._cache.current_version()
+
+    @classmethod
+    def get_index(cls):
+        """
+        Get the catalog index over the cached products.
+        Returns:
+            CatalogIndex built from the product cache
+        """
+        return cls._cache.get_index()
+
+    # Reads served from the catalog index
+
+    @classmethod
+    def get_all(cls, filters=None):
+        """
+        Get all products with optional filtering.
+        Args:
+            filters: Dictionary of filter criteria
+        Returns:
+            List of product documents
+        """
+        products = cls.get_index().filter(normalize_filters(filters))
+        logger.info(f"Retrieved {len(products)} products (from cache)")
+        return products
+
+    @classmethod
+    def get_page(cls, filters=None, page_size=50, page_token=None, exclude=None):
+        """
+        Get one page of products from the catalog index.
+        Args:
+            filters: Dictionary of filter criteria
+            page_size: Number of products per page
+            page_token: Token returned with the previous page, or None for the first page
+            exclude: Dictionary mapping facet names to a value whose products are left out
+        Returns:
+            Tuple of (product documents, token of the next page or None)
+        Raises:
+            ValueError: If the page token is malformed
+        """
+        products = cls.get_index().filter(normalize_filters(filters), exclude=exclude)
+        return page_of(products, page_size, page_token)
+
+    @classmethod
+    def get_by_id(cls, product_id):
+        """
+        Get a single product by ID from the catalog index, falling back to
+        the database for products the cache does not hold.
+        Args:
+            product_id: String representation of product ID
+        Returns:
+            Product document or None
+        """
+        try:
+            product = cls.get_index().get(product_id)
+            if product is not None:
+                return product
+            return cls._fetch_one(product_id)
+        except Exception as e:
+            logger.error(f"Error fetching product {product_id}: {str(e)}")
+            return None
+
+    @classmethod
+    def get_many(cls, product_ids):
+        """
+        Get several products by ID, reading the ones the cache does not hold
+        from the database together.
+        Args:
+            product_ids: Iterable of product ID strings
+        Returns:
+            Dictionary mapping each product ID that was found to its document
+        Raises:
+            Exception: If the database cannot be read; an unknown product is
+                left out, a failed lookup is never reported as one
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        products = cls.get_index().get_many(product_ids)
+
+        missing = [product_id for product_id in product_ids if product_id not in products]
+        if missing:
+            products.update(cls._fetch_many(missing))
+        return products
+
+
+def load_backend(name=None):
+    """
+    Import the product model of a backend.
+    Args:
+        name: Key of BACKENDS, defaulting to the PRODUCT_BACKEND setting
+    Returns:
+        ProductBackend subclass
+    Raises:
+        ImproperlyConfigured: If the backend is unknown or cannot be imported
+    """
+    name = name or settings.PRODUCT_BACKEND
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(
+            f"Unknown PRODUCT_BACKEND '{name}'; expected one of: {', '.join(BACKENDS)}"
+        )
+    try:
+        backend = import_string(BACKENDS[name])
+    except ImportError as e:
+        raise ImproperlyConfigured(f"Product backend '{name}' cannot be loaded: {str(e)}") from e
+    logger.info(f"Using the {name} product backend")
+    return backend
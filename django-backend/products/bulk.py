@@ -0,0 +1,261 @@
+"""
+Bulk product import and export.
+
+Rows are read from NDJSON or CSV, validated in chunks and written with one
+bulk write per chunk through the model's bulk_create. Image URLs of a whole
+chunk are checked together by the concurrent validator, errors are reported
+per row, and the product cache is refreshed once when the import is done.
+
+Exports carry each product's _id. An imported row with an _id is written
+under that ID, replacing the product stored with it, so importing an export
+restores the catalog instead of duplicating it. Rows without an _id become
+new products.
+"""
+import csv
+import io
+import json
+import logging
+
+from django.conf import settings
+
+from .image_validation import image_validator
+from .serializers import CreateProductSerializer, ProductSerializer
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'csv')
+
+# Columns of the CSV format; specs are stored as a JSON object and images
+# as a JSON array (a '|'-separated list is accepted on import)
+CSV_COLUMNS = (
+    '_id', 'name', 'brand', 'category', 'price', 'description',
+    'specs', 'images', 'in_stock', 'stock_quantity',
+)
+
+
+class BulkResult:
+    """Outcome of a bulk import"""
+
+    def __init__(self):
+        self.created = []
+        self.errors = []
+        self.rows = 0
+        self.valid = 0
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'created': len(self.created),
+            'failed': len(self.errors),
+            'ids': self.created,
+            'errors': self.errors,
+        }
+
+
+def format_for(path, default='ndjson'):
+    """Guess the bulk format from a file name"""
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    if path and path.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def read_ndjson(lines):
+    """
+    Parse NDJSON lines into rows.
+    Args:
+        lines: Iterable of text lines
+    Yields:
+        Row dictionaries; a line that is not a JSON object yields a ValueError instead
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {str(e)}")
+            continue
+        yield row if isinstance(row, dict) else ValueError("Each line must be a JSON object")
+
+
+def _csv_value(column, value):
+    if value is None or value == '':
+        return None
+    if column == 'specs':
+        return json.loads(value)
+    if column == 'images':
+        if value.lstrip().startswith('['):
+            return json.loads(value)
+        return [url.strip() for url in value.split('|') if url.strip()]
+    return value
+
+
+def read_csv(lines):
+    """
+    Parse CSV lines with a header row into rows.
+    Args:
+        lines: Iterable of text lines
+    Yields:
+        Row dictionaries; a row with malformed JSON columns yields a ValueError instead
+    """
+    for record in csv.DictReader(lines):
+        try:
+            row = {}
+            for column, value in record.items():
+                if column is None:
+                    continue
+                value = _csv_value(column, value)
+                if value is not None:
+                    row[column] = value
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON in CSV column: {str(e)}")
+            continue
+        yield row
+
+
+def read_rows(lines, fmt):
+    """Parse rows in the given bulk format"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return read_csv(lines) if fmt == 'csv' else read_ndjson(lines)
+
+
+def export_lines(products, fmt):
+    """
+    Encode products in a bulk format, one line at a time.
+    Args:
+        products: Iterable of product dictionaries
+        fmt: 'ndjson' or 'csv'
+    Yields:
+        Text lines ending with a newline
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    if fmt == 'ndjson':
+        for product in products:
+            yield json.dumps(ProductSerializer(product).data, ensure_ascii=False) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    for product in products:
+        data = dict(ProductSerializer(product).data)
+        data['specs'] = json.dumps(data.get('specs') or {}, ensure_ascii=False)
+        data['images'] = json.dumps(data.get('images') or [], ensure_ascii=False)
+        writer.writerow(data)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _validate_chunk(chunk, result, validate_images):
+    """
+    Validate a chunk of (row number, row) pairs.
+    Returns:
+        List of (row number, validated data) pairs that passed validation
+    """
+    valid = []
+    for row_number, row in chunk:
+        if isinstance(row, Exception):
+            result.add_error(row_number, {'row': [str(row)]})
+            continue
+        serializer = CreateProductSerializer(data=row)
+        if not serializer.is_valid():
+            result.add_error(row_number, serializer.errors)
+            continue
+        data = serializer.validated_data
+        # The serializer does not accept IDs; keep an exported one so the product is replaced
+        if row.get('_id') not in (None, ''):
+            if not isinstance(row['_id'], str):
+                result.add_error(row_number, {'_id': ['Must be a string']})
+                continue
+            data['_id'] = row['_id']
+        valid.append((row_number, data))
+
+    if not validate_images or not valid:
+        return valid
+
+    # One concurrent check for every distinct URL in the chunk
+    urls = []
+    for _, data in valid:
+        urls.extend(data.get('images') or [])
+        if data.get('image_url'):
+            urls.append(data['image_url'])
+    # The deadline scales with the number of distinct URLs the pool has to get through
+    deadline = max(image_validator.deadline, len(set(urls)) / image_validator.workers * image_validator.timeout)
+    checks = image_validator.check(urls, deadline=deadline)
+
+    passed = []
+    for row_number, data in valid:
+        images = list(data.get('images') or [])
+        if data.get('image_url') and not images:
+            images = [data['image_url']]
+        broken = []
+        for url in images:
+            check = checks.get(url)
+            if check is None:
+                broken.append(f"Timed out validating image URL: {url}")
+            elif not check.ok:
+                broken.append(f"Image URL is not accessible (status: {check.status or check.error}): {url}")
+        if broken:
+            result.add_error(row_number, {'images': broken})
+        else:
+            passed.append((row_number, data))
+    return passed
+
+
+def import_products(model, rows, chunk_size=None, validate_images=True, dry_run=False):
+    """
+    Validate and write products in chunks.
+    Args:
+        model: Product model class providing bulk_create and refresh_cache
+        rows: Iterable of row dictionaries (or exceptions for rows that could not be parsed)
+        chunk_size: Rows validated and written together; defaults to BULK_CHUNK_SIZE
+        validate_images: Check that image URLs are reachable
+        dry_run: Validate only, without writing
+    Returns:
+        BulkResult
+    """
+    chunk_size = chunk_size or getattr(settings, 'BULK_CHUNK_SIZE', 100)
+    result = BulkResult()
+
+    def flush(chunk):
+        valid = _validate_chunk(chunk, result, validate_images)
+        result.valid += len(valid)
+        if not valid or dry_run:
+            return
+        created, errors = model.bulk_create([data for _, data in valid])
+        result.created.extend(product['_id'] for product in created)
+        for position, message in errors:
+            result.add_error(valid[position][0], {'write': [message]})
+
+    chunk = []
+    for row_number, row in enumerate(rows, start=1):
+        result.rows = row_number
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    # Writes bypassed the cache; reload it once instead of patching it per row
+    if result.created:
+        model.refresh_cache(wait=True)
+
+    result.errors.sort(key=lambda error: error['row'])
+    logger.info(
+        f"Bulk import: {result.rows} rows, {len(result.created)} created, {len(result.errors)} failed"
+    )
+    return result
@@ -0,0 +1,470 @@
+"""
+In-memory catalog index for fast product filtering.
+
+Keeps one posting set of product ids per facet value and a sorted price
+array, so a filtered listing is a handful of set intersections plus a
+bisect instead of one list comprehension per query parameter.
+"""
+from bisect import bisect_left, bisect_right, insort
+import itertools
+import json
+import logging
+
+from .search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Top-level product fields that can be filtered on by exact value
+PRODUCT_FACETS = ('brand', 'category', 'in_stock', 'images_status')
+
+# Fields inside product['specs'] that can be filtered on by exact value
+SPEC_FACETS = (
+    'price_tier',
+    'use_case',
+    'form_factor',
+    'software_experience',
+    'chipset_category',
+    'market_origin',
+    'target_demographic',
+)
+
+FACETS = PRODUCT_FACETS + SPEC_FACETS
+
+# Facets published by the filter-options endpoint, keyed by their response field
+FILTER_OPTION_FACETS = (
+    ('brands', 'brand'),
+    ('price_tiers', 'price_tier'),
+    ('use_cases', 'use_case'),
+    ('form_factors', 'form_factor'),
+    ('software_experiences', 'software_experience'),
+    ('chipset_categories', 'chipset_category'),
+    ('market_origins', 'market_origin'),
+    ('target_demographics', 'target_demographic'),
+)
+
+# Process-wide source of product versions, so a version is never reused
+# even when an index is rebuilt from scratch
+_versions = itertools.count(1)
+
+# Orderings the index can serve from its presorted arrays
+SORT_OPTIONS = ('price', '-price', 'name', '-name')
+
+
+def facet_value(product, facet):
+    """Return the value a product holds for a facet, or None"""
+    if facet in PRODUCT_FACETS:
+        return product.get(facet)
+    specs = product.get('specs') or {}
+    if not isinstance(specs, dict):
+        return None
+    value = specs.get(facet)
+    # Only scalar spec values can be used as posting keys
+    if isinstance(value, (list, dict)):
+        return None
+    return value
+
+
+class FacetSummary:
+    """
+    Reference-counted summary of the available filter options.
+
+    Adding or removing a product touches one counter per facet, so the
+    summary never needs a scan of the catalog. The rendered response is
+    memoised until the next change.
+    """
+
+    def __init__(self):
+        self._counts = {facet: {} for _, facet in FILTER_OPTION_FACETS}
+        self._prices = {}
+        self._min_price = None
+        self._max_price = None
+        self._data = None
+        self._json = None
+
+    def copy(self):
+        """Return a summary that can be changed without affecting this one"""
+        clone = FacetSummary()
+        clone._counts = {facet: dict(counts) for facet, counts in self._counts.items()}
+        clone._prices = dict(self._prices)
+        clone._min_price = self._min_price
+        clone._max_price = self._max_price
+        # The memoised responses are replaced on change, never mutated
+        clone._data = self._data
+        clone._json = self._json
+        return clone
+
+    def add(self, product):
+        """Count a product's facet values and price"""
+        for _, facet in FILTER_OPTION_FACETS:
+            value = facet_value(product, facet)
+            if value:
+                counts = self._counts[facet]
+                counts[value] = counts.get(value, 0) + 1
+
+        price = product.get('price') or 0
+        if price > 0:
+            self._prices[price] = self._prices.get(price, 0) + 1
+            if self._min_price is None or price < self._min_price:
+                self._min_price = price
+            if self._max_price is None or price > self._max_price:
+                self._max_price = price
+
+        self._data = None
+        self._json = None
+
+    def remove(self, product):
+        """Release a product's facet values and price"""
+        for _, facet in FILTER_OPTION_FACETS:
+            value = facet_value(product, facet)
+            counts = self._counts[facet]
+            if value and value in counts:
+                counts[value] -= 1
+                if counts[value] <= 0:
+                    del counts[value]
+
+        price = product.get('price') or 0
+        if price > 0 and price in self._prices:
+            self._prices[price] -= 1
+            if self._prices[price] <= 0:
+                del self._prices[price]
+                # Only losing the last product at an extreme needs a new bound
+                if price == self._min_price:
+                    self._min_price = min(self._prices) if self._prices else None
+                if price == self._max_price:
+                    self._max_price = max(self._prices) if self._prices else None
+
+        self._data = None
+        self._json = None
+
+    def count(self, facet, value):
+        """Return how many products hold a facet value"""
+        return self._counts[facet].get(value, 0)
+
+    def as_dict(self):
+        """
+        Build the filter-options response.
+        Returns:
+            Dictionary with sorted option lists, per-option counts and the price range
+        """
+        if self._data is None:
+            data = {}
+            counts = {}
+            for key, facet in FILTER_OPTION_FACETS:
+                values = sorted(self._counts[facet], key=str)
+                data[key] = values
+                counts[key] = {str(value): self._counts[facet][value] for value in values}
+            data['price_range'] = {
+                'min': int(self._min_price) if self._min_price is not None else 0,
+                'max': int(self._max_price) if self._max_price is not None else 0
+            }
+            data['counts'] = counts
+            self._data = data
+        return self._data
+
+    def as_json(self):
+        """Return the filter-options response encoded as compact UTF-8 JSON"""
+        if self._json is None:
+            self._json = json.dumps(
+                self.as_dict(), ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+        return self._json
+
+
+class CatalogIndex:
+    """
+    Posting-set index over a product catalog.
+
+    An index that readers can see must not change under them: writers
+    patch a copy() and publish it in place of the original.
+    """
+
+    def __init__(self, products=None):
+        self._products = {}
+        self._order = {}
+        self._next_order = 0
+        self._versions = {}
+        self._postings = {facet: {} for facet in FACETS}
+        # (facet, value) pairs whose posting sets belong to this index rather
+        # than being shared with the index it was copied from
+        self._owned = set()
+        self._prices = []
+        self._names = []
+        self.summary = FacetSummary()
+        self.search_index = SearchIndex()
+
+        for product in products or []:
+            self.add(product)
+
+    def __len__(self):
+        return len(self._products)
+
+    def __contains__(self, product_id):
+        return product_id in self._products
+
+    def copy(self):
+        """
+        Return an index that can be changed without affecting this one.
+        Posting sets are shared until the copy changes them, so a copy costs
+        a few dictionary and list copies rather than a rebuild.
+        """
+        clone = CatalogIndex()
+        clone._products = dict(self._products)
+        clone._order = dict(self._order)
+        clone._next_order = self._next_order
+        clone._versions = dict(self._versions)
+        clone._postings = {facet: dict(postings) for facet, postings in self._postings.items()}
+        clone._prices = list(self._prices)
+        clone._names = list(self._names)
+        clone.summary = self.summary.copy()
+        clone.search_index = self.search_index.copy()
+        return clone
+
+    def _own_postings(self, facet, value):
+        """Return the posting set of a facet value for changing, copying it first if it is shared"""
+        postings = self._postings[facet].get(value)
+        if postings is None:
+            postings = self._postings[facet][value] = set()
+            self._owned.add((facet, value))
+        elif (facet, value) not in self._owned:
+            postings = self._postings[facet][value] = set(postings)
+            self._owned.add((facet, value))
+        return postings
+
+    def add(self, product):
+        """
+        Index a product. Replaces any product already indexed under the same ID.
+        Args:
+            product: Product dictionary with an '_id' key
+        """
+        product_id = product.get('_id')
+        if product_id is None:
+            return
+
+        previous = self._products.get(product_id)
+        if previous is not None:
+            self._unindex(product_id, previous)
+        else:
+            self._order[product_id] = self._next_order
+            self._next_order += 1
+
+        self._products[product_id] = product
+        self._versions[product_id] = next(_versions)
+
+        for facet in FACETS:
+            value = facet_value(product, facet)
+            if value is not None:
+                self._own_postings(facet, value).add(product_id)
+
+        insort(self._prices, self._price_entry(product_id, product))
+        insort(self._names, self._name_entry(product_id, product))
+        self.summary.add(product)
+        self.search_index.add(product)
+
+    def _price_entry(self, product_id, product):
+        return (product.get('price') or 0, self._order[product_id], product_id)
+
+    def _name_entry(self, product_id, product):
+        return (str(product.get('name') or '').lower(), self._order[product_id], product_id)
+
+    def _unindex(self, product_id, product):
+        """Remove a product's entries from the posting sets, price array and summary"""
+        for facet in FACETS:
+            value = facet_value(product, facet)
+            if value not in self._postings[facet]:
+                continue
+            postings = self._own_postings(facet, value)
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[facet][value]
+                self._owned.discard((facet, value))
+
+        for entries, entry in (
+            (self._prices, self._price_entry(product_id, product)),
+            (self._names, self._name_entry(product_id, product)),
+        ):
+            position = bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+        self.summary.remove(product)
+
+    def remove(self, product_id):
+        """
+        Drop a product from the index.
+        Args:
+            product_id: ID of the product to remove
+        Returns:
+            The removed product dictionary, or None if it was not indexed
+        """
+        product = self._products.get(product_id)
+        if product is None:
+            return None
+
+        self._unindex(product_id, product)
+        self.search_index.remove(product_id)
+        del self._products[product_id]
+        del self._order[product_id]
+        del self._versions[product_id]
+        return product
+
+    def get(self, product_id):
+        """Return the indexed product with the given ID, or None"""
+        return self._products.get(product_id)
+
+    def get_many(self, product_ids):
+        """Return a dictionary of the indexed products among the given IDs, keyed by ID"""
+        products = self._products
+        return {product_id: products[product_id] for product_id in product_ids if product_id in products}
+
+    def version_of(self, product_id):
+        """Return the version of an indexed product; it changes whenever the product is re-indexed"""
+        return self._versions.get(product_id)
+
+    def search(self, query, limit=None, exclude=None):
+        """
+        Full-text search over the indexed products.
+        Args:
+            query: Free-text query, matched against whole words and word prefixes
+            limit: Maximum number of results, or None for all
+            exclude: Dictionary mapping facet names to a value whose products are left out
+        Returns:
+            List of product dictionaries, best match first
+        """
+        excluded = self.excluded_ids(exclude)
+        if not excluded:
+            return [self._products[product_id] for product_id, _ in self.search_index.search(query, limit)]
+        # Rank every match so excluded products do not use up the limit
+        results = [
+            self._products[product_id] for product_id, _ in self.search_index.search(query)
+            if product_id not in excluded
+        ]
+        return results if limit is None else results[:limit]
+
+    def all(self):
+        """Return every indexed product in listing order"""
+        return list(self._products.values())
+
+    def _price_range_ids(self, min_price, max_price):
+        """Return the set of product IDs whose price lies within the bounds"""
+        low = 0
+        high = len(self._prices)
+        if min_price is not None:
+            low = bisect_left(self._prices, (min_price,))
+        if max_price is not None:
+            high = bisect_right(self._prices, (max_price, float('inf')))
+        return {entry[2] for entry in self._prices[low:high]}
+
+    def filter_ids(self, filters=None, min_price=None, max_price=None):
+        """
+        Resolve filters to the set of matching product IDs.
+        Args:
+            filters: Dictionary mapping facet names to the required value
+            min_price: Inclusive lower price bound, or None
+            max_price: Inclusive upper price bound, or None
+        Returns:
+            Set of product IDs
+        """
+        candidates = []
+        for facet, value in (filters or {}).items():
+            if facet not in self._postings:
+                raise KeyError(f"Unknown filter facet: {facet}")
+            postings = self._postings[facet].get(value)
+            if not postings:
+                return set()
+            candidates.append(postings)
+
+        if not candidates and min_price is None and max_price is None:
+            return set(self._products)
+
+        # Intersect the smallest posting sets first so the working set shrinks fast
+        candidates.sort(key=len)
+
+        if candidates:
+            result = set(candidates[0])
+            for postings in candidates[1:]:
+                result &= postings
+                if not result:
+                    return result
+        else:
+            result = None
+
+        if min_price is not None or max_price is not None:
+            if result is not None and len(result) < len(self._prices) // 8:
+                # Cheaper to check the few remaining products than to slice the price array
+                result = {
+                    product_id for product_id in result
+                    if (min_price is None or (self._products[product_id].get('price') or 0) >= min_price)
+                    and (max_price is None or (self._products[product_id].get('price') or 0) <= max_price)
+                }
+            else:
+                in_range = self._price_range_ids(min_price, max_price)
+                result = in_range if result is None else result & in_range
+
+        return result
+
+    def _sorted_ids(self, product_ids, sort):
+        """Order a set of product IDs by one of SORT_OPTIONS"""
+        field, reverse = sort.lstrip('-'), sort.startswith('-')
+        entries = self._prices if field == 'price' else self._names
+
+        if len(product_ids) < len(entries) // 8:
+            # A small result is cheaper to sort than to pick out of the presorted array
+            make_entry = self._price_entry if field == 'price' else self._name_entry
+            ordered = sorted(
+                (make_entry(product_id, self._products[product_id]) for product_id in product_ids),
+                reverse=reverse
+            )
+            return [entry[2] for entry in ordered]
+
+        walk = reversed(entries) if reverse else entries
+        if len(product_ids) == len(entries):
+            return [entry[2] for entry in walk]
+        return [entry[2] for entry in walk if entry[2] in product_ids]
+
+    def excluded_ids(self, exclude):
+        """
+        Resolve exclusions to the set of product IDs they match.
+        Args:
+            exclude: Dictionary mapping facet names to a value to leave out
+        Returns:
+            Set of product IDs
+        """
+        excluded = set()
+        for facet, value in (exclude or {}).items():
+            if facet not in self._postings:
+                raise KeyError(f"Unknown filter facet: {facet}")
+            excluded |= self._postings[facet].get(value, set())
+        return excluded
+
+    def filter(self, filters=None, min_price=None, max_price=None, sort=None, exclude=None):
+        """
+        Return the products matching all filters.
+        Args:
+            filters: Dictionary mapping facet names to the required value
+            min_price: Inclusive lower price bound, or None
+            max_price: Inclusive upper price bound, or None
+            sort: One of SORT_OPTIONS, or None for listing order
+            exclude: Dictionary mapping facet names to a value whose products are left out
+        Returns:
+            List of product dictionaries
+        """
+        if sort is not None and sort not in SORT_OPTIONS:
+            raise ValueError(f"Unsupported sort: {sort}")
+
+        excluded = self.excluded_ids(exclude)
+
+        if not filters and min_price is None and max_price is None:
+            if sort is None and not excluded:
+                return self.all()
+            product_ids = self._products.keys()
+        else:
+            product_ids = self.filter_ids(filters, min_price, max_price)
+
+        if excluded:
+            product_ids = product_ids - excluded
+
+        if sort is None:
+            ordered = sorted(product_ids, key=self._order.__getitem__)
+        else:
+            ordered = self._sorted_ids(product_ids, sort)
+        return [self._products[product_id] for product_id in ordered]
@@ -0,0 +1,118 @@
+"""
+Per-process lifecycle of database connections.
+
+CassandraDB, AstraDB and AstraOrderDB keep their clients in class attributes
+and create them on first use. A client inherited across fork() from a
+preloading server's master shares sockets and driver threads that do not
+survive in the child, so each manager remembers the process that created its
+clients and drops them when it is used from another one; the next call
+connects again in the new process.
+
+warm_up() opens the connections, loads the product cache, queues the image
+validations left pending by a stopped worker and starts the order journal's
+flusher up front. The gunicorn configuration calls it when a worker starts,
+before it accepts requests, so the first request does not pay for
+connection setup.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionManager:
+    """Base class of connection managers whose clients are created lazily, once per process"""
+    _managers = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Process that created the manager's current clients
+        cls._pid = None
+        cls._lifecycle_lock = threading.Lock()
+        ConnectionManager._managers.append(cls)
+
+    @classmethod
+    def _reset(cls):
+        """
+        Forget the manager's clients. Clients inherited from another process
+        are dropped without being shut down, as closing them from the child
+        would close the parent's sockets.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def connect(cls):
+        """Open the manager's connections now instead of on first use"""
+        raise NotImplementedError
+
+    @classmethod
+    def ensure_process(cls):
+        """Drop clients created by another process, such as the parent of a forked worker"""
+        pid = os.getpid()
+        if cls._pid != pid:
+            with cls._lifecycle_lock:
+                if cls._pid != pid:
+                    if cls._pid is not None:
+                        logger.info(f"Dropping {cls.__name__} connections inherited from process {cls._pid}")
+                    cls._reset()
+                    cls._pid = pid
+
+
+def registered_managers():
+    """Connection managers whose modules have been imported"""
+    return list(ConnectionManager._managers)
+
+
+def warm_up():
+    """
+    Connect to the configured databases and load the product cache.
+    Failures are logged rather than raised, leaving the connection to be
+    retried lazily by the first request that needs it.
+    Returns:
+        Dictionary of warm-up timings in milliseconds, keyed by step
+    """
+    # The product backend is chosen when the views are imported
+    from .views import DB_TYPE, Product
+    managers = [manager for manager in registered_managers() if manager.__module__ == Product.__module__]
+    if settings.ASTRA_TOKEN and settings.ASTRA_API_ENDPOINT:
+        from .order_models import AstraOrderDB
+        managers.append(AstraOrderDB)
+
+    timings = {}
+    for manager in managers:
+        started = time.perf_counter()
+        try:
+            manager.connect()
+            timings[manager.__name__] = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            logger.warning(f"Warm-up could not connect {manager.__name__}: {str(e)}")
+
+    started = time.perf_counter()
+    try:
+        Product.get_index()
+        timings['product_cache'] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        logger.warning(f"Warm-up could not load the product cache: {str(e)}")
+
+    # Background validations are lost when a worker stops; the products stay pending until queued again
+    started = time.perf_counter()
+    try:
+        if Product.resume_image_validation():
+            timings['image_validation'] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        logger.warning(f"Warm-up could not queue pending image validations: {str(e)}")
+
+    # Orders journaled before a restart are written as soon as the worker starts
+    from .order_journal import get_order_journal, order_journal_enabled
+    if order_journal_enabled():
+        try:
+            get_order_journal().start()
+        except Exception as e:
+            logger.warning(f"Warm-up could not start the order journal flusher: {str(e)}")
+
+    logger.info(f"Worker {os.getpid()} warmed up ({DB_TYPE}): {timings}")
+    return timings
@@ -0,0 +1,149 @@
+"""
+Fast-path JSON encoding for product responses.
+
+Produces the same bytes as rendering ProductSerializer output with the
+DRF JSONRenderer, without running DRF's per-field serialization. Encoded
+products are cached per product ID and index version, so an unchanged
+product is only encoded once.
+"""
+import logging
+
+from rest_framework.fields import BooleanField
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the rendering options of rest_framework.renderers.JSONRenderer
+# with the project's default (compact, unicode) settings
+_json_encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+_TRUE_VALUES = BooleanField.TRUE_VALUES
+_FALSE_VALUES = BooleanField.FALSE_VALUES
+
+
+def _to_bool(value):
+    if value in _TRUE_VALUES:
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    return bool(value)
+
+
+def _to_str_list(value):
+    return [str(item) if item is not None else None for item in value]
+
+
+def _to_dict(value):
+    return {str(key): item for key, item in value.items()}
+
+
+# (field name, converter, default) in ProductSerializer declaration order.
+# A default of _REQUIRED raises like DRF does for a missing required field;
+# _SKIP omits the field when the product does not have it.
+_REQUIRED = object()
+_SKIP = object()
+
+PRODUCT_FIELDS = (
+    ('_id', str, _SKIP),
+    ('name', str, _REQUIRED),
+    ('brand', str, _REQUIRED),
+    ('category', str, _REQUIRED),
+    ('price', int, _REQUIRED),
+    ('description', str, _REQUIRED),
+    ('specs', _to_dict, _SKIP),
+    ('images', _to_str_list, _SKIP),
+    ('image_url', str, _SKIP),
+    ('in_stock', _to_bool, True),
+    ('stock_quantity', int, 0),
+    ('images_status', str, _SKIP),
+)
+
+
+def product_representation(product, fields=None):
+    """
+    Convert a product dictionary to the ProductSerializer representation.
+    Args:
+        product: Product dictionary
+        fields: Optional iterable of field names to include (the ID is always included)
+    Returns:
+        Dictionary ready for JSON encoding
+    """
+    allowed = None if fields is None else set(fields) | {'_id'}
+    data = {}
+    for name, convert, default in PRODUCT_FIELDS:
+        if allowed is not None and name not in allowed:
+            continue
+        if name in product:
+            value = product[name]
+            data[name] = None if value is None else convert(value)
+        elif default is _SKIP:
+            continue
+        elif default is _REQUIRED:
+            raise KeyError(name)
+        else:
+            data[name] = default
+    return data
+
+
+def encode(data):
+    """Encode data to JSON bytes the same way the DRF JSONRenderer does"""
+    text = _json_encoder.encode(data)
+    # JSONRenderer escapes these so the output is also valid JavaScript
+    text = text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return text.encode('utf-8')
+
+
+class ProductEncoder:
+    """Encodes products to JSON, caching each product's encoded fragment"""
+
+    def __init__(self):
+        self._fragments = {}
+
+    def encode_product(self, product, version=None, fields=None):
+        """
+        Encode a single product.
+        Args:
+            product: Product dictionary
+            version: Version of the product in the catalog index; enables fragment caching
+            fields: Optional iterable of field names to include
+        Returns:
+            JSON bytes
+        """
+        if version is None or fields is not None:
+            return encode(product_representation(product, fields))
+
+        product_id = product.get('_id')
+        cached = self._fragments.get(product_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        fragment = encode(product_representation(product))
+        self._fragments[product_id] = (version, fragment)
+        return fragment
+
+    def encode_products(self, products, index=None, fields=None):
+        """
+        Encode a list of products to a JSON array.
+        Args:
+            products: List of product dictionaries
+            index: CatalogIndex the products come from, used for fragment versions
+            fields: Optional iterable of field names to include
+        Returns:
+            JSON bytes
+        """
+        if index is not None and len(self._fragments) > 2 * len(index) + 64:
+            self.prune(index)
+
+        version_of = index.version_of if index is not None else (lambda product_id: None)
+        return b'[' + b','.join(
+            self.encode_product(product, version_of(product.get('_id')), fields)
+            for product in products
+        ) + b']'
+
+    def prune(self, index):
+        """Forget fragments of products that are no longer in the index"""
+        for product_id in [product_id for product_id in self._fragments if product_id not in index]:
+            del self._fragments[product_id]
+
+
+product_encoder = ProductEncoder()
@@ -0,0 +1,269 @@
+"""
+Concurrent image URL validation with a TTL cache of results.
+
+A product is only saved when each of its image URLs answers a HEAD request
+with 200. The checks for one product run in parallel on a shared thread
+pool over a pooled requests.Session, bounded by one overall deadline, and
+each URL's result is cached so re-saving a product or reusing CDN images
+does not go back to the network.
+
+In deferred mode (IMAGE_VALIDATION_MODE = 'deferred') products are saved
+with images_status 'pending' and DeferredImageValidation checks their
+images on a background pool, recording 'verified' or 'broken' afterwards.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Outcome of checking one URL; status is None and error is set when the
+# request itself failed
+ImageCheck = namedtuple('ImageCheck', ['url', 'ok', 'status', 'error'])
+
+# Values of a product's images_status while its images are validated in the background
+IMAGES_PENDING = 'pending'
+IMAGES_VERIFIED = 'verified'
+IMAGES_BROKEN = 'broken'
+
+
+class ImageValidator:
+    """Checks image URLs concurrently and remembers the results for a while"""
+
+    def __init__(self, workers=8, timeout=5, deadline=10, cache_ttl=3600, failure_ttl=60, max_entries=10000):
+        """
+        Args:
+            workers: Size of the thread pool and of the HTTP connection pool
+            timeout: Timeout of a single HEAD request in seconds
+            deadline: Time allowed for checking all images of one product in seconds
+            cache_ttl: Seconds to remember a reachable URL (0 disables caching)
+            failure_ttl: Seconds to remember an unreachable URL (0 disables caching)
+            max_entries: Maximum number of cached URLs
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cache_ttl = cache_ttl
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._results = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+        self._pid = None
+
+    def _resources(self):
+        """Return the HTTP session and thread pool, creating them again after a fork"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='image-validation'
+                    )
+                    self._pid = os.getpid()
+        return self._session, self._executor
+
+    def _cached(self, url):
+        entry = self._results.get(url)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _store(self, check):
+        ttl = self.cache_ttl if check.ok else self.failure_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            if check.url not in self._results and len(self._results) >= self.max_entries:
+                now = time.monotonic()
+                for url in [url for url, entry in self._results.items() if entry[0] <= now]:
+                    del self._results[url]
+                if len(self._results) >= self.max_entries:
+                    # Drop the oldest entry; dicts keep insertion order
+                    self._results.pop(next(iter(self._results)))
+            self._results[check.url] = (time.monotonic() + ttl, check)
+
+    def _head(self, session, url):
+        try:
+            response = session.head(url, timeout=self.timeout, allow_redirects=True)
+            check = ImageCheck(url, response.status_code == 200, response.status_code, None)
+        except requests.RequestException as e:
+            check = ImageCheck(url, False, None, str(e))
+        self._store(check)
+        return check
+
+    def check(self, images, deadline=None):
+        """
+        Check image URLs concurrently, using cached results where possible.
+        Args:
+            images: List of image URL strings
+            deadline: Seconds to wait for all checks; defaults to the validator's deadline
+        Returns:
+            Dictionary mapping each URL to its ImageCheck. URLs whose check did
+            not finish before the deadline are left out.
+        """
+        results = {}
+        pending = []
+        for url in dict.fromkeys(images):
+            cached = self._cached(url)
+            if cached is not None:
+                results[url] = cached
+            else:
+                pending.append(url)
+
+        self.cache_hits += len(results)
+        self.cache_misses += len(pending)
+
+        if pending:
+            session, executor = self._resources()
+            futures = {executor.submit(self._head, session, url): url for url in pending}
+            done, not_done = wait(futures, timeout=self.deadline if deadline is None else deadline)
+            for future in done:
+                results[futures[future]] = future.result()
+            for future in not_done:
+                future.cancel()
+
+        return results
+
+    def validate(self, images):
+        """
+        Validate that image URLs are accessible.
+        Args:
+            images: List of image URL strings
+        Raises:
+            ValueError: If any image URL is not accessible or could not be checked in time
+        """
+        if not images or not isinstance(images, list):
+            raise ValueError("Images must be a non-empty list")
+
+        results = self.check(images)
+
+        for idx, url in enumerate(images):
+            check = results.get(url)
+            if check is None:
+                raise ValueError(f"Timed out validating image {idx + 1} URL: {url}")
+            if check.error is not None:
+                raise ValueError(f"Failed to validate image {idx + 1} URL: {url}. Error: {check.error}")
+            if not check.ok:
+                raise ValueError(
+                    f"Image {idx + 1} URL is not accessible (status: {check.status}): {url}"
+                )
+
+        logger.info(f"Validated {len(images)} images")
+
+    def clear(self):
+        """Forget all cached results"""
+        with self._lock:
+            self._results.clear()
+
+
+class DeferredImageValidation:
+    """Validates the images of products that were already saved, on a background thread pool"""
+
+    def __init__(self, validator, workers=2):
+        """
+        Args:
+            validator: ImageValidator used for the checks
+            workers: Number of products validated at the same time
+        """
+        self.validator = validator
+        self.workers = workers
+        self.pending = 0
+        self.verified = 0
+        self.broken = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        """Return the thread pool, creating it again after a fork"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='deferred-image-validation'
+                    )
+                    self.pending = 0
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, product_id, images, record):
+        """
+        Queue a product's images for validation.
+        Args:
+            product_id: ID of the saved product
+            images: List of image URL strings
+            record: Callable taking (product_id, images_status, error) that stores the outcome
+        """
+        executor = self._get_executor()
+        with self._lock:
+            self.pending += 1
+        executor.submit(self._run, product_id, list(images), record)
+
+    def _run(self, product_id, images, record):
+        try:
+            try:
+                self.validator.validate(images)
+                images_status, error = IMAGES_VERIFIED, None
+            except ValueError as e:
+                images_status, error = IMAGES_BROKEN, str(e)
+
+            record(product_id, images_status, error)
+            with self._lock:
+                if images_status == IMAGES_VERIFIED:
+                    self.verified += 1
+                else:
+                    self.broken += 1
+            logger.info(f"Images of product {product_id} are {images_status}")
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.error(f"Failed to record image status of product {product_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stats(self):
+        """Return validation counters for monitoring"""
+        return {
+            'pending': self.pending,
+            'verified': self.verified,
+            'broken': self.broken,
+            'failures': self.failures,
+            'url_cache_hits': self.validator.cache_hits,
+            'url_cache_misses': self.validator.cache_misses,
+        }
+
+
+def deferred_validation_enabled():
+    """Whether products are saved before their images are validated"""
+    return getattr(settings, 'IMAGE_VALIDATION_MODE', 'sync') == 'deferred'
+
+
+image_validator = ImageValidator(
+    workers=getattr(settings, 'IMAGE_VALIDATION_WORKERS', 8),
+    timeout=getattr(settings, 'IMAGE_VALIDATION_TIMEOUT', 5),
+    deadline=getattr(settings, 'IMAGE_VALIDATION_DEADLINE', 10),
+    cache_ttl=getattr(settings, 'IMAGE_VALIDATION_CACHE_TTL', 3600),
+    failure_ttl=getattr(settings, 'IMAGE_VALIDATION_FAILURE_TTL', 60),
+)
+
+deferred_image_validation = DeferredImageValidation(
+    image_validator,
+    workers=getattr(settings, 'IMAGE_VALIDATION_BACKGROUND_WORKERS', 2),
+)
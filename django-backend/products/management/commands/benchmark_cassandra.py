@@ -0,0 +1,53 @@
+"""
+Management command to compare raw CQL strings with cached prepared statements on Cassandra.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import CassandraDB, SELECT_PRODUCT
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product lookups by ID with raw CQL strings and with cached prepared statements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Number of timed passes over the sampled products')
+        parser.add_argument('--sample', type=int, default=100,
+                            help='Number of product IDs to look up per pass')
+
+    def _time(self, func, ids, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for product_id in ids:
+                func(product_id)
+        return (time.perf_counter() - started) / (iterations * len(ids)) * 1000
+
+    def handle(self, *args, **options):
+        try:
+            session = CassandraDB.get_session()
+        except Exception as e:
+            raise CommandError(f'Cannot connect to Cassandra: {str(e)}')
+
+        ids = [row.id for row in session.execute(f"SELECT id FROM products LIMIT {options['sample']}")]
+        if not ids:
+            raise CommandError('The products table is empty; import some products first')
+
+        iterations = options['iterations']
+        self.stdout.write(f'Looking up {len(ids)} products, {iterations} passes each')
+
+        raw_ms = self._time(
+            lambda product_id: session.execute("SELECT * FROM products WHERE id = %s", (product_id,)).one(),
+            ids, iterations
+        )
+        prepared_ms = self._time(
+            lambda product_id: session.execute(CassandraDB.prepare(SELECT_PRODUCT), (product_id,)).one(),
+            ids, iterations
+        )
+
+        self.stdout.write(f'Raw CQL string:            {raw_ms:8.3f} ms/query')
+        self.stdout.write(f'Cached prepared statement: {prepared_ms:8.3f} ms/query')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(CassandraDB._prepared)} statements prepared on this session'
+        ))
@@ -0,0 +1,78 @@
+"""
+Management command to compare the fast product encoder with ProductSerializer.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from products.catalog_index import CatalogIndex
+from products.encoders import ProductEncoder
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the fast product encoder against ProductSerializer and check the output matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Number of timed runs per encoder')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Benchmark a generated catalog of this size instead of the configured database')
+
+    def _synthetic_catalog(self, size):
+        products = []
+        for i in range(size):
+            products.append({
+                '_id': f'synthetic-{i}',
+                'name': f'Phone {i}',
+                'brand': ('Samsung', 'Apple', 'Tecno', 'Infinix')[i % 4],
+                'category': 'Phone',
+                'price': 1000000 + i * 137,
+                'description': 'A synthetic phone used for encoder benchmarks — “quoted” text included.',
+                'specs': {'ram': '8GB', 'storage': '256GB', 'price_tier': 'Mid-Range', 'use_case': 'General'},
+                'images': [f'https://images.example.com/{i}/{n}.jpg' for n in range(4)],
+                'in_stock': i % 3 != 0,
+                'stock_quantity': i % 50,
+            })
+        return products
+
+    def _time(self, func, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            result = func()
+        return result, (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if options['synthetic']:
+            products = self._synthetic_catalog(options['synthetic'])
+        else:
+            from products.views import Product
+            products = Product.get_all()
+
+        index = CatalogIndex(products)
+        renderer = JSONRenderer()
+        encoder = ProductEncoder()
+
+        self.stdout.write(f'Encoding {len(products)} products, {iterations} iterations each')
+
+        drf_body, drf_ms = self._time(
+            lambda: renderer.render(ProductSerializer(products, many=True).data), iterations
+        )
+        cold_body, cold_ms = self._time(
+            lambda: ProductEncoder().encode_products(products, index), iterations
+        )
+        encoder.encode_products(products, index)
+        warm_body, warm_ms = self._time(
+            lambda: encoder.encode_products(products, index), iterations
+        )
+
+        self.stdout.write(f'ProductSerializer + JSONRenderer: {drf_ms:8.2f} ms')
+        self.stdout.write(f'Fast encoder (cold fragments):    {cold_ms:8.2f} ms')
+        self.stdout.write(f'Fast encoder (cached fragments):  {warm_ms:8.2f} ms')
+
+        if drf_body == cold_body == warm_body:
+            self.stdout.write(self.style.SUCCESS(f'✓ Output is byte-for-byte identical ({len(drf_body)} bytes)'))
+        else:
+            self.stdout.write(self.style.ERROR('✗ Encoded output differs from ProductSerializer'))
@@ -0,0 +1,63 @@
+"""
+Management command to benchmark image URL validation against a local stub HTTP server.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+import requests
+
+from products.image_validation import ImageValidator
+from products.tests.stub_image_server import StubImageServer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent, cached image validation against sequential HEAD requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=6,
+                            help='Number of images per product')
+        parser.add_argument('--latency', type=float, default=0.1,
+                            help='Seconds the stub server waits before answering')
+
+    def _time(self, func):
+        started = time.perf_counter()
+        try:
+            func()
+            error = None
+        except ValueError as e:
+            error = str(e)
+        return (time.perf_counter() - started) * 1000, error
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+        server = StubImageServer(latency=latency, slow_latency=latency * 50).start()
+        base_url = server.base_url
+
+        try:
+            images = [f'{base_url}/images/{n}.jpg' for n in range(options['images'])]
+            validator = ImageValidator(workers=8, timeout=5, deadline=options['latency'] * 20)
+
+            def sequential():
+                for url in images:
+                    requests.head(url, timeout=5, allow_redirects=True)
+
+            sequential_ms, _ = self._time(sequential)
+            cold_ms, cold_error = self._time(lambda: validator.validate(images))
+            warm_ms, warm_error = self._time(lambda: validator.validate(images))
+            _, missing_error = self._time(lambda: validator.validate(images + [f'{base_url}/missing/x.jpg']))
+            slow_ms, slow_error = self._time(lambda: validator.validate([f'{base_url}/slow/x.jpg']))
+
+            self.stdout.write(f'Validating {len(images)} images, {options["latency"] * 1000:.0f} ms stub latency')
+            self.stdout.write(f'Sequential requests.head:  {sequential_ms:8.2f} ms')
+            self.stdout.write(f'Concurrent (cold cache):   {cold_ms:8.2f} ms')
+            self.stdout.write(f'Concurrent (cached):       {warm_ms:8.2f} ms')
+            self.stdout.write(f'Deadline ({validator.deadline:.1f} s) hit after {slow_ms:8.2f} ms')
+
+            if cold_error is None and warm_error is None and missing_error and slow_error:
+                self.stdout.write(self.style.SUCCESS('✓ Reachable images pass, missing and slow images are rejected'))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ Unexpected validation results: {cold_error}, {warm_error}, {missing_error}, {slow_error}'
+                ))
+        finally:
+            server.stop()
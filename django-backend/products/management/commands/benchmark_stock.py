@@ -0,0 +1,94 @@
+"""
+Management command to benchmark concurrent stock reservation on one product.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Race many buyers for the stock of one product and check that it is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=100,
+                            help='Units in stock when the sale starts')
+        parser.add_argument('--buyers', type=int, default=32,
+                            help='Concurrent buyers')
+        parser.add_argument('--quantity', type=int, default=1,
+                            help='Units each reservation takes')
+
+    def handle(self, *args, **options):
+        # The configured backend, as chosen by the views
+        from products.views import DB_TYPE, Product
+
+        stock, quantity = options['stock'], options['quantity']
+        created, errors = Product.bulk_create([{
+            'name': 'Stock reservation benchmark',
+            'brand': 'Benchmark',
+            'category': 'Accessory',
+            'price': 100,
+            'description': 'Temporary product created by benchmark_stock',
+            'specs': {},
+            'images': ['https://example.com/benchmark.jpg'],
+            'in_stock': True,
+            'stock_quantity': stock,
+        }])
+        if errors:
+            self.stdout.write(self.style.ERROR(f'✗ Could not create the benchmark product: {errors[0][1]}'))
+            return
+        product_id = created[0]['_id']
+        # bulk_create skips the product cache; load the product now so that the
+        # buyers race for stock instead of each reloading the catalog
+        Product.refresh_cache(wait=True)
+
+        reserved = []
+        rejected = []
+        failures = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['buyers'] + 1)
+
+        def buyer():
+            start.wait()
+            while True:
+                try:
+                    ok = Product.reserve_stock(product_id, quantity)
+                except Exception as e:
+                    with lock:
+                        failures.append(str(e))
+                    return
+                with lock:
+                    (reserved if ok else rejected).append(quantity)
+                if not ok:
+                    return
+
+        threads = [threading.Thread(target=buyer) for _ in range(options['buyers'])]
+        try:
+            for thread in threads:
+                thread.start()
+            start.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            units = sum(reserved)
+            remaining = (Product.get_by_id(product_id) or {}).get('stock_quantity')
+            attempts = len(reserved) + len(rejected) + len(failures)
+
+            self.stdout.write(f'Backend: {DB_TYPE}, {options["buyers"]} buyers, {stock} units in stock')
+            self.stdout.write(f'Reservations:  {len(reserved)} ({units} units), {len(rejected)} rejected, '
+                              f'{len(failures)} errors')
+            self.stdout.write(f'Elapsed:       {elapsed * 1000:8.2f} ms')
+            self.stdout.write(f'Throughput:    {attempts / elapsed:8.1f} attempts/s, '
+                              f'{len(reserved) / elapsed:8.1f} reservations/s')
+            self.stdout.write(f'Stock left:    {remaining}')
+
+            if units <= stock and remaining == stock - units and stock - units < quantity:
+                self.stdout.write(self.style.SUCCESS('✓ No oversell: every unit was sold exactly once'))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ Stock mismatch: {units} units reserved from {stock}, {remaining} left'
+                ))
+        finally:
+            Product.delete(product_id)
@@ -0,0 +1,47 @@
+"""
+Management command to export the product catalog as NDJSON or CSV.
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, export_lines, format_for
+
+
+class Command(BaseCommand):
+    help = 'Export all products as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help="File to write, or '-' for standard output (default)")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Output format (guessed from the file extension by default)')
+
+    def handle(self, *args, **options):
+        from products.views import Product
+
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+
+        try:
+            target = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {str(e)}')
+
+        try:
+            exported = 0
+
+            def products():
+                nonlocal exported
+                for product in Product.iter_products():
+                    exported += 1
+                    yield product
+
+            for line in export_lines(products(), fmt):
+                target.write(line)
+        finally:
+            if target is not sys.stdout:
+                target.close()
+
+        if target is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'✓ Exported {exported} products to {path}'))
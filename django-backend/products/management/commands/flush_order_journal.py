@@ -0,0 +1,20 @@
+"""
+Management command to write journaled orders to the database.
+"""
+from django.core.management.base import BaseCommand
+
+from products.order_journal import get_order_journal
+
+
+class Command(BaseCommand):
+    help = 'Write every order waiting in the local order journal to the database'
+
+    def handle(self, *args, **options):
+        journal = get_order_journal()
+        self.stdout.write(f'Orders waiting in {journal.path}: {journal.stats()["depth"]}')
+        try:
+            written = journal.drain()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Flush failed: {str(e)}'))
+            raise
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {written} orders'))
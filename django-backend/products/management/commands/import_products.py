@@ -0,0 +1,56 @@
+"""
+Management command to import products from an NDJSON or CSV file.
+"""
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, format_for, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import products from NDJSON or CSV, validating and writing them in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format (guessed from the file extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows validated and written together (default: BULK_CHUNK_SIZE)')
+        parser.add_argument('--skip-image-validation', action='store_true',
+                            help='Do not check that image URLs are reachable')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the rows without writing them')
+
+    def handle(self, *args, **options):
+        from products.views import Product, DB_TYPE
+
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {str(e)}')
+
+        self.stdout.write(f'Importing {fmt} products into {DB_TYPE}...')
+        try:
+            result = import_products(
+                Product,
+                read_rows(source, fmt),
+                chunk_size=options['chunk_size'],
+                validate_images=not options['skip_image_validation'],
+                dry_run=options['dry_run'],
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for error in result.errors:
+            self.stdout.write(self.style.ERROR(f"✗ Row {error['row']}: {json.dumps(error['errors'])}"))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'✓ {result.valid}/{result.rows} rows are valid (dry run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ Created {len(result.created)}/{result.rows} products'))
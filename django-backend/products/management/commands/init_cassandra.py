@@ -2,12 +2,16 @@
 Management command to initialize Cassandra keyspace and tables.
 """
 from django.core.management.base import BaseCommand
-from products.models import CassandraDB
+from products.models import CassandraDB, Product
 
 
 class Command(BaseCommand):
     help = 'Initialize Cassandra keyspace and create tables'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Write the query-table rows of products already in the products table')
+
     def handle(self, *args, **options):
         self.stdout.write('Initializing Cassandra...')
         
@@ -16,7 +20,13 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('✓ Cassandra initialized successfully'))
             self.stdout.write(self.style.SUCCESS(f'✓ Keyspace created/verified'))
             self.stdout.write(self.style.SUCCESS(f'✓ Products table created/verified'))
-            self.stdout.write(self.style.SUCCESS(f'✓ Indexes created/verified'))
+            self.stdout.write(self.style.SUCCESS(f'✓ Query tables created/verified'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'✗ Error initializing Cassandra: {str(e)}'))
             raise
+        
+        if options['backfill']:
+            written, errors = Product.rebuild_lookup_tables()
+            self.stdout.write(self.style.SUCCESS(f'✓ Backfilled query tables for {written} products'))
+            for product_id, message in errors:
+                self.stdout.write(self.style.ERROR(f'✗ {product_id}: {message}'))
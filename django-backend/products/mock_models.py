@@ -1,18 +1,25 @@
 """
 Mock product models for running without database
 """
+import copy
 import uuid
-import json
 import logging
-from typing import List, Dict, Optional
+import threading
+
+from .backends import ProductBackend, normalize_filters
+from .catalog_index import facet_value
 
 logger = logging.getLogger(__name__)
 
-# In-memory storage
-MOCK_PRODUCTS = []
+# In-memory storage, keyed by product ID
+MOCK_PRODUCTS = {}
 
-class MockProduct:
+class MockProduct(ProductBackend):
     """Mock Product model for in-memory operations"""
+    name = 'mock'
+    source = 'mock'
+    # Held by every write, so a read-modify-write of a product never loses another one
+    _write_lock = threading.Lock()
     
     @staticmethod
     def _validate_image_urls(images):
@@ -21,21 +28,6 @@ class MockProduct:
             raise ValueError("Images must be a non-empty list")
         logger.info(f"Mock: Validated {len(images)} images")
     
-    @staticmethod
-    def _prepare_product_data(data):
-        """Prepare product data, ensuring backward compatibility"""
-        product_data = data.copy()
-        
-        # Handle backward compatibility: convert image_url to images array
-        if 'image_url' in product_data and 'images' not in product_data:
-            product_data['images'] = [product_data.pop('image_url')]
-        
-        # Ensure images is always a list
-        if 'images' in product_data and not isinstance(product_data['images'], list):
-            product_data['images'] = [product_data['images']]
-        
-        return product_data
-    
     @classmethod
     def create(cls, data):
         """Create a new product in memory"""
@@ -48,62 +40,108 @@ class MockProduct:
         product_id = str(uuid.uuid4())
         product_data['_id'] = product_id
         
-        MOCK_PRODUCTS.append(product_data)
+        with cls._write_lock:
+            MOCK_PRODUCTS[product_id] = product_data
+            cls._cache_append(copy.deepcopy(product_data))
         logger.info(f"Mock: Created product {product_data.get('name')} (ID: {product_id})")
         
         return product_data
     
     @classmethod
-    def get_all(cls, filters=None):
-        """Get all products with optional filtering"""
-        products = MOCK_PRODUCTS.copy()
-        
-        if filters:
-            if 'brand' in filters:
-                products = [p for p in products if p.get('brand') == filters['brand']]
-            if 'category' in filters:
-                products = [p for p in products if p.get('category') == filters['category']]
-            if 'in_stock' in filters:
-                products = [p for p in products if p.get('in_stock') == filters['in_stock']]
-        
-        logger.info(f"Mock: Retrieved {len(products)} products")
-        return products
+    def bulk_create(cls, items):
+        """Add already validated products in memory, keeping a supplied '_id'; returns (created products, errors)"""
+        created = []
+        for data in items:
+            product_data = cls._prepare_product_data(data)
+            product_data['_id'] = str(product_data.get('_id') or uuid.uuid4())
+            with cls._write_lock:
+                MOCK_PRODUCTS[product_data['_id']] = product_data
+            created.append(product_data)
+        logger.info(f"Mock: Bulk created {len(created)} products")
+        return created, []
+    
+    @classmethod
+    def check_health(cls):
+        """The in-memory database is always available"""
+        return {
+            'database': 'mock (in-memory)',
+            'message': 'Django backend is running with mock database'
+        }
+    
+    @classmethod
+    def iter_products(cls, filters=None, fetch_size=None):
+        """Iterate over copies of the in-memory products matching the filters"""
+        filters = normalize_filters(filters)
+        for product in list(MOCK_PRODUCTS.values()):
+            if all(facet_value(product, facet) == value for facet, value in filters.items()):
+                yield copy.deepcopy(product)
+    
+    @classmethod
+    def _fetch_one(cls, product_id):
+        """Get a copy of a product that is not cached yet"""
+        product = MOCK_PRODUCTS.get(product_id)
+        return copy.deepcopy(product) if product is not None else None
     
     @classmethod
-    def get_by_id(cls, product_id):
-        """Get a single product by ID"""
-        for product in MOCK_PRODUCTS:
-            if product['_id'] == product_id:
-                return product
-        return None
+    def _fetch_many(cls, product_ids):
+        """Get copies of several products that are not cached yet"""
+        return {
+            product_id: copy.deepcopy(MOCK_PRODUCTS[product_id])
+            for product_id in product_ids if product_id in MOCK_PRODUCTS
+        }
     
     @classmethod
-    def update(cls, product_id, data):
+    def update(cls, product_id, data, validate_images=True):
         """Update a product"""
         product_data = cls._prepare_product_data(data)
         
         # Mock validation
-        if 'images' in product_data:
+        if validate_images and 'images' in product_data:
             cls._validate_image_urls(product_data['images'])
         
-        for i, product in enumerate(MOCK_PRODUCTS):
-            if product['_id'] == product_id:
-                MOCK_PRODUCTS[i].update(product_data)
-                logger.info(f"Mock: Updated product {product_id}")
-                return True
-        
-        return False
+        with cls._write_lock:
+            product = MOCK_PRODUCTS.get(product_id)
+            if product is None:
+                return False
+            MOCK_PRODUCTS[product_id] = {**product, **product_data}
+            cls._cache_replace(product_id, product_data)
+        logger.info(f"Mock: Updated product {product_id}")
+        return True
+    
+    @classmethod
+    def _set_stock(cls, product_id, change):
+        """Apply a stock change under the write lock; returns False if it would go below zero"""
+        with cls._write_lock:
+            product = MOCK_PRODUCTS.get(product_id)
+            if product is None:
+                return False
+            stock_quantity = (product.get('stock_quantity') or 0) + change
+            if stock_quantity < 0:
+                return False
+            patch = {'stock_quantity': stock_quantity, 'in_stock': stock_quantity > 0}
+            MOCK_PRODUCTS[product_id] = {**product, **patch}
+            cls._cache_replace(product_id, patch)
+        return True
+    
+    @classmethod
+    def reserve_stock(cls, product_id, quantity):
+        """Take quantity units of a product's stock, unless fewer are left"""
+        return cls._set_stock(product_id, -quantity)
+    
+    @classmethod
+    def release_stock(cls, product_id, quantity):
+        """Give quantity units back to a product's stock"""
+        return cls._set_stock(product_id, quantity)
     
     @classmethod
     def delete(cls, product_id):
         """Delete a product"""
-        for i, product in enumerate(MOCK_PRODUCTS):
-            if product['_id'] == product_id:
-                del MOCK_PRODUCTS[i]
-                logger.info(f"Mock: Deleted product {product_id}")
-                return True
-        
-        return False
+        with cls._write_lock:
+            if MOCK_PRODUCTS.pop(product_id, None) is None:
+                return False
+            cls._cache_remove(product_id)
+        logger.info(f"Mock: Deleted product {product_id}")
+        return True
 
 # Initialize with some sample data
 def initialize_mock_data():
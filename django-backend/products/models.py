@@ -1,28 +1,125 @@
 """
 Product models and Cassandra connection management.
 """
-from cassandra.cluster import Cluster
+from cassandra.cluster import Cluster, EXEC_PROFILE_DEFAULT, ExecutionProfile
 from cassandra.auth import PlainTextAuthProvider
-from cassandra.query import SimpleStatement
+from cassandra.policies import (
+    ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+)
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType, SimpleStatement
 from django.conf import settings
-import requests
 import logging
 import uuid
 import json
 import os
+import threading
+
+from .backends import ProductBackend, normalize_filters
+from .catalog_index import SPEC_FACETS, facet_value
+from .connections import ConnectionManager
+from .paging import decode_token, encode_token
 
 logger = logging.getLogger(__name__)
 
+# Columns of the products table that can be written; anything else in the
+# product data is not stored by the Cassandra backend
+PRODUCT_COLUMNS = (
+    'name', 'brand', 'category', 'price', 'description',
+    'specs', 'images', 'in_stock', 'stock_quantity',
+)
+
+INSERT_PRODUCT = (
+    f"INSERT INTO products (id, {', '.join(PRODUCT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (len(PRODUCT_COLUMNS) + 1))})"
+)
+# CQL types of the product columns
+COLUMN_TYPES = {
+    'name': 'text',
+    'brand': 'text',
+    'category': 'text',
+    'price': 'int',
+    'description': 'text',
+    'specs': 'text',
+    'images': 'list<text>',
+    'in_stock': 'boolean',
+    'stock_quantity': 'int',
+}
+
+# Query tables holding a full copy of each product, partitioned by the
+# column a listing filters on and clustered by price, so filtered reads hit
+# one partition instead of a secondary index scan with ALLOW FILTERING.
+# (table, partition column); price_tier lives inside the specs JSON.
+LOOKUP_TABLES = (
+    ('products_by_brand', 'brand'),
+    ('products_by_category', 'category'),
+    ('products_by_price_tier', 'price_tier'),
+)
 
-class CassandraDB:
+SELECT_PRODUCT = "SELECT * FROM products WHERE id = ?"
+SELECT_ALL_PRODUCTS = "SELECT * FROM products"
+DELETE_PRODUCT = "DELETE FROM products WHERE id = ?"
+# Compare-and-set of a product's stock. The key columns of the query tables
+# are part of the condition, so the query-table rows updated afterwards are
+# still the product's.
+SET_STOCK = (
+    "UPDATE products SET stock_quantity = ?, in_stock = ? WHERE id = ? "
+    "IF stock_quantity = ? AND brand = ? AND category = ? AND price = ? AND specs = ?"
+)
+
+
+class CassandraDB(ConnectionManager):
     """Cassandra connection manager (supports local and Astra)"""
     _cluster = None
     _session = None
+    _prepared = {}
+    _prepared_lock = threading.Lock()
+    
+    @staticmethod
+    def execution_profile():
+        """
+        Build the default execution profile from settings.
+        Requests are routed to a replica of their partition in the local data
+        center, and reads can be retried speculatively on another replica.
+        """
+        speculative_execution = None
+        if settings.CASSANDRA_SPECULATIVE_DELAY > 0:
+            speculative_execution = ConstantSpeculativeExecutionPolicy(
+                delay=settings.CASSANDRA_SPECULATIVE_DELAY,
+                max_attempts=settings.CASSANDRA_SPECULATIVE_ATTEMPTS
+            )
+        return ExecutionProfile(
+            load_balancing_policy=TokenAwarePolicy(
+                DCAwareRoundRobinPolicy(local_dc=settings.CASSANDRA_LOCAL_DC or None)
+            ),
+            request_timeout=settings.CASSANDRA_REQUEST_TIMEOUT,
+            speculative_execution_policy=speculative_execution
+        )
+    
+    @classmethod
+    def _reset(cls):
+        cls._cluster = None
+        cls._session = None
+        cls._prepared = {}
+        cls._prepared_lock = threading.Lock()
+    
+    @classmethod
+    def connect(cls):
+        cls.get_session()
     
     @classmethod
     def get_cluster(cls):
         """Get or create Cassandra cluster"""
+        cls.ensure_process()
         if cls._cluster is None:
+            options = {
+                'execution_profiles': {EXEC_PROFILE_DEFAULT: cls.execution_profile()},
+                'connect_timeout': settings.CASSANDRA_CONNECT_TIMEOUT,
+                'executor_threads': settings.CASSANDRA_EXECUTOR_THREADS,
+            }
+            if settings.CASSANDRA_PROTOCOL_VERSION:
+                options['protocol_version'] = settings.CASSANDRA_PROTOCOL_VERSION
+            
             # Check if using Astra (cloud)
             if hasattr(settings, 'ASTRA_SECURE_BUNDLE_PATH') and settings.ASTRA_SECURE_BUNDLE_PATH:
                 # Astra connection with secure bundle
@@ -37,17 +134,14 @@ class CassandraDB:
                     password=settings.ASTRA_TOKEN
                 )
                 
-                cls._cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider)
+                cls._cluster = Cluster(cloud=cloud_config, auth_provider=auth_provider, **options)
                 logger.info(f"Connected to Astra Cassandra (cloud)")
             else:
                 # Local Cassandra connection
-                from cassandra.policies import RoundRobinPolicy
-                
                 cls._cluster = Cluster(
                     contact_points=settings.CASSANDRA_HOSTS,
                     port=settings.CASSANDRA_PORT,
-                    load_balancing_policy=RoundRobinPolicy(),
-                    protocol_version=4
+                    **options
                 )
                 logger.info(f"Connected to Cassandra at {settings.CASSANDRA_HOSTS}:{settings.CASSANDRA_PORT}")
         
@@ -56,9 +150,12 @@ class CassandraDB:
     @classmethod
     def get_session(cls):
         """Get session instance"""
+        cls.ensure_process()
         if cls._session is None:
             cluster = cls.get_cluster()
             cls._session = cluster.connect()
+            # Prepared statements belong to the session they were prepared on
+            cls._prepared = {}
             
             # Use keyspace
             keyspace = getattr(settings, 'ASTRA_DB_KEYSPACE', settings.CASSANDRA_KEYSPACE)
@@ -66,6 +163,68 @@ class CassandraDB:
             logger.info(f"Using keyspace: {keyspace}")
         return cls._session
     
+    @classmethod
+    def prepare(cls, query):
+        """
+        Prepare a CQL statement once per session and reuse it afterwards.
+        Prepared statements are parsed by the cluster only once and carry
+        the routing key, so token-aware load balancing can use them.
+        Args:
+            query: CQL text with '?' placeholders
+        Returns:
+            PreparedStatement
+        """
+        cls.ensure_process()
+        statement = cls._prepared.get(query)
+        if statement is None:
+            session = cls.get_session()
+            with cls._prepared_lock:
+                statement = cls._prepared.get(query)
+                if statement is None:
+                    statement = session.prepare(query)
+                    # Only reads are safe to send to a second replica speculatively
+                    statement.is_idempotent = query.startswith('SELECT')
+                    cls._prepared[query] = statement
+                    logger.info(f"Prepared CQL statement: {query}")
+        return statement
+    
+    @classmethod
+    def execute_fanout(cls, statement, parameters, concurrency=None):
+        """
+        Run a prepared statement once per set of parameters with execute_async,
+        keeping up to concurrency queries in flight instead of waiting for
+        each round trip in turn.
+        Args:
+            statement: PreparedStatement
+            parameters: List of parameter tuples
+            concurrency: Queries in flight, defaulting to CASSANDRA_FANOUT_CONCURRENCY
+        Returns:
+            List of (success, ResultSet or exception) in the order of parameters
+        """
+        session = cls.get_session()
+        concurrency = concurrency or settings.CASSANDRA_FANOUT_CONCURRENCY
+        outcomes = []
+        for start in range(0, len(parameters), concurrency):
+            futures = [session.execute_async(statement, params) for params in parameters[start:start + concurrency]]
+            for future in futures:
+                try:
+                    outcomes.append((True, future.result()))
+                except Exception as e:
+                    outcomes.append((False, e))
+        return outcomes
+    
+    @staticmethod
+    def lookup_table_schema(table, key):
+        """Return the CREATE TABLE statement of a query table"""
+        columns = {key: 'text', 'id': 'uuid', **COLUMN_TYPES}
+        definitions = ',\n                '.join(f"{name} {cql_type}" for name, cql_type in columns.items())
+        return f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {definitions},
+                PRIMARY KEY (({key}), price, id)
+            ) WITH CLUSTERING ORDER BY (price ASC, id ASC)
+        """
+    
     @classmethod
     def initialize_keyspace(cls):
         """Create keyspace and tables if they don't exist"""
@@ -97,17 +256,9 @@ class CassandraDB:
                 )
             """)
             
-            # Create index for brand filtering
-            try:
-                session.execute("CREATE INDEX IF NOT EXISTS ON products (brand)")
-            except Exception as e:
-                logger.warning(f"Brand index might already exist: {e}")
-            
-            # Create index for category filtering
-            try:
-                session.execute("CREATE INDEX IF NOT EXISTS ON products (category)")
-            except Exception as e:
-                logger.warning(f"Category index might already exist: {e}")
+            # Create query tables for filtered listings
+            for table, key in LOOKUP_TABLES:
+                session.execute(cls.lookup_table_schema(table, key))
             
             logger.info("Cassandra keyspace and tables initialized")
             session.shutdown()
@@ -117,31 +268,10 @@ class CassandraDB:
             raise
 
 
-class Product:
+class Product(ProductBackend):
     """Product model for Cassandra operations"""
-    
-    @staticmethod
-    def _validate_image_urls(images):
-        """
-        Validate that image URLs are accessible.
-        Args:
-            images: List of image URL strings
-        Raises:
-            ValueError: If any image URL is not accessible
-        """
-        if not images or not isinstance(images, list):
-            raise ValueError("Images must be a non-empty list")
-        
-        for idx, url in enumerate(images):
-            try:
-                response = requests.head(url, timeout=5, allow_redirects=True)
-                if response.status_code != 200:
-                    raise ValueError(
-                        f"Image {idx + 1} URL is not accessible (status: {response.status_code}): {url}"
-                    )
-                logger.info(f"Image {idx + 1} validated: {url}")
-            except requests.RequestException as e:
-                raise ValueError(f"Failed to validate image {idx + 1} URL: {url}. Error: {str(e)}")
+    name = 'cassandra'
+    source = 'Cassandra'
     
     @staticmethod
     def _prepare_product_data(data):
@@ -149,15 +279,7 @@ class Product:
         Prepare product data for storage, ensuring backward compatibility.
         Converts old 'image_url' to 'images' array if needed.
         """
-        product_data = data.copy()
-        
-        # Handle backward compatibility: convert image_url to images array
-        if 'image_url' in product_data and 'images' not in product_data:
-            product_data['images'] = [product_data.pop('image_url')]
-        
-        # Ensure images is always a list
-        if 'images' in product_data and not isinstance(product_data['images'], list):
-            product_data['images'] = [product_data['images']]
+        product_data = ProductBackend._prepare_product_data(data)
         
         # Convert specs dict to JSON string for Cassandra
         if 'specs' in product_data and isinstance(product_data['specs'], dict):
@@ -206,12 +328,20 @@ class Product:
         session = CassandraDB.get_session()
         product_id = uuid.uuid4()
         
-        query = """
-            INSERT INTO products (id, name, brand, category, price, description, specs, images, in_stock, stock_quantity)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        session.execute(cls._insert_batch(product_id, product_data))
         
-        session.execute(query, (
+        product_data['_id'] = str(product_id)
+        
+        # Append to the cached catalog instead of invalidating it
+        cls._cache_append(cls._document(product_id, product_data))
+        logger.info(f"Created product: {product_data.get('name')} (ID: {product_id})")
+        
+        return product_data
+    
+    @staticmethod
+    def _insert_parameters(product_id, product_data):
+        """Bind values for INSERT_PRODUCT"""
+        return (
             product_id,
             product_data.get('name'),
             product_data.get('brand'),
@@ -222,115 +352,507 @@ class Product:
             product_data.get('images', []),
             product_data.get('in_stock', True),
             product_data.get('stock_quantity', 0)
-        ))
+        )
+    
+    @staticmethod
+    def _lookup_key(key, product_data):
+        """Return a product's partition key in a query table, or None if it has none"""
+        if key == 'price_tier':
+            specs = product_data.get('specs')
+            if isinstance(specs, str):
+                try:
+                    specs = json.loads(specs) if specs else {}
+                except ValueError:
+                    specs = {}
+            value = specs.get('price_tier') if isinstance(specs, dict) else None
+        else:
+            value = product_data.get(key)
+        return value if isinstance(value, str) and value else None
+    
+    @classmethod
+    def _add_lookup_inserts(cls, batch, product_id, product_data):
+        """Add the INSERTs of a product's query-table rows to a batch"""
+        values = dict(zip(PRODUCT_COLUMNS, cls._insert_parameters(product_id, product_data)[1:]))
+        # price is a clustering column and cannot be null
+        values['price'] = values['price'] or 0
+        for table, key in LOOKUP_TABLES:
+            value = cls._lookup_key(key, product_data)
+            if value is None:
+                continue
+            columns = {**values, key: value}
+            statement = CassandraDB.prepare(
+                f"INSERT INTO {table} (id, {', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 1))})"
+            )
+            batch.add(statement, (product_id,) + tuple(columns.values()))
+    
+    @classmethod
+    def _add_lookup_deletes(cls, batch, product_id, product_data, keep=None):
+        """
+        Add the DELETEs of a product's query-table rows to a batch.
+        Args:
+            product_data: Column values the rows were written with
+            keep: New column values; rows they would overwrite in place are not deleted
+        """
+        price = product_data.get('price') or 0
+        for table, key in LOOKUP_TABLES:
+            value = cls._lookup_key(key, product_data)
+            if value is None:
+                continue
+            if keep is not None and value == cls._lookup_key(key, keep) and price == (keep.get('price') or 0):
+                continue
+            statement = CassandraDB.prepare(f"DELETE FROM {table} WHERE {key} = ? AND price = ? AND id = ?")
+            batch.add(statement, (value, price, product_id))
+    
+    @classmethod
+    def _insert_batch(cls, product_id, product_data):
+        """Logged batch inserting a product into the products table and every query table"""
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        batch.add(CassandraDB.prepare(INSERT_PRODUCT), cls._insert_parameters(product_id, product_data))
+        cls._add_lookup_inserts(batch, product_id, product_data)
+        return batch
+    
+    @staticmethod
+    def _row_values(row):
+        """Column values of a products row, keyed like prepared product data"""
+        return {column: getattr(row, column) for column in PRODUCT_COLUMNS}
+    
+    @staticmethod
+    def _update_statement(columns):
+        """
+        Return the prepared UPDATE for a set of columns.
+        Each distinct column set is prepared once and cached with the session's statements.
+        Args:
+            columns: Tuple of column names in PRODUCT_COLUMNS order
+        Returns:
+            PreparedStatement taking the column values followed by the product ID
+        """
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        return CassandraDB.prepare(f"UPDATE products SET {assignments} WHERE id = ?")
+    
+    @classmethod
+    def _document(cls, product_id, product_data):
+        """Build the cached product document for a row that was just written"""
+        document = {
+            '_id': str(product_id),
+            'name': product_data.get('name'),
+            'brand': product_data.get('brand'),
+            'category': product_data.get('category'),
+            'price': product_data.get('price'),
+            'description': product_data.get('description'),
+            'specs': {},
+            'images': product_data.get('images', []),
+            'in_stock': product_data.get('in_stock', True),
+            'stock_quantity': product_data.get('stock_quantity', 0)
+        }
+        document.update(cls._cache_patch(product_data))
+        return document
+    
+    @classmethod
+    def bulk_create(cls, items):
+        """
+        Insert already validated products with concurrent prepared inserts, leaving the
+        product cache alone. Items carrying an '_id' overwrite the product stored under it,
+        or are inserted with that ID. Callers refresh the cache once after the last batch.
+        Args:
+            items: List of dictionaries containing product data
+        Returns:
+            Tuple of (created product documents, list of (position, error message) for items that failed)
+        """
+        session = CassandraDB.get_session()
         
-        product_data['_id'] = str(product_id)
-        logger.info(f"Created product: {product_data.get('name')} (ID: {product_id})")
+        rows = []
+        errors = []
+        for position, data in enumerate(items):
+            product_data = cls._prepare_product_data(data)
+            try:
+                product_id = uuid.UUID(str(data['_id'])) if data.get('_id') else uuid.uuid4()
+            except ValueError:
+                errors.append((position, f"Invalid product ID: {data['_id']}"))
+                continue
+            rows.append((position, product_id, product_data))
         
-        return product_data
+        # A product exported with its ID is written back in place; its stored row
+        # tells which query-table rows have to move
+        current = {}
+        supplied = [(position, product_id) for position, product_id, _ in rows if items[position].get('_id')]
+        if supplied:
+            outcomes = CassandraDB.execute_fanout(
+                CassandraDB.prepare(SELECT_PRODUCT), [(product_id,) for _, product_id in supplied]
+            )
+            for (position, product_id), (success, outcome) in zip(supplied, outcomes):
+                if not success:
+                    errors.append((position, str(outcome)))
+                    continue
+                row = outcome.one()
+                if row is not None:
+                    current[product_id] = cls._row_values(row)
+            failed = {position for position, _ in errors}
+            rows = [row for row in rows if row[0] not in failed]
+        
+        batches = []
+        for _, product_id, product_data in rows:
+            batch = cls._insert_batch(product_id, product_data)
+            if product_id in current:
+                cls._add_lookup_deletes(batch, product_id, current[product_id], keep=product_data)
+            batches.append((batch, ()))
+        
+        # One logged batch per product keeps its query-table rows in step
+        results = execute_concurrent(
+            session, batches,
+            concurrency=settings.BULK_WRITE_CONCURRENCY,
+            raise_on_first_error=False
+        )
+        
+        created = []
+        for (position, product_id, product_data), (success, outcome) in zip(rows, results):
+            if success:
+                created.append(cls._document(product_id, product_data))
+            else:
+                errors.append((position, str(outcome)))
+        
+        errors.sort()
+        logger.info(f"Bulk wrote {len(created)}/{len(items)} products ({len(current)} overwritten)")
+        return created, errors
     
     @classmethod
-    def get_all(cls, filters=None):
+    def rebuild_lookup_tables(cls, fetch_size=None):
         """
-        Get all products with optional filtering.
+        Write the query-table rows of every product in the products table.
+        Used to backfill the query tables of an existing catalog; rows already
+        present are overwritten with the same values.
         Args:
-            filters: Dictionary of filter criteria
+            fetch_size: Rows read per round trip, defaulting to CASSANDRA_FETCH_SIZE
         Returns:
-            List of product documents
+            Tuple of (products written, list of (product ID, error message) for products that failed)
         """
         session = CassandraDB.get_session()
         
-        if filters:
-            # Build query with filters
-            where_clauses = []
-            params = []
-            
-            if 'brand' in filters:
-                where_clauses.append("brand = %s")
-                params.append(filters['brand'])
-            
-            if 'category' in filters:
-                where_clauses.append("category = %s")
-                params.append(filters['category'])
-            
-            if where_clauses:
-                query = f"SELECT * FROM products WHERE {' AND '.join(where_clauses)} ALLOW FILTERING"
-                rows = session.execute(query, params)
-            else:
-                query = "SELECT * FROM products"
-                rows = session.execute(query)
-        else:
-            query = "SELECT * FROM products"
-            rows = session.execute(query)
+        def batches():
+            for row in cls._scan(fetch_size=fetch_size):
+                batch = BatchStatement(batch_type=BatchType.LOGGED)
+                cls._add_lookup_inserts(batch, row.id, cls._row_values(row))
+                yield row.id, batch
         
-        products = [cls._format_product(row) for row in rows]
+        written = 0
+        errors = []
+        pending = []
         
-        # Filter by in_stock if specified (post-query filtering)
-        if filters and 'in_stock' in filters:
-            products = [p for p in products if p['in_stock'] == filters['in_stock']]
+        def flush():
+            nonlocal written
+            results = execute_concurrent(
+                session, [(batch, ()) for _, batch in pending],
+                concurrency=settings.BULK_WRITE_CONCURRENCY,
+                raise_on_first_error=False
+            )
+            for (row_id, _), (success, outcome) in zip(pending, results):
+                if success:
+                    written += 1
+                else:
+                    errors.append((str(row_id), str(outcome)))
+            pending.clear()
         
-        return products
+        for entry in batches():
+            pending.append(entry)
+            if len(pending) >= settings.BULK_CHUNK_SIZE:
+                flush()
+        if pending:
+            flush()
+        
+        logger.info(f"Rebuilt query-table rows of {written} products ({len(errors)} failed)")
+        return written, errors
     
     @classmethod
-    def get_by_id(cls, product_id):
+    def _scan(cls, filters=None, fetch_size=None, paging_state=None):
         """
-        Get a single product by ID.
+        Start a paged read of the products matching the filters.
+        A brand, category or price_tier filter reads that key's partition of
+        its query table, in price order; without one the whole products table
+        is scanned. The driver fetches fetch_size rows at a time as the result
+        is iterated.
         Args:
-            product_id: String representation of UUID
+            filters: Dictionary of filter criteria
+            fetch_size: Rows per page, defaulting to CASSANDRA_FETCH_SIZE
+            paging_state: Driver paging state to resume from
         Returns:
-            Product document or None
+            ResultSet
         """
         session = CassandraDB.get_session()
-        try:
-            query = "SELECT * FROM products WHERE id = %s"
-            row = session.execute(query, (uuid.UUID(product_id),)).one()
-            return cls._format_product(row)
-        except Exception as e:
-            logger.error(f"Error fetching product {product_id}: {str(e)}")
-            return None
+        
+        query = SELECT_ALL_PRODUCTS
+        params = ()
+        for table, key in LOOKUP_TABLES:
+            if filters and filters.get(key):
+                query = f"SELECT * FROM {table} WHERE {key} = ?"
+                params = (filters[key],)
+                break
+        
+        statement = CassandraDB.prepare(query).bind(params)
+        statement.fetch_size = fetch_size or settings.CASSANDRA_FETCH_SIZE
+        return session.execute(statement, paging_state=paging_state)
+    
+    @classmethod
+    def _scan_results(cls, rows, filters, exclude=None):
+        """
+        Turn scanned rows into products, applying the filters the read did not
+        and leaving out products matching exclude. Rows are checked against
+        the plain columns before their specs JSON is decoded, and only one row
+        is decoded at a time.
+        """
+        filters = filters or {}
+        exclude = exclude or {}
+        column_filters = {
+            column: filters[column] for column in ('brand', 'category', 'in_stock') if filters.get(column) is not None
+        }
+        spec_filters = {
+            facet: value for facet, value in filters.items() if facet in SPEC_FACETS
+        }
+        for row in rows:
+            if any(getattr(row, column) != value for column, value in column_filters.items()):
+                continue
+            product = cls._format_product(row)
+            if any(facet_value(product, facet) == value for facet, value in exclude.items()):
+                continue
+            if all(facet_value(product, facet) == value for facet, value in spec_filters.items()):
+                yield product
+    
+    @classmethod
+    def iter_products(cls, filters=None, fetch_size=None):
+        """
+        Stream products from Cassandra one page at a time.
+        A brand, category or price_tier filter reads only that key's partition
+        of its query table (see _scan). The full catalog load behind the
+        product cache passes no filters and scans the products table.
+        Args:
+            filters: Dictionary of filter criteria
+            fetch_size: Rows fetched per round trip, defaulting to CASSANDRA_FETCH_SIZE
+        Yields:
+            Product documents
+        """
+        filters = normalize_filters(filters)
+        yield from cls._scan_results(cls._scan(filters, fetch_size), filters)
+    
+    @classmethod
+    def get_page(cls, filters=None, page_size=50, page_token=None, exclude=None):
+        """
+        Get one page of products, resuming the table scan from a page token.
+        Filtered pages are read from the matching query table, as in
+        iter_products. Pages can hold fewer than page_size products when
+        filters or exclusions apply that the cluster cannot evaluate.
+        Args:
+            filters: Dictionary of filter criteria
+            page_size: Rows scanned for the page
+            page_token: Token returned with the previous page, or None for the first page
+            exclude: Dictionary mapping facet names to a value whose products are left out
+        Returns:
+            Tuple of (product documents, token of the next page or None)
+        Raises:
+            ValueError: If the page token is malformed
+        """
+        filters = normalize_filters(filters)
+        result = cls._scan(filters, page_size, decode_token(page_token))
+        products = list(cls._scan_results(result.current_rows, filters, exclude))
+        return products, encode_token(result.paging_state)
+    
+    @staticmethod
+    def _cache_patch(product_data):
+        """Convert prepared column values back to the cached product representation"""
+        patch = {}
+        for key in PRODUCT_COLUMNS:
+            if key in product_data:
+                patch[key] = product_data[key]
+        if isinstance(patch.get('specs'), str):
+            patch['specs'] = json.loads(patch['specs']) if patch['specs'] else {}
+        return patch
+    
+    @classmethod
+    def check_health(cls):
+        """Check the cluster connection with a query to the coordinator"""
+        CassandraDB.get_session().execute("SELECT now() FROM system.local")
+        return {
+            'database': 'cassandra (connected)',
+            'message': 'Django backend is running with Cassandra'
+        }
+    
+    @classmethod
+    def _fetch_one(cls, product_id):
+        """Read one product with a single-partition query"""
+        session = CassandraDB.get_session()
+        row = session.execute(CassandraDB.prepare(SELECT_PRODUCT), (uuid.UUID(product_id),)).one()
+        return cls._format_product(row)
     
     @classmethod
-    def update(cls, product_id, data):
+    def _fetch_many(cls, product_ids):
         """
-        Update a product with image validation.
+        Read several products with concurrent single-partition queries, each
+        routed to a replica, rather than one IN query that a coordinator has
+        to fan out itself. A failed query raises, so that an unreachable
+        replica is not mistaken for a missing product.
+        """
+        missing = []
+        for product_id in product_ids:
+            try:
+                missing.append(uuid.UUID(product_id))
+            except ValueError:
+                continue
+        
+        products = {}
+        if missing:
+            outcomes = CassandraDB.execute_fanout(
+                CassandraDB.prepare(SELECT_PRODUCT), [(row_id,) for row_id in missing]
+            )
+            for row_id, (success, outcome) in zip(missing, outcomes):
+                if not success:
+                    logger.error(f"Error fetching product {row_id}: {str(outcome)}")
+                    raise outcome
+                product = cls._format_product(outcome.one())
+                if product is not None:
+                    products[product['_id']] = product
+        return products
+    
+    @classmethod
+    def update(cls, product_id, data, validate_images=True):
+        """
+        Update a product with optional image validation.
         Args:
             product_id: String representation of UUID
             data: Dictionary containing updated product data
+            validate_images: Boolean to enable/disable image validation
         Returns:
             Boolean indicating success
         Raises:
-            ValueError: If image URLs are invalid
+            ValueError: If image URLs are invalid and validation is enabled
         """
         product_data = cls._prepare_product_data(data)
         
-        # Validate image URLs if provided
-        if 'images' in product_data:
+        # Validate image URLs if provided and validation is enabled
+        if validate_images and 'images' in product_data:
             cls._validate_image_urls(product_data['images'])
         
         session = CassandraDB.get_session()
         try:
-            # Build update query dynamically
-            set_clauses = []
-            params = []
-            
-            for key, value in product_data.items():
-                if key not in ['_id', 'id']:
-                    set_clauses.append(f"{key} = %s")
-                    params.append(value)
-            
-            if not set_clauses:
+            # The UPDATE is prepared once per set of columns being changed
+            columns = tuple(column for column in PRODUCT_COLUMNS if column in product_data)
+            if not columns:
                 return False
             
-            params.append(uuid.UUID(product_id))
-            query = f"UPDATE products SET {', '.join(set_clauses)} WHERE id = %s"
+            # The current row tells which query-table rows have to move
+            row_id = uuid.UUID(product_id)
+            row = session.execute(CassandraDB.prepare(SELECT_PRODUCT), (row_id,)).one()
+            if row is None:
+                return False
+            current = cls._row_values(row)
+            updated = {**current, **{column: product_data[column] for column in columns}}
             
-            session.execute(query, params)
+            params = [product_data[column] for column in columns]
+            params.append(row_id)
+            batch = BatchStatement(batch_type=BatchType.LOGGED)
+            batch.add(cls._update_statement(columns), params)
+            cls._add_lookup_deletes(batch, row_id, current, keep=updated)
+            cls._add_lookup_inserts(batch, row_id, updated)
+            session.execute(batch)
+            cls._cache_replace(product_id, cls._cache_patch(product_data))
             logger.info(f"Updated product: {product_id}")
             return True
         except Exception as e:
             logger.error(f"Error updating product {product_id}: {str(e)}")
             return False
     
+    @classmethod
+    def _change_stock(cls, product_id, change):
+        """
+        Add change to a product's stock with a lightweight transaction.
+        When another writer changed the row first, the compare-and-set is
+        retried with the values the cluster returned, up to CASSANDRA_LWT_RETRIES times.
+        Args:
+            product_id: String representation of UUID
+            change: Units to add (negative to take)
+        Returns:
+            The new stock quantity, or None if the product does not exist or
+            the stock would go below zero
+        Raises:
+            RuntimeError: If every attempt lost to a concurrent write
+        """
+        session = CassandraDB.get_session()
+        row_id = uuid.UUID(product_id)
+        row = session.execute(CassandraDB.prepare(SELECT_PRODUCT), (row_id,)).one()
+        
+        for _ in range(settings.CASSANDRA_LWT_RETRIES):
+            if row is None:
+                return None
+            current = {column: getattr(row, column) for column in ('stock_quantity', 'brand', 'category', 'price', 'specs')}
+            stock_quantity = (current['stock_quantity'] or 0) + change
+            if stock_quantity < 0:
+                return None
+            
+            result = session.execute(CassandraDB.prepare(SET_STOCK), (
+                stock_quantity, stock_quantity > 0, row_id, current['stock_quantity'],
+                current['brand'], current['category'], current['price'], current['specs']
+            ))
+            if not result.was_applied:
+                # The failed condition returns the row's current values, or only
+                # [applied] when the product was deleted since it was read
+                row = result.one()
+                if not hasattr(row, 'stock_quantity'):
+                    return None
+                continue
+            
+            # The query tables keep a copy of the stock; their keys were part of the condition
+            batch = BatchStatement(batch_type=BatchType.LOGGED)
+            if cls._add_lookup_stock_updates(batch, row_id, current, stock_quantity):
+                session.execute(batch)
+            cls._cache_replace(product_id, {'stock_quantity': stock_quantity, 'in_stock': stock_quantity > 0})
+            return stock_quantity
+        
+        raise RuntimeError(f"Stock of product {product_id} kept changing during {settings.CASSANDRA_LWT_RETRIES} attempts")
+    
+    @classmethod
+    def _add_lookup_stock_updates(cls, batch, product_id, product_data, stock_quantity):
+        """Add updates of the stock copies in a product's query-table rows to a batch; returns how many"""
+        price = product_data.get('price') or 0
+        added = 0
+        for table, key in LOOKUP_TABLES:
+            value = cls._lookup_key(key, product_data)
+            if value is None:
+                continue
+            statement = CassandraDB.prepare(
+                f"UPDATE {table} SET stock_quantity = ?, in_stock = ? WHERE {key} = ? AND price = ? AND id = ?"
+            )
+            batch.add(statement, (stock_quantity, stock_quantity > 0, value, price, product_id))
+            added += 1
+        return added
+    
+    @classmethod
+    def reserve_stock(cls, product_id, quantity):
+        """
+        Take quantity units of a product's stock, unless fewer are left.
+        Args:
+            product_id: String representation of UUID
+            quantity: Number of units to reserve
+        Returns:
+            Boolean indicating whether the stock was reserved
+        """
+        stock_quantity = cls._change_stock(product_id, -quantity)
+        if stock_quantity is None:
+            return False
+        logger.info(f"Reserved {quantity} units of product {product_id}, {stock_quantity} left")
+        return True
+    
+    @classmethod
+    def release_stock(cls, product_id, quantity):
+        """
+        Give quantity units back to a product's stock.
+        Args:
+            product_id: String representation of UUID
+            quantity: Number of units to release
+        Returns:
+            Boolean indicating whether the product was found
+        """
+        if cls._change_stock(product_id, quantity) is None:
+            return False
+        logger.info(f"Released {quantity} units of product {product_id}")
+        return True
+    
     @classmethod
     def delete(cls, product_id):
         """
@@ -342,8 +864,16 @@ class Product:
         """
         session = CassandraDB.get_session()
         try:
-            query = "DELETE FROM products WHERE id = %s"
-            session.execute(query, (uuid.UUID(product_id),))
+            # The current row tells which query-table rows to remove with it
+            row_id = uuid.UUID(product_id)
+            row = session.execute(CassandraDB.prepare(SELECT_PRODUCT), (row_id,)).one()
+            if row is None:
+                return False
+            batch = BatchStatement(batch_type=BatchType.LOGGED)
+            batch.add(CassandraDB.prepare(DELETE_PRODUCT), (row_id,))
+            cls._add_lookup_deletes(batch, row_id, cls._row_values(row))
+            session.execute(batch)
+            cls._cache_remove(product_id)
             logger.info(f"Deleted product: {product_id}")
             return True
         except Exception as e:
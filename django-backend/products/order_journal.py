@@ -0,0 +1,220 @@
+"""
+Write-behind journal for new orders.
+
+With ORDER_WRITE_MODE = 'journal' an order is acknowledged once it is
+committed to a local SQLite database in WAL mode with synchronous=FULL,
+which fsyncs the write-ahead log on every commit. A background thread in
+each worker process drains the journal into the orders collection with
+insert_many, oldest orders first, and deletes journal rows only after the
+database has them. Orders left in the journal when a process stops are
+written by the next flusher that starts. Inserts are idempotent by the
+order _id, so an order written twice (a flush interrupted after the insert,
+or two workers flushing the same rows) is stored once.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS orders (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL UNIQUE,
+        document TEXT NOT NULL,
+        journaled_at REAL NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT
+    )
+"""
+
+
+class OrderJournal:
+    """Durable local queue of orders waiting to be written to the database"""
+
+    def __init__(self, path, write_batch, batch_size=100, flush_interval=0.5, max_backoff=30):
+        """
+        Args:
+            path: SQLite database file
+            write_batch: Callable taking a list of order documents and returning
+                the set of their IDs that the database now holds
+            batch_size: Orders written per insert_many
+            flush_interval: Seconds the flusher waits for new orders when the journal is empty
+            max_backoff: Longest pause in seconds after failed flushes
+        """
+        self.path = path
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_at = None
+        self.last_flush_duration_ms = None
+        self.last_error = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(SCHEMA)
+
+    def _connection(self):
+        """Return this thread's SQLite connection, opening it again after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Sync the write-ahead log on every commit, so an acknowledged order survives a crash
+            connection.execute('PRAGMA synchronous=FULL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def append(self, document):
+        """
+        Journal an order; it is durable when this returns.
+        Args:
+            document: Order document with an '_id'
+        """
+        self._connection().execute(
+            'INSERT INTO orders (order_id, document, journaled_at) VALUES (?, ?, ?)',
+            (document['_id'], json.dumps(document), time.time())
+        )
+        self.start()
+        self._wake.set()
+
+    def pending(self, limit):
+        """Return up to limit journaled (seq, document) pairs, oldest first"""
+        rows = self._connection().execute(
+            'SELECT seq, document FROM orders ORDER BY seq LIMIT ?', (limit,)
+        ).fetchall()
+        return [(seq, json.loads(document)) for seq, document in rows]
+
+    def flush_once(self):
+        """
+        Write one batch of journaled orders to the database.
+        Returns:
+            Number of orders removed from the journal
+        Raises:
+            Exception: Whatever write_batch raised; the batch stays journaled
+        """
+        batch = self.pending(self.batch_size)
+        if not batch:
+            return 0
+
+        started = time.time()
+        connection = self._connection()
+        try:
+            stored = self.write_batch([document for _, document in batch])
+        except Exception as e:
+            connection.execute(
+                f"UPDATE orders SET attempts = attempts + 1, last_error = ? "
+                f"WHERE seq IN ({', '.join('?' * len(batch))})",
+                (str(e), *(seq for seq, _ in batch))
+            )
+            raise
+
+        done = [seq for seq, document in batch if document['_id'] in stored]
+        if done:
+            connection.execute(f"DELETE FROM orders WHERE seq IN ({', '.join('?' * len(done))})", done)
+        with self._lock:
+            self.flushed += len(done)
+            self.batches += 1
+            self.last_flush_at = time.time()
+            self.last_flush_duration_ms = round((self.last_flush_at - started) * 1000, 2)
+        if len(done) < len(batch):
+            raise RuntimeError(f"{len(batch) - len(done)} of {len(batch)} orders were not stored")
+        return len(done)
+
+    def drain(self):
+        """Flush until the journal is empty; returns the number of orders written"""
+        written = 0
+        while True:
+            count = self.flush_once()
+            if not count:
+                return written
+            written += count
+
+    def _run(self):
+        backoff = 0
+        while True:
+            try:
+                count = self.flush_once()
+                backoff = 0
+                if count == self.batch_size:
+                    # More orders are probably waiting
+                    continue
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                backoff = min(self.max_backoff, backoff * 2 or self.flush_interval)
+                logger.error(f"Flushing the order journal failed, retrying in {backoff:.1f} s: {str(e)}")
+                time.sleep(backoff)
+                continue
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start this process's flusher thread unless it is running"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._wake = threading.Event()
+                    self._flusher = threading.Thread(target=self._run, name='order-journal-flusher', daemon=True)
+                    self._flusher.start()
+                    self._pid = os.getpid()
+                    logger.info(f"Started order journal flusher for {self.path}")
+
+    def stats(self):
+        """Return queue depth and flush lag for monitoring"""
+        depth, oldest, retried = self._connection().execute(
+            'SELECT COUNT(*), MIN(journaled_at), SUM(attempts > 0) FROM orders'
+        ).fetchone()
+        return {
+            'depth': depth,
+            'flush_lag_seconds': round(time.time() - oldest, 3) if oldest is not None else 0.0,
+            'retried': retried or 0,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'failures': self.failures,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_duration_ms': self.last_flush_duration_ms,
+            'last_error': self.last_error,
+        }
+
+
+def order_journal_enabled():
+    """Whether new orders are acknowledged from the local journal"""
+    return getattr(settings, 'ORDER_WRITE_MODE', 'sync') == 'journal'
+
+
+_order_journal = None
+_order_journal_lock = threading.Lock()
+
+
+def get_order_journal():
+    """Return the order journal configured in settings"""
+    global _order_journal
+    if _order_journal is None:
+        with _order_journal_lock:
+            if _order_journal is None:
+                from .order_models import AstraOrder
+                _order_journal = OrderJournal(
+                    settings.ORDER_JOURNAL_PATH,
+                    write_batch=AstraOrder.insert_batch,
+                    batch_size=settings.ORDER_JOURNAL_BATCH_SIZE,
+                    flush_interval=settings.ORDER_JOURNAL_FLUSH_INTERVAL,
+                )
+    return _order_journal
@@ -7,18 +7,38 @@ import logging
 import uuid
 from datetime import datetime
 
+from .analytics import analytics_enabled, order_rollups
+from .connections import ConnectionManager
+from .order_journal import get_order_journal, order_journal_enabled
+from .paging import keyset_token, keyset_values
+
 logger = logging.getLogger(__name__)
 
 
-class AstraOrderDB:
+class AstraOrderDB(ConnectionManager):
     """Astra Data API connection manager for orders"""
     _client = None
     _database = None
     _collection = None
+    _rollup_collection = None
+    _recommendation_collection = None
+    
+    @classmethod
+    def _reset(cls):
+        cls._client = None
+        cls._database = None
+        cls._collection = None
+        cls._rollup_collection = None
+        cls._recommendation_collection = None
+    
+    @classmethod
+    def connect(cls):
+        cls.get_collection()
     
     @classmethod
     def get_client(cls):
         """Get or create Astra client"""
+        cls.ensure_process()
         if cls._client is None:
             cls._client = DataAPIClient(settings.ASTRA_TOKEN)
             logger.info("Connected to Astra Data API for orders")
@@ -27,6 +47,7 @@ class AstraOrderDB:
     @classmethod
     def get_database(cls):
         """Get database instance"""
+        cls.ensure_process()
         if cls._database is None:
             client = cls.get_client()
             cls._database = client.get_database_by_api_endpoint(
@@ -39,6 +60,7 @@ class AstraOrderDB:
     @classmethod
     def get_collection(cls):
         """Get orders collection"""
+        cls.ensure_process()
         if cls._collection is None:
             database = cls.get_database()
             
@@ -54,6 +76,34 @@ class AstraOrderDB:
             
             logger.info("Using orders collection")
         return cls._collection
+    
+    @classmethod
+    def get_rollup_collection(cls):
+        """Get the order_rollups collection holding the analytics counters"""
+        cls.ensure_process()
+        if cls._rollup_collection is None:
+            database = cls.get_database()
+            try:
+                cls._rollup_collection = database.get_collection("order_rollups")
+                cls._rollup_collection.find_one({})
+            except Exception:
+                cls._rollup_collection = database.create_collection("order_rollups")
+                logger.info("Created order_rollups collection")
+        return cls._rollup_collection
+    
+    @classmethod
+    def get_recommendation_collection(cls):
+        """Get the product_recommendations collection built by build_recommendations"""
+        cls.ensure_process()
+        if cls._recommendation_collection is None:
+            database = cls.get_database()
+            try:
+                cls._recommendation_collection = database.get_collection("product_recommendations")
+                cls._recommendation_collection.find_one({})
+            except Exception:
+                cls._recommendation_collection = database.create_collection("product_recommendations")
+                logger.info("Created product_recommendations collection")
+        return cls._recommendation_collection
 
 
 class AstraOrder:
@@ -82,7 +132,6 @@ class AstraOrder:
         Returns:
             Created order document
         """
-        collection = AstraOrderDB.get_collection()
         order_id = str(uuid.uuid4())
         
         order_data = {
@@ -92,14 +141,50 @@ class AstraOrder:
             'shipping_details': data.get('shipping_details', {}),
             'total': data.get('total', 0),
             'status': 'pending',
-            'created_at': datetime.utcnow().isoformat(),
+            # Fixed-width timestamps sort chronologically as strings
+            'created_at': datetime.utcnow().isoformat(timespec='microseconds'),
         }
         
-        result = collection.insert_one(order_data)
+        if order_journal_enabled():
+            # Acknowledged once it is durable locally; the journal's flusher writes it to Astra
+            get_order_journal().append(order_data)
+            logger.info(f"Journaled order: {order_id} for {data.get('user_email')}")
+        else:
+            collection = AstraOrderDB.get_collection()
+            result = collection.insert_one(order_data)
+            logger.info(f"Created order: {order_id} for {data.get('user_email')}")
         
-        logger.info(f"Created order: {order_id} for {data.get('user_email')}")
+        if analytics_enabled():
+            order_rollups.record(order_data)
         return order_data
     
+    @classmethod
+    def insert_batch(cls, documents):
+        """
+        Insert orders with insert_many, idempotently by _id.
+        Orders whose _id is already stored (written by an earlier attempt)
+        count as stored rather than failed.
+        Args:
+            documents: List of order documents with '_id' set
+        Returns:
+            Set of the documents' IDs that the collection now holds
+        """
+        collection = AstraOrderDB.get_collection()
+        try:
+            collection.insert_many(documents, ordered=False)
+            return {document['_id'] for document in documents}
+        except Exception as e:
+            inserted_ids = set(getattr(e, 'inserted_ids', None) or [])
+            missing = [document['_id'] for document in documents if document['_id'] not in inserted_ids]
+            # Duplicates fail the insert; look up which of the rest are there already
+            existing = {
+                doc['_id'] for doc in collection.find({"_id": {"$in": missing}}, projection={"_id": True})
+            }
+            stored = inserted_ids | existing
+            if len(stored) < len(documents):
+                logger.error(f"Inserted {len(stored)}/{len(documents)} orders: {str(e)}")
+            return stored
+    
     @classmethod
     def get_all(cls, filters=None):
         """
@@ -153,3 +238,42 @@ class AstraOrder:
             List of order documents
         """
         return cls.get_all({'user_email': user_email})
+    
+    @classmethod
+    def get_page_by_user_email(cls, user_email, page_size=20, page_token=None):
+        """
+        Get one page of a user's orders, newest first.
+        The collection sorts and limits the user's orders by (created_at, _id);
+        the page token holds that key for the last order returned and the next
+        page starts strictly after it, so pages do not shift as orders are added.
+        Args:
+            user_email: User's email address
+            page_size: Number of orders per page
+            page_token: Token returned with the previous page, or None for the first page
+        Returns:
+            Tuple of (order documents, token of the next page or None)
+        Raises:
+            ValueError: If the page token is malformed
+        """
+        after = keyset_values(page_token, ('created_at', '_id'))
+        
+        query = {'user_email': user_email}
+        if after is not None:
+            query['$or'] = [
+                {'created_at': {'$lt': after['created_at']}},
+                {'created_at': after['created_at'], '_id': {'$lt': after['_id']}},
+            ]
+        
+        collection = AstraOrderDB.get_collection()
+        # One order past the page tells whether there is a next page
+        cursor = collection.find(query, sort={'created_at': -1, '_id': -1}, limit=page_size + 1)
+        orders = [cls._format_order(doc) for doc in cursor]
+        
+        next_token = None
+        if len(orders) > page_size:
+            orders = orders[:page_size]
+            last = orders[-1]
+            next_token = keyset_token({'created_at': last.get('created_at', ''), '_id': last['_id']})
+        
+        logger.info(f"Retrieved page of {len(orders)} orders for {user_email}")
+        return orders, next_token
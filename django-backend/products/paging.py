@@ -0,0 +1,105 @@
+"""
+Opaque page tokens for token-based product listing.
+
+Cassandra hands out a driver paging state that resumes a scan where the
+previous page ended; backends that page over the in-memory catalog use
+an offset instead, and keyset-paged queries carry the sort key of the last
+item returned. Either way the client only sees an opaque URL-safe string
+to pass back as page_token.
+"""
+import base64
+import binascii
+import json
+
+
+def encode_token(state):
+    """
+    Encode a paging state as a URL-safe token.
+    Args:
+        state: Bytes, or None when there are no more pages
+    Returns:
+        Token string, or None
+    """
+    if state is None:
+        return None
+    return base64.urlsafe_b64encode(state).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """
+    Decode a token produced by encode_token.
+    Args:
+        token: Token string, or None/empty for the first page
+    Returns:
+        Bytes, or None for the first page
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if not token:
+        return None
+    try:
+        return base64.b64decode(token + '=' * (-len(token) % 4), altchars=b'-_', validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid page token")
+
+
+def keyset_token(values):
+    """
+    Encode the sort key of the last item on a page as a token.
+    Args:
+        values: Dictionary of JSON-serialisable sort key values
+    Returns:
+        Token string
+    """
+    return encode_token(json.dumps(values, separators=(',', ':')).encode('utf-8'))
+
+
+def keyset_values(token, fields):
+    """
+    Decode a token produced by keyset_token.
+    Args:
+        token: Token string, or None/empty for the first page
+        fields: Names of the sort key values the token must hold
+    Returns:
+        Dictionary of sort key values, or None for the first page
+    Raises:
+        ValueError: If the token is malformed
+    """
+    state = decode_token(token)
+    if state is None:
+        return None
+    try:
+        values = json.loads(state)
+    except ValueError:
+        raise ValueError("Invalid page token")
+    if not isinstance(values, dict) or any(not isinstance(values.get(field), str) for field in fields):
+        raise ValueError("Invalid page token")
+    return {field: values[field] for field in fields}
+
+
+def page_of(products, page_size, page_token=None):
+    """
+    Return one page of an in-memory product list.
+    Args:
+        products: List of product dictionaries
+        page_size: Number of products per page
+        page_token: Token of the page to return, or None for the first page
+    Returns:
+        Tuple of (products on the page, token of the next page or None)
+    Raises:
+        ValueError: If the token is malformed
+    """
+    state = decode_token(page_token)
+    try:
+        offset = json.loads(state)['offset'] if state else 0
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid page token")
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid page token")
+
+    page = products[offset:offset + page_size]
+    next_offset = offset + page_size
+    next_token = None
+    if next_offset < len(products):
+        next_token = encode_token(json.dumps({'offset': next_offset}).encode('utf-8'))
+    return page, next_token
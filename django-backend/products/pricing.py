@@ -0,0 +1,133 @@
+"""
+Server-side order pricing.
+
+Order lines name a product and a quantity; the price of each line comes from
+the catalog, not from the client. All products of an order are resolved
+with one get_many call, which answers from the product cache and reads any
+misses from the database in a single batched query, so pricing an order
+costs at most one round trip however many lines it has.
+"""
+from collections import namedtuple
+import logging
+import numbers
+import time
+
+logger = logging.getLogger(__name__)
+
+# Priced order lines and the order total, in cents
+PricedOrder = namedtuple('PricedOrder', ['items', 'total'])
+
+# Product fields copied onto a priced order line
+LINE_FIELDS = ('name', 'brand', 'images')
+
+
+class OrderPricingError(ValueError):
+    """Order lines that could not be priced"""
+
+    def __init__(self, message, errors, conflict=False):
+        """
+        Args:
+            message: Summary of the problem
+            errors: List of {'item', 'product_id', 'error', ...} dictionaries, one per bad line
+            conflict: True when the lines are well formed but disagree with the
+                catalog (unknown or unavailable product, changed price)
+        """
+        super().__init__(message)
+        self.errors = errors
+        self.conflict = conflict
+
+
+def _line_product_id(item):
+    return item.get('_id') or item.get('id') or item.get('product_id')
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _parse_lines(items):
+    """
+    Check the shape of order lines.
+    Returns:
+        List of (position, product ID, quantity, price the client saw or None)
+    Raises:
+        OrderPricingError: If any line is malformed
+    """
+    if not isinstance(items, list) or not items:
+        raise OrderPricingError("No items in order", [])
+
+    lines = []
+    errors = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'item': position, 'product_id': None, 'error': 'Item must be an object'})
+            continue
+        product_id = _line_product_id(item)
+        quantity = item.get('quantity')
+        client_price = item.get('price')
+        if not isinstance(product_id, str) or not product_id:
+            errors.append({'item': position, 'product_id': None, 'error': 'Item has no product ID'})
+        elif not _is_number(quantity) or quantity != int(quantity) or quantity < 1:
+            errors.append({'item': position, 'product_id': product_id, 'error': 'Quantity must be a positive integer'})
+        elif client_price is not None and not _is_number(client_price):
+            errors.append({'item': position, 'product_id': product_id, 'error': 'Price must be a number'})
+        else:
+            lines.append((position, product_id, int(quantity), client_price))
+
+    if errors:
+        raise OrderPricingError("Invalid order items", errors)
+    return lines
+
+
+def price_order(model, items):
+    """
+    Price order lines from the catalog.
+    Args:
+        model: Product model class providing get_many
+        items: List of line dictionaries holding a product ID ('_id', 'id' or
+            'product_id'), a quantity and optionally the price the client was shown
+    Returns:
+        PricedOrder
+    Raises:
+        OrderPricingError: If a line is malformed, or names a product that is
+            unknown or out of stock, or was shown at a price that has since changed
+        Exception: Whatever get_many raises when the catalog cannot be read;
+            a lookup that failed is not reported as an unknown product
+    """
+    lines = _parse_lines(items)
+
+    started = time.perf_counter()
+    products = model.get_many(product_id for _, product_id, _, _ in lines)
+    lookup_ms = (time.perf_counter() - started) * 1000
+
+    priced = []
+    errors = []
+    total = 0
+    for position, product_id, quantity, client_price in lines:
+        product = products.get(product_id)
+        if product is None:
+            errors.append({'item': position, 'product_id': product_id, 'error': 'Product not found'})
+            continue
+        if product.get('in_stock') is False:
+            errors.append({'item': position, 'product_id': product_id, 'error': 'Product is out of stock'})
+            continue
+        price = product.get('price') or 0
+        if client_price is not None and client_price != price:
+            # The client was shown an old price; it has to confirm the current one
+            errors.append({
+                'item': position, 'product_id': product_id,
+                'error': 'Price has changed', 'price': client_price, 'current_price': price,
+            })
+            continue
+
+        line = {'_id': product_id}
+        line.update((field, product.get(field)) for field in LINE_FIELDS)
+        line.update({'price': price, 'quantity': quantity, 'line_total': price * quantity})
+        priced.append(line)
+        total += line['line_total']
+
+    if errors:
+        raise OrderPricingError("Some items cannot be ordered as shown", errors, conflict=True)
+
+    logger.info(f"Priced {len(priced)} order lines in one catalog lookup ({lookup_ms:.2f} ms)")
+    return PricedOrder(priced, total)
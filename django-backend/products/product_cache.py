@@ -0,0 +1,273 @@
+"""
+Per-process product cache with background refresh.
+
+ProductCache holds this worker's copy of the shared catalog snapshot and
+the CatalogIndex built over it. When the snapshot goes stale (another
+worker changed the catalog, or the TTL expired) readers keep getting the
+last good snapshot for up to PRODUCT_CACHE_MAX_STALENESS seconds while a
+background thread reloads it. Concurrent misses in a process collapse
+into a single load, and the shared cache makes sure only one process
+queries the database.
+
+A worker that fell behind because of writes applies the logged changes to
+copies of its products and index rather than reading and indexing the
+whole catalog; readers keep the state they hold until the copy replaces it.
+"""
+from collections import namedtuple
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .catalog_index import CatalogIndex
+from .shared_cache import Snapshot, apply_changes, get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# The snapshot a process serves together with the index built over it,
+# swapped as one object so readers never see a mismatched pair
+_CacheState = namedtuple('_CacheState', ['snapshot', 'index'])
+
+_EMPTY_STATE = _CacheState(None, None)
+
+
+class CacheMetrics:
+    """Counters describing how the product cache is being refreshed"""
+
+    def __init__(self):
+        self.loads = 0
+        self.catch_ups = 0
+        self.background_refreshes = 0
+        self.failures = 0
+        self.stale_reads = 0
+        self.last_refresh_duration_ms = None
+        self.last_refresh_at = None
+        self.last_error = None
+
+    def record_refresh(self, started, background, caught_up=False):
+        finished = time.time()
+        if caught_up:
+            self.catch_ups += 1
+        else:
+            self.loads += 1
+        if background:
+            self.background_refreshes += 1
+        self.last_refresh_duration_ms = round((finished - started) * 1000, 2)
+        self.last_refresh_at = finished
+
+    def record_failure(self, error):
+        self.failures += 1
+        self.last_error = str(error)
+
+
+class ProductCache:
+    """This process's view of the shared product catalog"""
+
+    def __init__(self, source, fetch):
+        """
+        Args:
+            source: Name of the database the catalog is loaded from, for logging
+            fetch: Callable returning the full product list from the database
+        """
+        self.source = source
+        self._fetch = fetch
+        self._state = _EMPTY_STATE
+        self._stale_since = None
+        self._refreshing = False
+        self._load_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.version = 0
+        self.metrics = CacheMetrics()
+
+    @property
+    def products(self):
+        """The cached product list, or None if nothing is loaded"""
+        snapshot = self._state.snapshot
+        return snapshot.products if snapshot is not None else None
+
+    def _is_fresh(self, snapshot):
+        if snapshot is None or snapshot.generation != get_shared_cache().generation():
+            return False
+        ttl = settings.PRODUCT_CACHE_TTL
+        return not ttl or time.time() - snapshot.loaded_at <= ttl
+
+    def is_current(self):
+        """Whether this process holds the latest catalog"""
+        return self._is_fresh(self._state.snapshot)
+
+    def _install(self, snapshot, index=None):
+        """Serve a new snapshot, building its index before readers can see it"""
+        if snapshot is not None and index is None:
+            index = CatalogIndex(snapshot.products)
+        self._state = _CacheState(snapshot, index)
+        self._stale_since = None
+        self.version += 1
+
+    @staticmethod
+    def _patched_index(index, changes):
+        """Return a copy of an index with changes applied"""
+        index = index.copy()
+        for change in changes:
+            if change.product is None:
+                index.remove(change.product_id)
+            else:
+                index.add(change.product)
+        return index
+
+    def _catch_up(self, started, background):
+        """
+        Apply the changes logged since the snapshot this process holds.
+        Returns:
+            False if the log does not cover them or the snapshot is due a full reload
+        """
+        base, index = self._state
+        ttl = settings.PRODUCT_CACHE_TTL
+        if base is None or index is None or (ttl and started - base.loaded_at > ttl):
+            return False
+        shared = get_shared_cache()
+        generation = shared.generation()
+        changes = shared.changes_since(base.generation, generation)
+        if changes is None:
+            return False
+
+        snapshot = Snapshot(generation, apply_changes(base.products, changes), base.loaded_at)
+        self._install(snapshot, self._patched_index(index, changes))
+        self.metrics.record_refresh(started, background, caught_up=True)
+        logger.debug(f"Applied {len(changes)} catalog changes (generation {generation})")
+        return True
+
+    def _reload(self, background=False):
+        """Bring the snapshot up to date, from the change log if possible; the load lock must be held"""
+        started = time.time()
+        if self._catch_up(started, background):
+            return
+        snapshot = get_shared_cache().load(self._fetch, max_age=settings.PRODUCT_CACHE_TTL)
+        self._install(snapshot)
+        self.metrics.record_refresh(started, background)
+        logger.info(
+            f"Cached {len(snapshot.products)} products from {self.source} "
+            f"(generation {snapshot.generation}, {self.metrics.last_refresh_duration_ms} ms)"
+        )
+
+    def _load(self):
+        """Load synchronously; concurrent callers wait for a single load"""
+        with self._load_lock:
+            if not self.is_current():
+                self._reload()
+        return self._state
+
+    def _refresh_in_background(self):
+        """Start a background reload unless one is already running"""
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self._load_lock:
+                    if not self.is_current():
+                        self._reload(background=True)
+            except Exception as e:
+                self.metrics.record_failure(e)
+                logger.error(f"Background refresh of the product cache failed: {str(e)}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name='product-cache-refresh', daemon=True).start()
+
+    def _current_state(self):
+        """Return the state to serve, refreshing it synchronously or in the background"""
+        state = self._state
+        if self._is_fresh(state.snapshot):
+            return state
+
+        max_staleness = settings.PRODUCT_CACHE_MAX_STALENESS
+        if state.snapshot is not None and max_staleness > 0 and settings.PRODUCT_CACHE_BACKGROUND_REFRESH:
+            now = time.time()
+            if self._stale_since is None:
+                self._stale_since = now
+            if now - self._stale_since <= max_staleness:
+                # Serve the last good snapshot while a background thread reloads it
+                self.metrics.stale_reads += 1
+                self._refresh_in_background()
+                return state
+
+        return self._load()
+
+    def current_version(self):
+        """
+        Return the version of the catalog this process serves, after checking
+        it against the shared generation and the TTL the same way a read does.
+        Callers keying their own caches on the version (the response cache)
+        therefore miss once another worker changed the catalog or it expired.
+        """
+        self._current_state()
+        return self.version
+
+    def get_products(self):
+        """Return the cached product list, loading it if needed"""
+        return self._current_state().snapshot.products
+
+    def get_index(self):
+        """Return the CatalogIndex over the cached products, loading it if needed"""
+        return self._current_state().index
+
+    def apply_write(self, change):
+        """
+        Apply a write to the cached catalog and its index.
+
+        Readers may be using the current index, so the write and any changes
+        other workers made since are applied to a copy, which then replaces it.
+        Args:
+            change: Callable taking the product list and returning the
+                    (product ID, new product or None) of the write
+        """
+        with self._load_lock:
+            base, index = self._state
+            snapshot, changes = get_shared_cache().apply(base, change)
+
+            if snapshot is None:
+                # The write could not be applied; keep serving the old snapshot until it is reloaded
+                self._stale_since = self._stale_since or time.time()
+                return
+
+            # Without the changes leading to it the snapshot was read in full and needs a new index
+            if changes is not None and index is not None:
+                self._install(snapshot, self._patched_index(index, changes))
+            else:
+                self._install(snapshot)
+
+    def refresh(self, wait=False):
+        """
+        Force a full reload from the database.
+        Args:
+            wait: Reload before returning instead of serving the old snapshot meanwhile
+        """
+        get_shared_cache().invalidate()
+        if wait:
+            self._load()
+
+    def stats(self):
+        """Return cache metrics for monitoring"""
+        snapshot = self._state.snapshot
+        staleness = 0.0
+        if snapshot is not None and not self._is_fresh(snapshot) and self._stale_since is not None:
+            staleness = round(time.time() - self._stale_since, 3)
+        return {
+            'source': self.source,
+            'products': len(snapshot.products) if snapshot is not None else 0,
+            'generation': snapshot.generation if snapshot is not None else None,
+            'version': self.version,
+            'loaded_at': snapshot.loaded_at if snapshot is not None else None,
+            'staleness_seconds': staleness,
+            'loads': self.metrics.loads,
+            'catch_ups': self.metrics.catch_ups,
+            'background_refreshes': self.metrics.background_refreshes,
+            'stale_reads': self.metrics.stale_reads,
+            'failures': self.metrics.failures,
+            'last_refresh_duration_ms': self.metrics.last_refresh_duration_ms,
+            'last_refresh_at': self.metrics.last_refresh_at,
+            'last_error': self.metrics.last_error,
+        }
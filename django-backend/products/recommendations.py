@@ -0,0 +1,303 @@
+"""
+Precomputed product recommendations: best sellers and frequently bought together.
+
+The build_recommendations command streams every order once, counting how
+often each pair of products was bought in the same order, and keeps the
+top K partners of each product. The result is stored as one document per
+product in the product_recommendations collection. Web workers load those
+documents into a RelatedIndex, which holds product IDs in a list and the
+partners of product i at positions [i * K, (i + 1) * K) of two flat
+32-bit integer arrays, so a lookup is one dictionary access plus an array
+slice, and 5,000 products with K = 10 take about 400 KB.
+"""
+from array import array
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .catalog_index import facet_value
+
+logger = logging.getLogger(__name__)
+
+# Marks an unused partner slot in RelatedIndex.partners
+EMPTY = -1
+
+
+class RelatedIndex:
+    """Array-backed top-K co-purchase partners and units sold per product"""
+
+    def __init__(self, top_k):
+        """
+        Args:
+            top_k: Partners kept per product
+        """
+        self.top_k = top_k
+        self.product_ids = []
+        self.positions = {}
+        self.partners = array('i')
+        self.counts = array('I')
+        self.units = array('L')
+        self.orders = array('L')
+        self._best_sellers = None
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def position(self, product_id):
+        """Return the position of a product, adding it if it is new"""
+        position = self.positions.get(product_id)
+        if position is None:
+            position = len(self.product_ids)
+            self.positions[product_id] = position
+            self.product_ids.append(product_id)
+            self.partners.extend([EMPTY] * self.top_k)
+            self.counts.extend([0] * self.top_k)
+            self.units.append(0)
+            self.orders.append(0)
+            self._best_sellers = None
+        return position
+
+    def set_partners(self, product_id, partners):
+        """
+        Store the partners of a product.
+        Args:
+            product_id: Product ID
+            partners: Iterable of (partner ID, times bought together), best first;
+                only the first top_k are kept
+        """
+        start = self.position(product_id) * self.top_k
+        slot = 0
+        for partner_id, count in partners:
+            if slot == self.top_k:
+                break
+            self.partners[start + slot] = self.position(partner_id)
+            self.counts[start + slot] = count
+            slot += 1
+        for empty in range(start + slot, start + self.top_k):
+            self.partners[empty] = EMPTY
+            self.counts[empty] = 0
+
+    def related(self, product_id, limit=None):
+        """
+        Return the products most often bought with a product.
+        Args:
+            product_id: Product ID
+            limit: Maximum number of partners, or None for all kept
+        Returns:
+            List of (partner ID, times bought together), best first
+        """
+        position = self.positions.get(product_id)
+        if position is None:
+            return []
+        start = position * self.top_k
+        end = start + min(self.top_k, limit if limit is not None else self.top_k)
+        return [
+            (self.product_ids[partner], count)
+            for partner, count in zip(self.partners[start:end], self.counts[start:end])
+            if partner != EMPTY
+        ]
+
+    def best_sellers(self, limit=None):
+        """
+        Return the products with the most units sold.
+        Returns:
+            List of (product ID, units sold, orders), best first
+        """
+        if self._best_sellers is None:
+            self._best_sellers = array('l', sorted(
+                (position for position in range(len(self.product_ids)) if self.units[position]),
+                key=lambda position: (-self.units[position], -self.orders[position], self.product_ids[position])
+            ))
+        ranked = self._best_sellers if limit is None else self._best_sellers[:limit]
+        return [(self.product_ids[position], self.units[position], self.orders[position]) for position in ranked]
+
+    def documents(self):
+        """Return one summary document per product, as stored in the database"""
+        return [
+            {
+                '_id': product_id,
+                'units': self.units[position],
+                'orders': self.orders[position],
+                'related': [{'_id': partner_id, 'count': count} for partner_id, count in self.related(product_id)],
+            }
+            for position, product_id in enumerate(self.product_ids)
+        ]
+
+    @classmethod
+    def from_documents(cls, documents, top_k):
+        """Load an index from the documents written by documents()"""
+        index = cls(top_k)
+        for doc in documents:
+            position = index.position(doc['_id'])
+            index.units[position] = doc.get('units') or 0
+            index.orders[position] = doc.get('orders') or 0
+            index.set_partners(doc['_id'], (
+                (partner['_id'], partner.get('count') or 0) for partner in doc.get('related') or []
+            ))
+        return index
+
+
+def build(orders, top_k):
+    """
+    Count co-purchases over a stream of orders.
+    Args:
+        orders: Iterable of order documents, consumed once
+        top_k: Partners kept per product
+    Returns:
+        Tuple of (orders read, RelatedIndex)
+    """
+    index = RelatedIndex(top_k)
+    # Sparse pair counts, one dictionary of partner position -> count per product position
+    pairs = []
+    count = 0
+    for order in orders:
+        count += 1
+        quantities = {}
+        for item in order.get('items') or []:
+            if item.get('_id'):
+                quantities[item['_id']] = quantities.get(item['_id'], 0) + (item.get('quantity') or 0)
+
+        positions = [index.position(product_id) for product_id in quantities]
+        while len(pairs) < len(index):
+            pairs.append({})
+        for product_id, position in zip(quantities, positions):
+            index.units[position] += quantities[product_id]
+            index.orders[position] += 1
+            row = pairs[position]
+            for partner in positions:
+                if partner != position:
+                    row[partner] = row.get(partner, 0) + 1
+
+    for position, row in enumerate(pairs):
+        # Ties go to the partner that sells more, then to the lower ID, so builds are repeatable
+        best = heapq.nsmallest(top_k, row.items(), key=lambda entry: (
+            -entry[1], -index.units[entry[0]], index.product_ids[entry[0]]
+        ))
+        index.set_partners(index.product_ids[position], (
+            (index.product_ids[partner], together) for partner, together in best
+        ))
+
+    logger.info(f"Counted co-purchases of {len(index)} products from {count} orders")
+    return count, index
+
+
+def store(index, collection):
+    """
+    Replace the stored recommendations with an index.
+    Returns:
+        Number of documents written
+    """
+    documents = index.documents()
+    collection.delete_many({})
+    if documents:
+        collection.insert_many(documents, ordered=False)
+    return len(documents)
+
+
+class Recommendations:
+    """Per-process snapshot of the stored recommendation index"""
+
+    def __init__(self, collection, top_k=10, cache_ttl=300):
+        """
+        Args:
+            collection: Callable returning the product_recommendations collection
+            top_k: Partners kept per product
+            cache_ttl: Seconds a loaded index is served before it is reloaded
+        """
+        self._collection = collection
+        self.top_k = top_k
+        self.cache_ttl = cache_ttl
+        self.loads = 0
+        self.failures = 0
+        self.last_error = None
+        self._index = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get_index(self):
+        """
+        Return the current RelatedIndex, reloading it when it is older than cache_ttl.
+        A failed reload keeps serving the previous index.
+        """
+        if self._index is None or time.time() - self._loaded_at > self.cache_ttl:
+            with self._lock:
+                if self._index is None or time.time() - self._loaded_at > self.cache_ttl:
+                    try:
+                        self._index = RelatedIndex.from_documents(self._collection().find({}), self.top_k)
+                        self.loads += 1
+                    except Exception as e:
+                        self.failures += 1
+                        self.last_error = str(e)
+                        logger.error(f"Loading product recommendations failed: {str(e)}")
+                        if self._index is None:
+                            raise
+                    self._loaded_at = time.time()
+        return self._index
+
+    def invalidate(self):
+        """Reload the index on the next read"""
+        self._index = None
+
+    def stats(self):
+        """Return load counters for monitoring"""
+        return {
+            'products': len(self._index) if self._index is not None else None,
+            'loads': self.loads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'index_age_seconds': round(time.time() - self._loaded_at, 3) if self._index is not None else None,
+        }
+
+
+def catalog_neighbours(catalog, product, limit, exclude=(), hidden=None):
+    """
+    Products similar to a product by catalog facets, for products without co-purchases.
+    Sold-out products are never suggested.
+    Args:
+        catalog: CatalogIndex of the product backend
+        product: Product dictionary
+        limit: Maximum number of products
+        exclude: Product IDs to leave out
+        hidden: Dictionary mapping facet names to a value whose products are left out
+    Returns:
+        List of product dictionaries: same brand and price tier first, then
+        same brand, then same price tier, each closest in price first
+    """
+    brand = product.get('brand')
+    price_tier = facet_value(product, 'price_tier')
+    price = product.get('price') or 0
+    skip = set(exclude) | {product.get('_id')}
+    hidden = {**(hidden or {}), 'in_stock': False}
+
+    neighbours = []
+    for filters in (
+        {'brand': brand, 'price_tier': price_tier},
+        {'brand': brand},
+        {'price_tier': price_tier},
+    ):
+        if len(neighbours) >= limit or None in filters.values():
+            continue
+        candidates = [
+            candidate for candidate in catalog.filter(filters, exclude=hidden)
+            if candidate.get('_id') not in skip
+        ]
+        candidates.sort(key=lambda candidate: abs((candidate.get('price') or 0) - price))
+        for candidate in candidates[:limit - len(neighbours)]:
+            neighbours.append(candidate)
+            skip.add(candidate['_id'])
+    return neighbours
+
+
+def _recommendation_collection():
+    from .order_models import AstraOrderDB
+    return AstraOrderDB.get_recommendation_collection()
+
+
+recommendations = Recommendations(
+    _recommendation_collection,
+    top_k=getattr(settings, 'RECOMMENDATIONS_TOP_K', 10),
+    cache_ttl=getattr(settings, 'RECOMMENDATIONS_CACHE_TTL', 300),
+)
@@ -0,0 +1,169 @@
+"""
+Cache of encoded GET responses keyed by catalog version.
+
+A cached response keeps its JSON body, optional compressed copies and a
+strong ETag. Entries are reused until the catalog version changes, and
+requests carrying a matching If-None-Match get a 304 without touching
+the view at all.
+"""
+from functools import wraps
+import gzip
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """Encoded response body with its ETag and compressed variants"""
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Return the body compressed with 'gzip' or 'br', compressing once on first use"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    if encoding == 'br':
+                        body = brotli.compress(self.body)
+                    else:
+                        body = gzip.compress(self.body, mtime=0)
+                    self._encoded[encoding] = body
+        return body
+
+    def etag_for(self, encoding):
+        """Each representation needs its own strong ETag"""
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+class ResponseCache:
+    """Bounded map of request keys to the response cached for a catalog version"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        return None
+
+    def put(self, key, entry):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Drop the oldest entry; dicts keep insertion order
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(getattr(settings, 'RESPONSE_CACHE_MAX_ENTRIES', 512))
+
+
+def _request_key(view_name, request, kwargs):
+    """Identify a cacheable request by view, URL arguments, host and query string"""
+    query = tuple((name, tuple(values)) for name, values in sorted(request.GET.lists()))
+    return (view_name, tuple(sorted(kwargs.items())), request.get_host(), query)
+
+
+def _choose_encoding(request, body):
+    """Pick a content encoding the client accepts, if compression is worthwhile"""
+    if not getattr(settings, 'RESPONSE_CACHE_COMPRESSION', True):
+        return None
+    if len(body) < getattr(settings, 'RESPONSE_CACHE_MIN_COMPRESS_SIZE', 1024):
+        return None
+    accepted = {
+        token.split(';')[0].strip().lower()
+        for token in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+    }
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _if_none_match(request):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return {tag.strip() for tag in header.split(',') if tag.strip()}
+
+
+def _build_response(request, entry):
+    """Return a 304 or the cached body in the best encoding for the request"""
+    encoding = _choose_encoding(request, entry.body)
+    etag = entry.etag_for(encoding)
+
+    client_tags = _if_none_match(request)
+
+    if etag in client_tags or '*' in client_tags:
+        response = HttpResponseNotModified()
+    elif encoding is None:
+        response = HttpResponse(entry.body, content_type='application/json')
+    else:
+        response = HttpResponse(entry.encoded(encoding), content_type='application/json')
+        response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = getattr(settings, 'RESPONSE_CACHE_CONTROL', 'no-cache')
+    return response
+
+
+def cache_response(view_name, get_version):
+    """
+    Cache successful GET responses of a view until the catalog version changes.
+    Args:
+        view_name: Name used to namespace the cache keys
+        get_version: Callable returning the current catalog version
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+
+            version = get_version()
+            key = _request_key(view_name, request, kwargs)
+            entry = response_cache.get(key, version)
+
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+                if isinstance(response, Response):
+                    body = JSONRenderer().render(response.data)
+                else:
+                    body = response.content
+
+                entry = CachedResponse(version, body)
+                response_cache.put(key, entry)
+
+            return _build_response(request, entry)
+        return wrapper
+    return decorator
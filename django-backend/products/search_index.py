@@ -0,0 +1,199 @@
+"""
+In-process full-text search over the product catalog.
+
+Builds an inverted index from product tokens to weighted postings and a
+sorted vocabulary, so queries resolve by exact and prefix token lookups
+instead of scanning every product.
+"""
+from bisect import bisect_left, insort
+import heapq
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# How much a token found in each part of the product counts towards its score
+FIELD_WEIGHTS = (
+    ('name', 4.0),
+    ('brand', 3.0),
+    ('specs', 1.0),
+    ('description', 0.5),
+)
+
+# Prefix matches rank below exact token matches
+PREFIX_WEIGHT = 0.5
+
+# Upper bound on vocabulary tokens a single prefix expands to
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def _field_text(product, field):
+    """Return the searchable text of a product field"""
+    if field != 'specs':
+        return product.get(field)
+    specs = product.get('specs') or {}
+    if not isinstance(specs, dict):
+        return None
+    return ' '.join(str(value) for value in specs.values() if isinstance(value, (str, int, float)))
+
+
+class SearchIndex:
+    """Inverted token index with prefix lookups for typeahead"""
+
+    def __init__(self, products=None):
+        self._postings = {}
+        # Tokens whose postings belong to this index rather than being shared with the one it was copied from
+        self._owned = set()
+        self._tokens = {}
+        self._order = {}
+        self._next_order = 0
+        self._vocabulary = []
+
+        for product in products or []:
+            self.add(product)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def copy(self):
+        """
+        Return an index that can be changed without affecting this one.
+        The postings of each token are shared until the copy changes them.
+        """
+        clone = SearchIndex()
+        clone._postings = dict(self._postings)
+        clone._tokens = dict(self._tokens)
+        clone._order = dict(self._order)
+        clone._next_order = self._next_order
+        clone._vocabulary = list(self._vocabulary)
+        return clone
+
+    def _own_postings(self, token):
+        """Return the postings of a token for changing, copying them first if they are shared"""
+        postings = self._postings.get(token)
+        if postings is not None and token not in self._owned:
+            postings = self._postings[token] = dict(postings)
+            self._owned.add(token)
+        return postings
+
+    def add(self, product):
+        """
+        Index a product's searchable fields. Replaces any earlier entry for the same ID.
+        Args:
+            product: Product dictionary with an '_id' key
+        """
+        product_id = product.get('_id')
+        if product_id is None:
+            return
+
+        if product_id in self._tokens:
+            self._unindex(product_id)
+        else:
+            self._order[product_id] = self._next_order
+            self._next_order += 1
+
+        scores = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(_field_text(product, field)):
+                scores[token] = scores.get(token, 0.0) + weight
+
+        for token, score in scores.items():
+            postings = self._own_postings(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._owned.add(token)
+                insort(self._vocabulary, token)
+            postings[product_id] = score
+
+        self._tokens[product_id] = tuple(scores)
+
+    def _unindex(self, product_id):
+        """Remove a product's postings, dropping tokens no other product uses"""
+        for token in self._tokens.pop(product_id, ()):
+            postings = self._own_postings(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                self._owned.discard(token)
+                position = bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    def remove(self, product_id):
+        """Drop a product from the search index"""
+        if product_id in self._tokens:
+            self._unindex(product_id)
+            del self._order[product_id]
+
+    def complete(self, prefix, limit=MAX_PREFIX_EXPANSION):
+        """
+        Return vocabulary tokens starting with a prefix.
+        Args:
+            prefix: Lowercase token prefix
+            limit: Maximum number of tokens to return
+        Returns:
+            List of tokens in alphabetical order
+        """
+        tokens = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and len(tokens) < limit:
+            token = self._vocabulary[position]
+            if not token.startswith(prefix):
+                break
+            tokens.append(token)
+            position += 1
+        return tokens
+
+    def _term_scores(self, term):
+        """Score every product matching a query term exactly or by prefix"""
+        scores = dict(self._postings.get(term, {}))
+        for token in self.complete(term):
+            if token == term:
+                continue
+            for product_id, score in self._postings[token].items():
+                prefix_score = score * PREFIX_WEIGHT
+                if prefix_score > scores.get(product_id, 0.0):
+                    scores[product_id] = prefix_score
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Find products matching every term of a query.
+        Args:
+            query: Free-text query; each term matches whole tokens or token prefixes
+            limit: Maximum number of results, or None for all
+        Returns:
+            List of (product_id, score) tuples, best match first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        term_scores = [self._term_scores(term) for term in terms]
+        term_scores.sort(key=len)
+
+        totals = dict(term_scores[0])
+        for scores in term_scores[1:]:
+            totals = {
+                product_id: total + scores[product_id]
+                for product_id, total in totals.items()
+                if product_id in scores
+            }
+            if not totals:
+                return []
+
+        rank = lambda item: (-item[1], self._order[item[0]])
+        if limit is not None:
+            return heapq.nsmallest(limit, totals.items(), key=rank)
+        return sorted(totals.items(), key=rank)
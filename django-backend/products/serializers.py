@@ -20,6 +20,18 @@ class ProductSerializer(serializers.Serializer):
     image_url = serializers.URLField(required=False)  # Backward compatibility
     in_stock = serializers.BooleanField(default=True)
     stock_quantity = serializers.IntegerField(default=0)
+    images_status = serializers.CharField(read_only=True)  # Set while images are validated in the background
+    
+    def __init__(self, *args, **kwargs):
+        """Accept an optional 'fields' iterable to serialize only a subset of fields"""
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if fields is not None:
+            # The product ID is always returned so clients can link to the detail page
+            allowed = set(fields) | {'_id'}
+            for field_name in set(self.fields) - allowed:
+                self.fields.pop(field_name)
 
 
 class CreateProductSerializer(serializers.Serializer):
@@ -0,0 +1,440 @@
+"""
+Product cache storage shared between worker processes.
+
+Every backend exposes a generation number and a snapshot of the catalog
+tagged with the generation it belongs to. Workers compare the generation
+they loaded against the current one on each read, so a change made by
+any worker is noticed by all of them, and only one worker at a time
+reloads the catalog from the database.
+
+The snapshot is only stored in full when the catalog is loaded from the
+database. Each write after that is recorded as one Change per generation,
+so a worker that is a few generations behind applies the changes it missed
+to its own copy instead of reading the whole catalog again. Once
+PRODUCT_CACHE_MAX_CHANGES changes have built up, the next write stores the
+snapshot in full and starts a new log.
+
+- LocalSnapshotCache keeps everything in the current process (the
+  behaviour of a plain class-attribute cache).
+- FileSnapshotCache keeps the generation in a memory-mapped counter file,
+  the snapshot in a JSON file and the changes in an append-only log, so
+  all workers on a host share one copy on disk and in the page cache.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; fall back to in-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_GENERATION_FORMAT = '<Q'
+_GENERATION_SIZE = struct.calcsize(_GENERATION_FORMAT)
+
+# A catalog snapshot: the products, the generation they belong to and the
+# time they were last loaded in full from the database
+Snapshot = namedtuple('Snapshot', ['generation', 'products', 'loaded_at'])
+
+# One write to the catalog: the generation it started, the ID of the product
+# and the product as stored, or None if it was deleted
+Change = namedtuple('Change', ['generation', 'product_id', 'product'])
+
+
+class SnapshotCache:
+    """
+    Base class for shared snapshot caches.
+
+    Subclasses provide storage primitives; the locking protocol for loads
+    and writes is shared.
+    """
+
+    def generation(self):
+        """Return the current cache generation"""
+        raise NotImplementedError
+
+    def lock(self):
+        """Context manager held while the generation or snapshot is changed"""
+        raise NotImplementedError
+
+    def _advance(self):
+        """Start a new generation and return it; the lock must be held"""
+        raise NotImplementedError
+
+    def _read_stored(self):
+        """Return the snapshot last stored in full, or None"""
+        raise NotImplementedError
+
+    def _stored_generation(self):
+        """Return the generation of the snapshot last stored in full, or None"""
+        stored = self._read_stored()
+        return stored.generation if stored is not None else None
+
+    def _write(self, snapshot):
+        """Store a snapshot in full and discard the change log; the lock must be held"""
+        raise NotImplementedError
+
+    def _record(self, change):
+        """Append a Change to the log; the lock must be held"""
+        raise NotImplementedError
+
+    def _changes(self, after):
+        """Return the logged changes with a generation above after, oldest first"""
+        raise NotImplementedError
+
+    def changes_since(self, generation, until=None):
+        """
+        Return the changes leading from one generation to a later one.
+        Args:
+            generation: Generation the caller holds
+            until: Generation to stop at, defaulting to the current one
+        Returns:
+            List of Change, or None if the log does not hold every generation
+            in between because the catalog was reloaded or invalidated meanwhile
+        """
+        if until is None:
+            until = self.generation()
+        if generation > until:
+            return None
+        if generation == until:
+            return []
+        changes = {}
+        for change in self._changes(generation):
+            if change.generation <= until:
+                # A record left by a writer that failed before advancing is superseded by the next one
+                changes[change.generation] = change
+        if len(changes) != until - generation:
+            return None
+        return [changes[number] for number in range(generation + 1, until + 1)]
+
+    def read(self, generation):
+        """Return the Snapshot of a generation, built from the stored one and the change log, or None"""
+        stored_generation = self._stored_generation()
+        if stored_generation is None or stored_generation > generation:
+            return None
+        changes = self.changes_since(stored_generation, generation)
+        if changes is None:
+            return None
+        stored = self._read_stored()
+        if stored is None or stored.generation != stored_generation:
+            # Stored in full again while it was being read
+            return None
+        if not changes:
+            return stored
+        return Snapshot(generation, apply_changes(stored.products, changes), stored.loaded_at)
+
+    def invalidate(self):
+        """Discard the current snapshot; every worker reloads on its next read"""
+        with self.lock():
+            return self._advance()
+
+    def load(self, fetch, max_age=None):
+        """
+        Return the current snapshot, loading it from the database at most once.
+
+        When no usable snapshot exists, one caller takes the lock and runs
+        fetch(); everyone else waiting on the lock then reads the snapshot it
+        stored instead of loading again.
+        Args:
+            fetch: Callable returning the full product list from the database
+            max_age: Reload snapshots whose last full load is older than this many seconds
+        Returns:
+            Snapshot
+        """
+        snapshot = self.read(self.generation())
+        if snapshot is not None and not _expired(snapshot, max_age):
+            return snapshot
+
+        with self.lock():
+            snapshot = self.read(self.generation())
+            if snapshot is None or _expired(snapshot, max_age):
+                loaded_at = time.time()
+                products = fetch()
+                snapshot = Snapshot(self._advance(), products, loaded_at)
+                self._write(snapshot)
+        return snapshot
+
+    def apply(self, base, change):
+        """
+        Record a write as a change instead of storing the catalog again.
+
+        The change is made on top of the caller's snapshot caught up with
+        the changes other writers recorded since, so concurrent writers never
+        lose each other's changes. Neither snapshot is modified.
+        Args:
+            base: Snapshot the caller holds, or None
+            change: Callable taking the current product list and returning the
+                    (product ID, new product or None to delete it) of the write;
+                    raises LookupError if the list does not contain what the
+                    write expects
+        Returns:
+            Tuple of (new Snapshot, list of Change leading from base to it), with
+            None in place of the list when base could not be caught up and the
+            snapshot was read in full; (None, None) if the cache had to be
+            invalidated instead
+        """
+        with self.lock():
+            current = self.generation()
+            changes = self.changes_since(base.generation, current) if base is not None else None
+            if changes is None:
+                base = self.read(current)
+                if base is None:
+                    self._advance()
+                    return None, None
+                products = base.products
+            else:
+                products = apply_changes(base.products, changes)
+
+            try:
+                product_id, product = change(products)
+            except LookupError:
+                self._advance()
+                return None, None
+
+            written = Change(current + 1, product_id, product)
+            self._record(written)
+            snapshot = Snapshot(self._advance(), apply_changes(products, [written]), base.loaded_at)
+
+            stored_generation = self._stored_generation()
+            max_changes = getattr(settings, 'PRODUCT_CACHE_MAX_CHANGES', 256)
+            if stored_generation is None or snapshot.generation - stored_generation >= max_changes:
+                self._write(snapshot)
+            return snapshot, (changes + [written] if changes is not None else None)
+
+
+def _expired(snapshot, max_age):
+    return bool(max_age) and time.time() - snapshot.loaded_at > max_age
+
+
+class LocalSnapshotCache(SnapshotCache):
+    """Snapshot cache that lives in the current process only"""
+
+    def __init__(self):
+        self._generation = 1
+        self._stored = None
+        self._log = []
+        self._lock = threading.RLock()
+
+    def generation(self):
+        return self._generation
+
+    def lock(self):
+        return self._lock
+
+    def _advance(self):
+        self._generation += 1
+        return self._generation
+
+    def _read_stored(self):
+        return self._stored
+
+    def _write(self, snapshot):
+        self._stored = snapshot
+        self._log = []
+
+    def _record(self, change):
+        self._log.append(change)
+
+    def _changes(self, after):
+        return [change for change in self._log if change.generation > after]
+
+
+class FileSnapshotCache(SnapshotCache):
+    """Snapshot cache shared by all processes on a host through files in one directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._snapshot_path = os.path.join(directory, 'products.snapshot')
+        self._changes_path = os.path.join(directory, 'products.changes')
+        self._lock_path = os.path.join(directory, 'products.lock')
+        self._generation_path = os.path.join(directory, 'products.generation')
+        self._thread_lock = threading.RLock()
+        self._generation_map = None
+        self._generation_pid = None
+
+    def _map_generation(self):
+        """Memory-map the generation counter, re-mapping after a fork"""
+        if self._generation_map is None or self._generation_pid != os.getpid():
+            fd = os.open(self._generation_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < _GENERATION_SIZE:
+                    os.write(fd, struct.pack(_GENERATION_FORMAT, 1))
+                self._generation_map = mmap.mmap(fd, _GENERATION_SIZE)
+            finally:
+                os.close(fd)
+            self._generation_pid = os.getpid()
+        return self._generation_map
+
+    def generation(self):
+        """Return the current cache generation (a single read from shared memory)"""
+        return struct.unpack_from(_GENERATION_FORMAT, self._map_generation(), 0)[0]
+
+    def _read_stored(self):
+        try:
+            with open(self._snapshot_path, 'rb') as snapshot_file:
+                with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    header_end = mapped.find(b'\n')
+                    header = json.loads(mapped[:header_end])
+                    products = json.loads(mapped[header_end + 1:])
+                    return Snapshot(header['generation'], products, header.get('loaded_at', 0))
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def _stored_generation(self):
+        """Read only the header of the stored snapshot"""
+        try:
+            with open(self._snapshot_path, 'rb') as snapshot_file:
+                return json.loads(snapshot_file.readline())['generation']
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock across threads and processes"""
+        with self._thread_lock:
+            with open(self._lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _advance(self):
+        mapped = self._map_generation()
+        generation = struct.unpack_from(_GENERATION_FORMAT, mapped, 0)[0] + 1
+        struct.pack_into(_GENERATION_FORMAT, mapped, 0, generation)
+        mapped.flush()
+        return generation
+
+    def _write(self, snapshot):
+        """Atomically replace the snapshot file, then empty the change log"""
+        header = {'generation': snapshot.generation, 'loaded_at': snapshot.loaded_at}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='products.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(json.dumps(header).encode('utf-8'))
+                tmp_file.write(b'\n')
+                tmp_file.write(json.dumps(snapshot.products, ensure_ascii=False, default=str).encode('utf-8'))
+            os.replace(tmp_path, self._snapshot_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        # Readers racing the truncation find a gap in the log and read the new snapshot instead
+        open(self._changes_path, 'wb').close()
+
+    def _record(self, change):
+        """Append one line holding the generation and the JSON of the product ID and product"""
+        record = json.dumps([change.product_id, change.product], ensure_ascii=False, default=str)
+        with open(self._changes_path, 'ab') as log:
+            log.write(f'{change.generation} {record}\n'.encode('utf-8'))
+
+    def _changes(self, after):
+        """Parse only the records above after; a line still being written is left for the next read"""
+        try:
+            with open(self._changes_path, 'rb') as log:
+                lines = log.read().split(b'\n')[:-1]
+        except FileNotFoundError:
+            return []
+        changes = []
+        for line in lines:
+            generation, _, record = line.partition(b' ')
+            try:
+                generation = int(generation)
+                if generation <= after:
+                    continue
+                product_id, product = json.loads(record)
+            except ValueError:
+                logger.warning(f"Ignoring malformed product cache change log in {self.directory}")
+                break
+            changes.append(Change(generation, product_id, product))
+        return changes
+
+
+_shared_cache = None
+
+
+def get_shared_cache():
+    """Return the product snapshot cache configured by PRODUCT_CACHE_BACKEND"""
+    global _shared_cache
+    if _shared_cache is None:
+        backend = getattr(settings, 'PRODUCT_CACHE_BACKEND', 'local')
+        if backend == 'file':
+            _shared_cache = FileSnapshotCache(settings.PRODUCT_CACHE_DIR)
+            logger.info(f"Using shared product cache in {settings.PRODUCT_CACHE_DIR}")
+        else:
+            _shared_cache = LocalSnapshotCache()
+    return _shared_cache
+
+
+def apply_changes(products, changes):
+    """
+    Apply changes to a product list.
+    Args:
+        products: Product list, left unchanged
+        changes: List of Change, oldest first
+    Returns:
+        A new product list, or products itself if there are no changes
+    """
+    if not changes:
+        return products
+    products = list(products)
+    positions = {product.get('_id'): position for position, product in enumerate(products)}
+    removed = False
+    for change in changes:
+        position = positions.get(change.product_id)
+        if change.product is None:
+            if position is not None:
+                products[position] = None
+                del positions[change.product_id]
+                removed = True
+        elif position is None:
+            positions[change.product_id] = len(products)
+            products.append(change.product)
+        else:
+            products[position] = change.product
+    if removed:
+        products = [product for product in products if product is not None]
+    return products
+
+
+def append_product(products, product):
+    """Return the change adding a new product to a cached product list"""
+    return product.get('_id'), product
+
+
+def replace_product(products, product_id, build):
+    """
+    Return the change replacing a product in a cached product list.
+    Args:
+        products: Cached product list, left unchanged
+        product_id: ID of the product to replace
+        build: Callable taking the cached product and returning its replacement
+    Returns:
+        Tuple of (product ID, replacement product)
+    Raises:
+        LookupError: If the product is not in the list
+    """
+    for product in products:
+        if product.get('_id') == product_id:
+            return product_id, build(product)
+    raise LookupError(product_id)
+
+
+def remove_product(products, product_id):
+    """Return the change removing a product from a cached product list"""
+    return product_id, None
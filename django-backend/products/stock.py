@@ -0,0 +1,78 @@
+"""
+Stock reservation for checkout.
+
+Each product in an order takes its quantity from the stock with one atomic
+conditional write on the backend (reserve_stock), which fails rather than
+letting the stock go below zero, so concurrent buyers cannot oversell a
+product. If any product cannot be reserved the products already reserved
+are released again: an order holds stock for all of its lines or for none.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OutOfStockError(ValueError):
+    """Order lines whose stock could not be reserved"""
+
+    def __init__(self, message, errors):
+        """
+        Args:
+            message: Summary of the problem
+            errors: List of {'product_id', 'quantity', 'error'} dictionaries
+        """
+        super().__init__(message)
+        self.errors = errors
+
+
+def _quantities(items):
+    """Total quantity per product ID, in the order products first appear"""
+    quantities = {}
+    for item in items:
+        quantities[item['_id']] = quantities.get(item['_id'], 0) + item['quantity']
+    return quantities
+
+
+def release_stock(model, reservations):
+    """
+    Give reserved stock back.
+    Args:
+        model: Product model class providing release_stock
+        reservations: List of (product ID, quantity) returned by reserve_stock
+    """
+    for product_id, quantity in reservations:
+        try:
+            if not model.release_stock(product_id, quantity):
+                logger.error(f"Could not release {quantity} units of product {product_id}: product not found")
+        except Exception as e:
+            logger.error(f"Could not release {quantity} units of product {product_id}: {str(e)}")
+
+
+def reserve_stock(model, items):
+    """
+    Reserve stock for every line of an order.
+    Args:
+        model: Product model class providing reserve_stock and release_stock
+        items: Priced order lines, each with '_id' and 'quantity'
+    Returns:
+        List of (product ID, quantity) reservations, for release_stock
+    Raises:
+        OutOfStockError: If a product does not have enough stock left; nothing stays reserved
+    """
+    reservations = []
+    try:
+        for product_id, quantity in _quantities(items).items():
+            if not model.reserve_stock(product_id, quantity):
+                release_stock(model, reservations)
+                raise OutOfStockError("Not enough stock", [
+                    {'product_id': product_id, 'quantity': quantity, 'error': 'Not enough stock'}
+                ])
+            reservations.append((product_id, quantity))
+    except OutOfStockError:
+        raise
+    except Exception:
+        release_stock(model, reservations)
+        raise
+
+    logger.info(f"Reserved stock for {len(reservations)} products")
+    return reservations
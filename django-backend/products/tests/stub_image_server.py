@@ -0,0 +1,94 @@
+"""
+Local stub HTTP server for image URL validation tests and benchmarks.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+
+class _StubImageHandler(BaseHTTPRequestHandler):
+    """
+    Answers HEAD requests after the server's latency: 404 under /missing/,
+    and only after slow_latency under /slow/. Connections are kept alive so
+    clients can reuse them.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_HEAD(self):
+        with self.server.stats_lock:
+            self.server.requests.append(self.path)
+        if self.path.startswith('/slow/'):
+            time.sleep(self.server.slow_latency)
+        else:
+            time.sleep(self.server.latency)
+        self.send_response(404 if self.path.startswith('/missing/') else 200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubImageServer:
+    """
+    Image server on a free local port, counting requests and TCP connections.
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, latency=0.1, slow_latency=5):
+        """
+        Args:
+            latency: Seconds before an ordinary HEAD request is answered
+            slow_latency: Seconds before a HEAD request under /slow/ is answered
+        """
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self._server = None
+
+    def start(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _StubImageHandler)
+        server.daemon_threads = True
+        server.latency = self.latency
+        server.slow_latency = self.slow_latency
+        server.requests = []
+        server.connections = 0
+        server.stats_lock = threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._server = server
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def url(self, path):
+        """Absolute URL of a path on the server"""
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    @property
+    def requests(self):
+        """Paths requested so far, in arrival order"""
+        with self._server.stats_lock:
+            return list(self._server.requests)
+
+    @property
+    def connections(self):
+        """TCP connections accepted so far"""
+        with self._server.stats_lock:
+            return self._server.connections
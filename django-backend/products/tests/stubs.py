@@ -0,0 +1,360 @@
+"""
+In-memory stand-ins for the database clients, so backends can be tested
+without a cluster.
+"""
+import copy
+import os
+import threading
+import types
+from unittest import mock
+
+
+class Result:
+    """Attribute bag returned by the stub write methods"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _get(document, path):
+    """Value at a dotted path of a document, or None"""
+    value = document
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _matches(document, query):
+    """Whether a document matches a Data API filter (equality, $or and comparison operators)"""
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+            continue
+        value = _get(document, key)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for operator, operand in condition.items():
+            if operator == '$in':
+                if value not in operand:
+                    return False
+            elif value is None:
+                return False
+            elif operator == '$gt' and not value > operand:
+                return False
+            elif operator == '$gte' and not value >= operand:
+                return False
+            elif operator == '$lt' and not value < operand:
+                return False
+            elif operator == '$lte' and not value <= operand:
+                return False
+    return True
+
+
+class FakeCollection:
+    """Data API collection keeping its documents in a dictionary keyed by _id"""
+
+    def __init__(self, documents=()):
+        self.documents = {document['_id']: copy.deepcopy(document) for document in documents}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _matching(self, query):
+        return [document for document in self.documents.values() if _matches(document, query or {})]
+
+    @staticmethod
+    def _apply(document, update):
+        for key, value in update.get('$set', {}).items():
+            document[key] = copy.deepcopy(value)
+        for key, value in update.get('$inc', {}).items():
+            document[key] = document.get(key, 0) + value
+
+    def _insert(self, document):
+        with self._lock:
+            if document['_id'] in self.documents:
+                raise Exception('DOCUMENT_ALREADY_EXISTS')
+            self.documents[document['_id']] = copy.deepcopy(document)
+
+    def insert_one(self, document):
+        self.calls.append('insert_one')
+        self._insert(document)
+        return Result(inserted_id=document['_id'])
+
+    def insert_many(self, documents, ordered=False, **options):
+        self.calls.append('insert_many')
+        for document in documents:
+            self._insert(document)
+        return Result(inserted_ids=[document['_id'] for document in documents])
+
+    def find(self, query=None, sort=None, limit=None, projection=None, **options):
+        self.calls.append('find')
+        documents = [copy.deepcopy(document) for document in self._matching(query)]
+        for key, direction in reversed(list((sort or {}).items())):
+            documents.sort(key=lambda document: _get(document, key), reverse=direction < 0)
+        return iter(documents[:limit] if limit else documents)
+
+    def find_one(self, query=None, **options):
+        self.calls.append('find_one')
+        documents = self._matching(query)
+        return copy.deepcopy(documents[0]) if documents else None
+
+    def update_one(self, query, update, upsert=False, **options):
+        self.calls.append('update_one')
+        with self._lock:
+            documents = self._matching(query)
+            if documents:
+                self._apply(documents[0], update)
+                return Result(update_info={'n': 1, 'nModified': 1})
+            if upsert:
+                document = {'_id': query['_id']}
+                self._apply(document, update)
+                self.documents[document['_id']] = document
+                return Result(update_info={'n': 1, 'upserted': document['_id']})
+        return Result(update_info={'n': 0, 'nModified': 0})
+
+    def replace_one(self, query, replacement, upsert=False, **options):
+        self.calls.append('replace_one')
+        with self._lock:
+            documents = self._matching(query)
+            if documents:
+                document_id = documents[0]['_id']
+            elif upsert:
+                document_id = replacement.get('_id', query.get('_id'))
+            else:
+                return Result(update_info={'n': 0, 'nModified': 0})
+            self.documents[document_id] = {**copy.deepcopy(replacement), '_id': document_id}
+        return Result(update_info={'n': 1})
+
+    def find_one_and_update(self, query, update, projection=None, return_document='before', **options):
+        self.calls.append('find_one_and_update')
+        with self._lock:
+            documents = self._matching(query)
+            if not documents:
+                return None
+            before = copy.deepcopy(documents[0])
+            self._apply(documents[0], update)
+            return copy.deepcopy(documents[0]) if return_document == 'after' else before
+
+    def delete_one(self, query, **options):
+        self.calls.append('delete_one')
+        with self._lock:
+            documents = self._matching(query)
+            if not documents:
+                return Result(deleted_count=0)
+            del self.documents[documents[0]['_id']]
+        return Result(deleted_count=1)
+
+    def delete_many(self, query, **options):
+        self.calls.append('delete_many')
+        with self._lock:
+            documents = self._matching(query)
+            for document in documents:
+                del self.documents[document['_id']]
+        return Result(deleted_count=len(documents))
+
+
+# Primary key columns of the Cassandra tables, partition key first
+CASSANDRA_KEYS = {
+    'products': ('id',),
+    'products_by_brand': ('brand', 'price', 'id'),
+    'products_by_category': ('category', 'price', 'id'),
+    'products_by_price_tier': ('price_tier', 'price', 'id'),
+}
+
+
+class FakePrepared:
+    """Prepared statement of FakeSession"""
+
+    def __init__(self, query):
+        self.query_string = query
+        self.is_idempotent = False
+
+    def bind(self, values):
+        return FakeBound(self, values)
+
+
+class FakeBound:
+    """Bound statement of FakeSession"""
+
+    def __init__(self, prepared, values):
+        self.prepared = prepared
+        self.query_string = prepared.query_string
+        self.values = tuple(values)
+        self.fetch_size = None
+
+
+class FakeBatch:
+    """Stand-in for cassandra.query.BatchStatement"""
+
+    def __init__(self, batch_type=None):
+        self.statements = []
+
+    def add(self, statement, parameters=()):
+        self.statements.append((statement, parameters))
+
+
+class Rows(list):
+    """Result of a FakeSession query"""
+    was_applied = True
+
+    def one(self):
+        return self[0] if self else None
+
+
+class PagedRows(Rows):
+    """Result of a bound statement: one page in current_rows, every row when iterated"""
+
+    def __init__(self, rows, fetch_size, paging_state):
+        super().__init__(rows)
+        start = int(paging_state) if paging_state else 0
+        end = start + (fetch_size or len(rows) or 1)
+        self.current_rows = rows[start:end]
+        self.paging_state = str(end).encode() if end < len(rows) else None
+
+
+class FakeFuture:
+    """Already completed result of execute_async"""
+
+    def __init__(self, call):
+        try:
+            self._value, self._error = call(), None
+        except Exception as e:
+            self._value, self._error = None, e
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def _columns(clause, separator=' AND '):
+    """Column names of 'a = ? AND b = ?', 'a = ?, b = ?' or 'a, b'"""
+    return [condition.split(' = ')[0].strip() for condition in clause.split(separator)]
+
+
+class FakeSession:
+    """
+    Cassandra session over in-memory tables, understanding the CQL the
+    Cassandra backend sends: inserts, upserting updates with optional IF
+    conditions, deletes and selects by primary or partition key.
+    """
+
+    def __init__(self):
+        self.tables = {table: {} for table in CASSANDRA_KEYS}
+        self.queries = []
+        self._lock = threading.RLock()
+
+    def prepare(self, query):
+        return FakePrepared(query)
+
+    def set_keyspace(self, keyspace):
+        pass
+
+    def execute_async(self, statement, parameters=None):
+        return FakeFuture(lambda: self.execute(statement, parameters))
+
+    def execute(self, statement, parameters=None, paging_state=None, **options):
+        if isinstance(statement, FakeBatch):
+            with self._lock:
+                for entry, values in statement.statements:
+                    self.execute(entry, values)
+            return Rows()
+        if isinstance(statement, FakeBound):
+            rows = self._run(statement.query_string, statement.values)
+            return PagedRows(rows, statement.fetch_size, paging_state)
+        query = getattr(statement, 'query_string', statement)
+        return self._run(query, tuple(parameters or ()))
+
+    def _key(self, table, values):
+        return tuple(values[column] for column in CASSANDRA_KEYS[table])
+
+    def _run(self, query, values):
+        self.queries.append(query)
+        words = query.split()
+        if 'ALLOW FILTERING' in query:
+            raise AssertionError(f"Unexpected ALLOW FILTERING: {query}")
+        if query == 'SELECT now() FROM system.local':
+            return Rows([types.SimpleNamespace(now=None)])
+        with self._lock:
+            if words[0] == 'INSERT':
+                table = words[2]
+                row = dict(zip(_columns(query[query.index('(') + 1:query.index(')')], ','), values))
+                self.tables[table][self._key(table, row)] = row
+                return Rows()
+            if words[0] == 'UPDATE':
+                return self._update(words[1], query, values)
+            if words[0] == 'DELETE':
+                table = words[2]
+                key = dict(zip(_columns(query.split(' WHERE ')[1]), values))
+                self.tables[table].pop(self._key(table, key), None)
+                return Rows()
+            if words[0] == 'SELECT':
+                table = words[3]
+                rows = list(self.tables[table].values())
+                if ' WHERE ' in query:
+                    column = _columns(query.split(' WHERE ')[1])[0]
+                    rows = sorted(
+                        (row for row in rows if row.get(column) == values[0]),
+                        key=lambda row: (row.get('price') or 0, str(row['id']))
+                    )
+                return Rows(types.SimpleNamespace(**row) for row in rows)
+        raise ValueError(f"Unsupported CQL: {query}")
+
+    def _update(self, table, query, values):
+        assignments, where = query.split(' SET ', 1)[1].split(' WHERE ')
+        where, _, condition = where.partition(' IF ')
+        set_columns = _columns(assignments, ',')
+        key_columns = _columns(where)
+        key = dict(zip(key_columns, values[len(set_columns):]))
+        row = self.tables[table].get(self._key(table, key))
+
+        if condition:
+            expected = dict(zip(_columns(condition), values[len(set_columns) + len(key_columns):]))
+            if row is None:
+                # Like Cassandra, a missing row returns only the [applied] column
+                result = Rows([types.SimpleNamespace(applied=False)])
+                result.was_applied = False
+                return result
+            if any(row.get(column) != value for column, value in expected.items()):
+                # Otherwise the condition columns come back with their current values
+                current = {column: row.get(column) for column in expected}
+                result = Rows([types.SimpleNamespace(applied=False, **current)])
+                result.was_applied = False
+                return result
+
+        if row is None:
+            row = self.tables[table][self._key(table, key)] = dict(key)
+        row.update(zip(set_columns, values))
+        return Rows()
+
+
+def fake_execute_concurrent(session, statements_and_parameters, concurrency=None, raise_on_first_error=True):
+    """Stand-in for cassandra.concurrent.execute_concurrent, running the statements in turn"""
+    outcomes = []
+    for statement, parameters in statements_and_parameters:
+        try:
+            outcomes.append((True, session.execute(statement, parameters)))
+        except Exception as e:
+            if raise_on_first_error:
+                raise
+            outcomes.append((False, e))
+    return outcomes
+
+
+def patch_cassandra(testcase, session):
+    """Connect the Cassandra backend to a FakeSession for the duration of a test"""
+    from products import models
+
+    for patcher in (
+        mock.patch.object(models.CassandraDB, '_session', session),
+        mock.patch.object(models.CassandraDB, '_prepared', {}),
+        mock.patch.object(models.CassandraDB, '_pid', os.getpid()),
+        mock.patch.object(models, 'BatchStatement', FakeBatch),
+        mock.patch.object(models, 'execute_concurrent', fake_execute_concurrent),
+    ):
+        patcher.start()
+        testcase.addCleanup(patcher.stop)
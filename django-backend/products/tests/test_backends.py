@@ -0,0 +1,232 @@
+"""
+Conformance tests of the ProductBackend contract.
+
+ProductBackendContract holds the tests; each backend runs them against
+stubbed storage: the mock backend against an emptied MOCK_PRODUCTS, Astra
+against an in-memory Data API collection and Cassandra against an
+in-memory session.
+"""
+import threading
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from products import shared_cache
+from products.astra_models import AstraDB, AstraProduct
+from products.mock_models import MOCK_PRODUCTS, MockProduct
+from products.models import Product as CassandraProduct
+from products.tests.stubs import FakeCollection, FakeSession, patch_cassandra
+
+
+def _check_images(images):
+    """Stand-in for the image validator: URLs under /broken/ are not accessible"""
+    for position, url in enumerate(images, start=1):
+        if '/broken/' in url:
+            raise ValueError(f"Image {position} URL is not accessible (status: 404)")
+
+
+def _phone(name, brand='Acme', price=300, stock_quantity=5):
+    return {
+        'name': name,
+        'brand': brand,
+        'category': 'Phone',
+        'price': price,
+        'description': f'{name} phone',
+        'specs': {'price_tier': 'Mid-Range'},
+        'images': [f'https://example.com/images/{name}.jpg'],
+        'in_stock': stock_quantity > 0,
+        'stock_quantity': stock_quantity,
+    }
+
+
+class ProductBackendContract:
+    """Behaviour every product backend shares"""
+    backend = None
+
+    def connect(self):
+        """Point the backend at empty stubbed storage"""
+        raise NotImplementedError
+
+    def setUp(self):
+        super().setUp()
+        self.connect()
+        patcher = mock.patch.object(self.backend, '_validate_image_urls', side_effect=_check_images)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        shared_cache._shared_cache = None
+        self.addCleanup(setattr, shared_cache, '_shared_cache', None)
+        self.backend.refresh_cache(wait=True)
+
+        self.one = self.backend.create(_phone('one', price=100))
+        self.two = self.backend.create(_phone('two', brand='Zeta', price=200))
+        self.sold_out = self.backend.create(_phone('sold-out', price=300, stock_quantity=0))
+
+    def names(self, products):
+        return sorted(product['name'] for product in products)
+
+    def test_create_stores_product(self):
+        created = self.backend.create(_phone('three'))
+
+        self.assertTrue(created['_id'])
+        self.assertEqual(self.backend.get_by_id(created['_id'])['name'], 'three')
+        self.assertIn('three', self.names(self.backend.get_all()))
+        self.assertIn('three', self.names(self.backend.iter_products()))
+
+    def test_create_rejects_broken_images(self):
+        data = {**_phone('broken'), 'images': ['https://example.com/broken/x.jpg']}
+
+        with self.assertRaises(ValueError):
+            self.backend.create(data)
+        self.backend.refresh_cache(wait=True)
+        self.assertNotIn('broken', self.names(self.backend.get_all()))
+
+    def test_update_changes_product(self):
+        self.assertTrue(self.backend.update(self.one['_id'], {'brand': 'Zeta', 'price': 150}))
+
+        self.assertEqual(self.backend.get_by_id(self.one['_id'])['price'], 150)
+        self.assertEqual(self.names(self.backend.get_all({'brand': 'Zeta'})), ['one', 'two'])
+        self.assertEqual(self.names(self.backend.iter_products({'brand': 'Zeta'})), ['one', 'two'])
+
+    def test_update_validates_images_unless_disabled(self):
+        images = ['https://example.com/broken/one.jpg']
+
+        with self.assertRaises(ValueError):
+            self.backend.update(self.one['_id'], {'images': images})
+        self.assertNotEqual(self.backend.get_by_id(self.one['_id'])['images'], images)
+
+        self.assertTrue(self.backend.update(self.one['_id'], {'images': images}, validate_images=False))
+        self.assertEqual(self.backend.get_by_id(self.one['_id'])['images'], images)
+
+    def test_update_unknown_product(self):
+        self.assertFalse(self.backend.update(str(uuid.uuid4()), {'price': 1}))
+
+    def test_delete(self):
+        self.assertTrue(self.backend.delete(self.one['_id']))
+
+        self.assertIsNone(self.backend.get_by_id(self.one['_id']))
+        self.assertEqual(self.names(self.backend.get_all()), ['sold-out', 'two'])
+        self.assertEqual(self.names(self.backend.iter_products()), ['sold-out', 'two'])
+        self.assertFalse(self.backend.delete(self.one['_id']))
+
+    def test_in_stock_filter_accepts_strings_and_booleans(self):
+        for in_stock, names in (
+            (True, ['one', 'two']), ('true', ['one', 'two']), ('True', ['one', 'two']),
+            (False, ['sold-out']), ('false', ['sold-out']),
+        ):
+            with self.subTest(in_stock=in_stock):
+                self.assertEqual(self.names(self.backend.get_all({'in_stock': in_stock})), names)
+                self.assertEqual(self.names(self.backend.iter_products({'in_stock': in_stock})), names)
+
+    def test_get_page_walks_the_catalog(self):
+        seen = []
+        token = None
+        for _ in range(10):
+            products, token = self.backend.get_page(page_size=2, page_token=token)
+            seen.extend(product['_id'] for product in products)
+            if token is None:
+                break
+        self.assertIsNone(token)
+        self.assertEqual(sorted(seen), sorted(p['_id'] for p in (self.one, self.two, self.sold_out)))
+
+    def test_get_page_filters(self):
+        products, _ = self.backend.get_page({'brand': 'Acme', 'in_stock': 'true'}, page_size=10)
+
+        self.assertEqual(self.names(products), ['one'])
+
+    def test_get_page_rejects_malformed_token(self):
+        with self.assertRaises(ValueError):
+            self.backend.get_page(page_size=2, page_token='not a token!')
+
+    def test_get_many_reads_products_the_cache_does_not_hold(self):
+        # bulk_create leaves the cache alone, so the new product is only in the database
+        created, errors = self.backend.bulk_create([_phone('uncached')])
+        self.assertEqual(errors, [])
+        unknown = str(uuid.uuid4())
+
+        products = self.backend.get_many([self.one['_id'], created[0]['_id'], unknown])
+
+        self.assertEqual(self.names(products.values()), ['one', 'uncached'])
+        self.assertNotIn(unknown, products)
+
+    def test_reserve_and_release_stock(self):
+        product_id = self.one['_id']
+
+        self.assertFalse(self.backend.reserve_stock(product_id, 6))
+        self.assertTrue(self.backend.reserve_stock(product_id, 5))
+        product = self.backend.get_by_id(product_id)
+        self.assertEqual((product['stock_quantity'], product['in_stock']), (0, False))
+        self.assertNotIn('one', self.names(self.backend.get_all({'in_stock': True})))
+
+        self.assertTrue(self.backend.release_stock(product_id, 2))
+        product = self.backend.get_by_id(product_id)
+        self.assertEqual((product['stock_quantity'], product['in_stock']), (2, True))
+
+    def test_stock_of_unknown_product(self):
+        self.assertFalse(self.backend.reserve_stock(str(uuid.uuid4()), 1))
+        self.assertFalse(self.backend.release_stock(str(uuid.uuid4()), 1))
+
+
+class MockBackendTests(ProductBackendContract, SimpleTestCase):
+    backend = MockProduct
+
+    def connect(self):
+        patcher = mock.patch.dict(MOCK_PRODUCTS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_update_does_not_lose_a_concurrent_stock_change(self):
+        product_id = self.one['_id']
+        buyer = threading.Thread(target=self.backend.reserve_stock, args=(product_id, 2))
+
+        class Products(dict):
+            def get(products, key, default=None):
+                # Start a purchase once the update has read the product
+                product = super().get(key, default)
+                if buyer.ident is None:
+                    buyer.start()
+                    buyer.join(0.2)
+                return product
+
+        with mock.patch('products.mock_models.MOCK_PRODUCTS', Products(MOCK_PRODUCTS)):
+            self.assertTrue(self.backend.update(product_id, {'price': 120}))
+            buyer.join()
+            stored = self.backend._fetch_one(product_id)
+
+        self.assertEqual((stored['price'], stored['stock_quantity']), (120, 3))
+        self.assertEqual(self.backend.get_by_id(product_id)['stock_quantity'], 3)
+
+
+class AstraBackendTests(ProductBackendContract, SimpleTestCase):
+    backend = AstraProduct
+
+    def connect(self):
+        self.collection = FakeCollection()
+        patcher = mock.patch.object(AstraDB, 'get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_many_raises_when_the_lookup_fails(self):
+        with mock.patch.object(self.collection, 'find', side_effect=Exception('timed out')):
+            with self.assertRaises(Exception):
+                self.backend.get_many([self.one['_id'], str(uuid.uuid4())])
+
+
+class CassandraBackendTests(ProductBackendContract, SimpleTestCase):
+    backend = CassandraProduct
+
+    def connect(self):
+        self.session = FakeSession()
+        patch_cassandra(self, self.session)
+
+    def test_get_many_raises_when_the_lookup_fails(self):
+        run = self.session._run
+
+        def unavailable(query, values):
+            if query.startswith('SELECT'):
+                raise Exception('Unavailable')
+            return run(query, values)
+
+        with mock.patch.object(self.session, '_run', side_effect=unavailable):
+            with self.assertRaises(Exception):
+                self.backend.get_many([self.one['_id'], str(uuid.uuid4())])
@@ -0,0 +1,81 @@
+"""
+Tests for bulk import and export round trips.
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from products import shared_cache
+from products.astra_models import AstraDB, AstraProduct
+from products.bulk import export_lines, import_products, read_rows
+from products.tests.stubs import FakeCollection
+
+
+def _product(product_id, name):
+    return {
+        '_id': product_id,
+        'name': name,
+        'brand': 'Acme',
+        'category': 'phones',
+        'price': 300,
+        'description': 'A phone',
+        'specs': {'price_tier': 'mid'},
+        'images': ['https://example.com/phone.jpg'],
+        'in_stock': True,
+        'stock_quantity': 5,
+    }
+
+
+class ImportExportRoundTripTests(SimpleTestCase):
+    """Importing an export restores the catalog instead of duplicating it"""
+
+    def setUp(self):
+        self.collection = FakeCollection([_product('a', 'Phone A'), _product('b', 'Phone B')])
+        patcher = mock.patch.object(AstraDB, 'get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        shared_cache._shared_cache = None
+
+    def tearDown(self):
+        shared_cache._shared_cache = None
+
+    def round_trip(self, fmt, edit=None):
+        lines = ''.join(export_lines(AstraProduct.iter_products(), fmt)).splitlines()
+        if edit:
+            lines = [edit(line) for line in lines]
+        return import_products(AstraProduct, read_rows(lines, fmt), validate_images=False)
+
+    def assert_round_trip_keeps_ids(self, fmt):
+        result = self.round_trip(fmt, edit=lambda line: line.replace('Phone A', 'Phone A2'))
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(sorted(result.created), ['a', 'b'])
+        self.assertEqual(sorted(self.collection.documents), ['a', 'b'])
+        self.assertEqual(self.collection.documents['a']['name'], 'Phone A2')
+        self.assertEqual(AstraProduct.get_by_id('a')['name'], 'Phone A2')
+
+    def test_ndjson_round_trip_keeps_ids(self):
+        self.assert_round_trip_keeps_ids('ndjson')
+
+    def test_csv_round_trip_keeps_ids(self):
+        self.assert_round_trip_keeps_ids('csv')
+
+    def test_rows_without_id_are_created(self):
+        row = {key: value for key, value in _product(None, 'Phone C').items() if key != '_id'}
+        result = import_products(AstraProduct, [row], validate_images=False)
+
+        self.assertEqual(len(result.created), 1)
+        self.assertNotIn(result.created[0], ('a', 'b'))
+        self.assertEqual(len(self.collection.documents), 3)
+
+    def test_unknown_id_is_inserted_under_it(self):
+        result = import_products(AstraProduct, [_product('c', 'Phone C')], validate_images=False)
+
+        self.assertEqual(result.created, ['c'])
+        self.assertEqual(self.collection.documents['c']['name'], 'Phone C')
+
+    def test_non_string_id_is_rejected(self):
+        result = import_products(AstraProduct, [_product(7, 'Phone C')], validate_images=False)
+
+        self.assertEqual(result.created, [])
+        self.assertEqual(result.errors, [{'row': 1, 'errors': {'_id': ['Must be a string']}}])
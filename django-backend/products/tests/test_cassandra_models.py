@@ -0,0 +1,143 @@
+"""
+Tests for the Cassandra product model against an in-memory session.
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from products import shared_cache
+from products.models import Product
+from products.tests.stubs import FakeSession, patch_cassandra
+
+
+def _phone(name, brand, price_tier, price):
+    return {
+        'name': name,
+        'brand': brand,
+        'category': 'phones',
+        'price': price,
+        'description': 'A phone',
+        'specs': {'price_tier': price_tier},
+        'images': ['https://example.com/phone.jpg'],
+        'stock_quantity': 5,
+    }
+
+
+class CassandraTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        patch_cassandra(self, self.session)
+        patcher = mock.patch.object(Product, '_validate_image_urls')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        shared_cache._shared_cache = None
+
+        self.products = [
+            Product.create(_phone('Acme One', 'Acme', 'budget', 100)),
+            Product.create(_phone('Acme Two', 'Acme', 'flagship', 900)),
+            Product.create(_phone('Zeta One', 'Zeta', 'budget', 150)),
+        ]
+        self.session.queries.clear()
+
+    def tearDown(self):
+        shared_cache._shared_cache = None
+
+    def selects(self):
+        return [query for query in self.session.queries if query.startswith('SELECT')]
+
+
+class QueryTableReadTests(CassandraTestCase):
+    """Filtered reads use the query table of their filter instead of scanning products"""
+
+    def assert_reads(self, filters, query, names):
+        self.session.queries.clear()
+        self.assertEqual(sorted(product['name'] for product in Product.iter_products(filters)), names)
+        self.assertEqual(self.selects(), [query])
+
+        self.session.queries.clear()
+        products, _ = Product.get_page(filters, page_size=10)
+        self.assertEqual(sorted(product['name'] for product in products), names)
+        self.assertEqual(self.selects(), [query])
+
+    def test_brand_filter_reads_products_by_brand(self):
+        self.assert_reads(
+            {'brand': 'Acme'}, 'SELECT * FROM products_by_brand WHERE brand = ?', ['Acme One', 'Acme Two']
+        )
+
+    def test_category_filter_reads_products_by_category(self):
+        self.assert_reads(
+            {'category': 'phones'}, 'SELECT * FROM products_by_category WHERE category = ?',
+            ['Acme One', 'Acme Two', 'Zeta One']
+        )
+
+    def test_price_tier_filter_reads_products_by_price_tier(self):
+        self.assert_reads(
+            {'price_tier': 'budget'}, 'SELECT * FROM products_by_price_tier WHERE price_tier = ?',
+            ['Acme One', 'Zeta One']
+        )
+
+    def test_combined_filters_read_one_query_table_and_filter_the_rest(self):
+        self.assert_reads(
+            {'brand': 'Acme', 'price_tier': 'budget'}, 'SELECT * FROM products_by_brand WHERE brand = ?',
+            ['Acme One']
+        )
+
+    def test_unfiltered_reads_scan_products(self):
+        self.assert_reads({}, 'SELECT * FROM products', ['Acme One', 'Acme Two', 'Zeta One'])
+
+    def test_query_tables_follow_updates(self):
+        Product.update(self.products[0]['_id'], {'brand': 'Zeta'}, validate_images=False)
+
+        self.assertEqual(sorted(product['name'] for product in Product.iter_products({'brand': 'Zeta'})),
+                         ['Acme One', 'Zeta One'])
+        self.assertEqual([product['name'] for product in Product.iter_products({'brand': 'Acme'})], ['Acme Two'])
+
+
+class StockChangeTests(CassandraTestCase):
+    """Stock changes are compare-and-set and survive concurrent writes"""
+
+    def interleave(self, write):
+        """Run write once, just before the first compare-and-set reaches the session"""
+        run = self.session._run
+
+        def run_after_write(query, values):
+            if ' IF ' in query and not self.interfered:
+                self.interfered = True
+                write()
+            return run(query, values)
+
+        self.interfered = False
+        patcher = mock.patch.object(self.session, '_run', side_effect=run_after_write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored_stock(self, product_id):
+        return Product._fetch_one(product_id)['stock_quantity']
+
+    def test_reserve_and_release(self):
+        product_id = self.products[0]['_id']
+
+        self.assertTrue(Product.reserve_stock(product_id, 3))
+        self.assertFalse(Product.reserve_stock(product_id, 3))
+        self.assertTrue(Product.release_stock(product_id, 1))
+        self.assertEqual(self.stored_stock(product_id), 3)
+
+    def test_concurrent_change_is_retried(self):
+        product_id = self.products[0]['_id']
+        self.interleave(lambda: Product.reserve_stock(product_id, 1))
+
+        self.assertTrue(Product.reserve_stock(product_id, 2))
+        self.assertEqual(self.stored_stock(product_id), 2)
+
+    def test_product_deleted_during_change_is_not_found(self):
+        product_id = self.products[0]['_id']
+        self.interleave(lambda: Product.delete(product_id))
+
+        self.assertFalse(Product.reserve_stock(product_id, 1))
+
+    def test_product_deleted_during_release_is_not_found(self):
+        product_id = self.products[0]['_id']
+        self.interleave(lambda: Product.delete(product_id))
+
+        self.assertFalse(Product.release_stock(product_id, 1))
@@ -0,0 +1,170 @@
+"""
+Tests for concurrent, cached image URL validation against a local stub server.
+"""
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from products import astra_models, shared_cache, views
+from products.astra_models import AstraDB, AstraProduct
+from products.connections import warm_up
+from products.image_validation import (
+    IMAGES_BROKEN, IMAGES_PENDING, IMAGES_VERIFIED, DeferredImageValidation, ImageValidator,
+)
+from products.tests.stub_image_server import StubImageServer
+from products.tests.stubs import FakeCollection
+
+
+class ImageValidatorTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubImageServer(latency=0.2, slow_latency=3).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def images(self, prefix, count):
+        return [self.server.url(f'/images/{prefix}-{n}.jpg') for n in range(count)]
+
+    def test_heads_run_in_parallel_within_deadline(self):
+        validator = ImageValidator(workers=8, timeout=5, deadline=2)
+        images = self.images('parallel', 6)
+
+        started = time.perf_counter()
+        validator.validate(images)
+        elapsed = time.perf_counter() - started
+
+        # Six sequential requests would take 1.2 s
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(validator.cache_misses, 6)
+
+    def test_cached_results_skip_network(self):
+        validator = ImageValidator(workers=8, timeout=5, deadline=2)
+        images = self.images('cached', 4)
+        validator.validate(images)
+        requested = len(self.server.requests)
+
+        started = time.perf_counter()
+        validator.validate(images)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(self.server.requests), requested)
+        self.assertEqual(validator.cache_hits, 4)
+        self.assertLess(elapsed, 0.05)
+
+    def test_missing_image_raises(self):
+        validator = ImageValidator(workers=8, timeout=5, deadline=2)
+        images = self.images('ok', 2) + [self.server.url('/missing/gone.jpg')]
+
+        with self.assertRaisesRegex(ValueError, r'Image 3 URL is not accessible \(status: 404\)'):
+            validator.validate(images)
+
+    def test_failures_are_cached_for_failure_ttl(self):
+        validator = ImageValidator(workers=8, timeout=5, deadline=2, failure_ttl=60)
+        url = self.server.url('/missing/cached.jpg')
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                validator.validate([url])
+        self.assertEqual(self.server.requests.count('/missing/cached.jpg'), 1)
+
+    def test_request_timeout_raises(self):
+        validator = ImageValidator(workers=8, timeout=0.3, deadline=2)
+
+        with self.assertRaisesRegex(ValueError, 'Failed to validate image 1 URL'):
+            validator.validate([self.server.url('/slow/timeout.jpg')])
+
+    def test_overall_deadline_raises(self):
+        validator = ImageValidator(workers=8, timeout=5, deadline=0.4)
+
+        started = time.perf_counter()
+        with self.assertRaisesRegex(ValueError, 'Timed out validating image 2 URL'):
+            validator.validate([self.server.url('/images/fast.jpg'), self.server.url('/slow/deadline.jpg')])
+        self.assertLess(time.perf_counter() - started, 1)
+
+    def test_pooled_session_is_reused(self):
+        validator = ImageValidator(workers=4, timeout=5, deadline=2, cache_ttl=0, failure_ttl=0)
+        connections = self.server.connections
+
+        validator.validate(self.images('pool-a', 4))
+        session, executor = validator._resources()
+        validator.validate(self.images('pool-b', 4))
+        validator.validate(self.images('pool-c', 4))
+
+        self.assertIs(validator._resources()[0], session)
+        self.assertIs(validator._resources()[1], executor)
+        # Twelve requests over at most one kept-alive connection per worker
+        self.assertLessEqual(self.server.connections - connections, 4)
+
+    def test_empty_image_list_raises(self):
+        with self.assertRaisesRegex(ValueError, 'non-empty list'):
+            ImageValidator().validate([])
+
+
+@override_settings(ASTRA_TOKEN=None, ORDER_WRITE_MODE='sync')
+class PendingValidationWarmUpTests(SimpleTestCase):
+    """Worker start queues the validations a stopped worker left pending"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubImageServer(latency=0.05).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        def product(product_id, images_status, path):
+            return {
+                '_id': product_id, 'name': product_id,
+                'images': [self.server.url(path)], 'images_status': images_status,
+            }
+
+        self.collection = FakeCollection([
+            product('good', IMAGES_PENDING, '/images/good.jpg'),
+            product('broken', IMAGES_PENDING, '/missing/broken.jpg'),
+            product('done', IMAGES_VERIFIED, '/images/done.jpg'),
+        ])
+        self.deferred = DeferredImageValidation(ImageValidator(timeout=2, deadline=2))
+        for patcher in (
+            mock.patch.object(AstraDB, 'get_collection', return_value=self.collection),
+            mock.patch.object(views, 'Product', AstraProduct),
+            mock.patch.object(astra_models, 'deferred_image_validation', self.deferred),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        shared_cache._shared_cache = None
+
+    def tearDown(self):
+        shared_cache._shared_cache = None
+
+    def wait_for_validations(self):
+        deadline = time.monotonic() + 5
+        while self.deferred.pending and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.deferred.pending, 0)
+
+    def test_warm_up_validates_pending_products(self):
+        timings = warm_up()
+        self.wait_for_validations()
+
+        self.assertIn('image_validation', timings)
+        self.assertEqual(self.collection.documents['good']['images_status'], IMAGES_VERIFIED)
+        self.assertEqual(self.collection.documents['broken']['images_status'], IMAGES_BROKEN)
+        self.assertIn('404', self.collection.documents['broken']['images_error'])
+        # The cached catalog follows the recorded outcome
+        self.assertEqual(AstraProduct.get_index().get('good')['images_status'], IMAGES_VERIFIED)
+        self.assertNotIn('/images/done.jpg', self.server.requests)
+
+    def test_warm_up_without_pending_products_queues_nothing(self):
+        for document in self.collection.documents.values():
+            document['images_status'] = IMAGES_VERIFIED
+
+        self.assertNotIn('image_validation', warm_up())
+        self.assertEqual(self.deferred.verified + self.deferred.broken, 0)
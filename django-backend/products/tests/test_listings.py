@@ -0,0 +1,97 @@
+"""
+Tests that products with broken images stay out of every product listing.
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from products import shared_cache, views
+from products.backends import ProductBackend
+from products.image_validation import IMAGES_BROKEN, IMAGES_VERIFIED
+from products.recommendations import build
+
+
+def _phone(product_id, images_status, price):
+    return {
+        '_id': product_id,
+        'name': f'Phone {product_id}',
+        'brand': 'Acme',
+        'category': 'phones',
+        'description': 'A phone',
+        'price': price,
+        'in_stock': True,
+        'specs': {'price_tier': 'mid'},
+        'images': [f'https://example.com/{product_id}.jpg'],
+        'images_status': images_status,
+    }
+
+
+class ListingBackend(ProductBackend):
+    """Backend serving a fixed catalog from memory"""
+    name = 'listing-test'
+    source = 'listing-test'
+    products = [
+        _phone('1', IMAGES_VERIFIED, 300),
+        _phone('2', IMAGES_BROKEN, 310),
+        _phone('3', IMAGES_VERIFIED, 320),
+        # Never bought, so its related products are catalog neighbours
+        _phone('9', IMAGES_VERIFIED, 305),
+    ]
+
+    @classmethod
+    def iter_products(cls, filters=None, fetch_size=None):
+        return (dict(product) for product in cls.products)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, PRODUCT_ENCODER='serializer', PRODUCT_ENCODER_OVERRIDES={})
+class HiddenListingTests(SimpleTestCase):
+    """IMAGE_VALIDATION_HIDE_BROKEN applies to every listing path"""
+
+    def setUp(self):
+        shared_cache._shared_cache = None
+        ListingBackend.refresh_cache(wait=True)
+        orders = [{'items': [{'_id': product_id, 'quantity': 1} for product_id in ('1', '2', '3')]}]
+        _, related = build(orders + [{'items': [{'_id': '2', 'quantity': 5}]}], 10)
+
+        for patcher in (
+            mock.patch.object(views, 'Product', ListingBackend),
+            mock.patch.object(views.recommendations, 'get_index', return_value=related),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def tearDown(self):
+        shared_cache._shared_cache = None
+
+    def ids(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        # Unpaginated product lists are returned bare
+        products = body['results'] if isinstance(body, dict) else body
+        return [product['_id'] for product in products]
+
+    def listings(self):
+        return {
+            'list': self.ids('/api/v1/products'),
+            'page': self.ids('/api/v1/products', page_size=10),
+            'search': self.ids('/api/v1/search', q='phone'),
+            'best_sellers': self.ids('/api/v1/products/best-sellers'),
+            'related': self.ids('/api/v1/products/1/related'),
+            'neighbours': self.ids('/api/v1/products/9/related'),
+        }
+
+    @override_settings(IMAGE_VALIDATION_HIDE_BROKEN=True)
+    def test_broken_images_are_hidden(self):
+        for listing, ids in self.listings().items():
+            with self.subTest(listing=listing):
+                self.assertNotIn('2', ids)
+                self.assertTrue(ids)
+
+    @override_settings(IMAGE_VALIDATION_HIDE_BROKEN=False)
+    def test_broken_images_are_listed_unless_hidden(self):
+        for listing, ids in self.listings().items():
+            with self.subTest(listing=listing):
+                self.assertIn('2', ids)
@@ -0,0 +1,240 @@
+"""
+Tests for the product cache and the response cache keyed by its version.
+"""
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+from django.http import HttpResponse
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from products import shared_cache
+from products.product_cache import ProductCache
+from products.response_cache import cache_response, response_cache
+from products.shared_cache import (
+    FileSnapshotCache, append_product, get_shared_cache, remove_product, replace_product
+)
+
+
+class ResponseCacheInvalidationTests(SimpleTestCase):
+    """Cached responses follow catalog changes made by other workers"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            PRODUCT_CACHE_BACKEND='file',
+            PRODUCT_CACHE_DIR=self.directory,
+            PRODUCT_CACHE_TTL=3600,
+            PRODUCT_CACHE_MAX_STALENESS=0,
+            RESPONSE_CACHE_ENABLED=True,
+        )
+        self.settings_override.enable()
+        shared_cache._shared_cache = None
+        response_cache.clear()
+
+        self.database = [{'_id': '1', 'name': 'Old name'}]
+        self.cache = ProductCache('test', fetch=lambda: [dict(product) for product in self.database])
+
+        @cache_response('test_products', self.cache.current_version)
+        def view(request):
+            names = [product['name'] for product in self.cache.get_products()]
+            return HttpResponse(json.dumps(names), content_type='application/json')
+
+        self.view = view
+        self.factory = RequestFactory()
+        # Load the catalog and cache its response
+        self.assertEqual(self.names(), ['Old name'])
+        self.assertEqual(self.names(), ['Old name'])
+
+    def tearDown(self):
+        response_cache.clear()
+        shared_cache._shared_cache = None
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def names(self):
+        return json.loads(self.view(self.factory.get('/products')).content)
+
+    def test_cached_response_is_reused_while_catalog_unchanged(self):
+        self.database[0]['name'] = 'New name'
+        # Nothing told the cache the database changed
+        self.assertEqual(self.names(), ['Old name'])
+
+    def test_invalidation_by_another_worker_misses_response_cache(self):
+        self.database[0]['name'] = 'New name'
+
+        # Another worker on the host shares the files, not this process's objects
+        FileSnapshotCache(self.directory).invalidate()
+
+        self.assertEqual(self.names(), ['New name'])
+
+    def test_expired_ttl_misses_response_cache(self):
+        with override_settings(PRODUCT_CACHE_TTL=1):
+            self.database[0]['name'] = 'New name'
+            time.sleep(1.1)
+            self.assertEqual(self.names(), ['New name'])
+
+
+def _product(product_id, brand='Acme', price=100):
+    return {'_id': product_id, 'name': f'Phone {product_id}', 'brand': brand, 'price': price, 'in_stock': True}
+
+
+def _catalog():
+    """A worker's cache over a catalog of 50 products"""
+    return ProductCache('test', fetch=lambda: [_product(str(n), price=100 + n) for n in range(50)])
+
+
+@override_settings(PRODUCT_CACHE_BACKEND='local', PRODUCT_CACHE_TTL=3600, PRODUCT_CACHE_MAX_STALENESS=0)
+class CacheWriteTests(SimpleTestCase):
+    """Writes never change a catalog or index that readers already hold"""
+
+    def setUp(self):
+        shared_cache._shared_cache = None
+        self.addCleanup(setattr, shared_cache, '_shared_cache', None)
+        self.cache = _catalog()
+        self.index = self.cache.get_index()
+        self.products = self.cache.get_products()
+
+    def append(self, product):
+        self.cache.apply_write(lambda products: append_product(products, product))
+
+    def replace(self, product_id, patch):
+        self.cache.apply_write(
+            lambda products: replace_product(products, product_id, lambda product: {**product, **patch})
+        )
+
+    def remove(self, product_id):
+        self.cache.apply_write(lambda products: remove_product(products, product_id))
+
+    def test_writes_leave_held_catalog_and_index_unchanged(self):
+        self.append(_product('new', brand='Zeta'))
+        self.replace('1', {'brand': 'Zeta', 'price': 999})
+        self.remove('2')
+
+        self.assertEqual(len(self.products), 50)
+        self.assertEqual(len(self.index), 50)
+        self.assertEqual(self.index.filter({'brand': 'Zeta'}), [])
+        self.assertEqual(self.index.get('1')['price'], 101)
+        self.assertEqual(self.index.search('zeta'), [])
+
+        index = self.cache.get_index()
+        self.assertIsNot(index, self.index)
+        self.assertEqual([product['_id'] for product in index.filter({'brand': 'Zeta'})], ['1', 'new'])
+        self.assertIsNone(index.get('2'))
+        self.assertEqual(index.summary.count('brand', 'Acme'), 48)
+        self.assertEqual(self.index.summary.count('brand', 'Acme'), 50)
+        self.assertEqual(len(self.cache.get_products()), 50)
+
+    def test_readers_survive_concurrent_writes(self):
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    index = self.cache.get_index()
+                    index.filter({'brand': 'Acme'}, sort='-price')
+                    index.filter(min_price=120, exclude={'brand': 'Zeta'})
+                    index.search('phone')
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        try:
+            for n in range(200):
+                self.append(_product(f'new-{n}', brand='Zeta'))
+                self.replace(str(n % 50), {'brand': 'Zeta' if n % 2 else 'Acme', 'price': n})
+                self.remove(f'new-{n}')
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.cache.get_index()), 50)
+
+
+class ChangeLogTests(SimpleTestCase):
+    """Workers share writes as per-product changes instead of storing the whole catalog"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.settings_override = override_settings(
+            PRODUCT_CACHE_BACKEND='file',
+            PRODUCT_CACHE_DIR=self.directory,
+            PRODUCT_CACHE_TTL=3600,
+            PRODUCT_CACHE_MAX_STALENESS=0,
+            PRODUCT_CACHE_MAX_CHANGES=5,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        shared_cache._shared_cache = None
+        self.addCleanup(setattr, shared_cache, '_shared_cache', None)
+
+        # Two workers on one host, each with its own copy of the catalog
+        self.first = _catalog()
+        self.second = _catalog()
+        self.first.get_index()
+        self.second.get_index()
+
+    def rename(self, cache, product_id, name):
+        cache.apply_write(
+            lambda products: replace_product(products, product_id, lambda product: {**product, 'name': name})
+        )
+
+    def names(self, cache):
+        return {product['_id']: product['name'] for product in cache.get_index().all()}
+
+    def test_workers_apply_changes_without_reading_the_snapshot(self):
+        self.rename(self.first, '1', 'Renamed')
+        # The second writer is a generation behind and catches up with the first write
+        self.second.apply_write(lambda products: append_product(products, _product('new')))
+        self.second.apply_write(lambda products: remove_product(products, '2'))
+
+        with mock.patch.object(FileSnapshotCache, '_read_stored', side_effect=AssertionError('full read')):
+            for cache in (self.first, self.second):
+                names = self.names(cache)
+                self.assertEqual((names['1'], names['new']), ('Renamed', 'Phone new'))
+                self.assertNotIn('2', names)
+                self.assertEqual(cache.get_index().all(), cache.get_products())
+        self.assertEqual(self.first.metrics.catch_ups, 1)
+        self.assertEqual(self.first.metrics.loads, 1)
+
+    def test_snapshot_is_stored_in_full_after_max_changes(self):
+        shared = get_shared_cache()
+        stored = shared._stored_generation()
+        for n in range(4):
+            self.rename(self.first, '1', f'Name {n}')
+        self.assertEqual(shared._stored_generation(), stored)
+        self.assertEqual(len(shared.changes_since(stored)), 4)
+
+        self.rename(self.first, '1', 'Name 4')
+        self.assertEqual(shared._stored_generation(), shared.generation())
+        self.assertEqual(shared._changes(0), [])
+
+        # A worker from before the log was emptied reads the stored snapshot
+        self.assertEqual(self.names(self.second)['1'], 'Name 4')
+        self.assertEqual(self.second.metrics.catch_ups, 0)
+        self.assertEqual(shared.read(shared.generation()).products, self.first.get_products())
+
+    def test_new_worker_reads_stored_snapshot_and_log(self):
+        self.rename(self.first, '1', 'Renamed')
+        self.first.apply_write(lambda products: remove_product(products, '3'))
+
+        worker = ProductCache('test', fetch=mock.Mock(side_effect=AssertionError('database read')))
+        self.assertEqual(self.names(worker), self.names(self.first))
+
+    def test_invalidation_breaks_the_log(self):
+        self.rename(self.first, '1', 'Renamed')
+        get_shared_cache().invalidate()
+
+        self.assertEqual(self.names(self.second)['1'], 'Phone 1')
+        self.assertEqual(self.second.metrics.loads, 2)
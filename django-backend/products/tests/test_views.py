@@ -0,0 +1,83 @@
+"""
+Tests for request validation and error responses of the product and order views.
+"""
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from products import shared_cache, views
+from products.astra_models import AstraDB, AstraProduct
+from products.tests.stubs import FakeCollection
+
+INVALID_LIMITS = ('0', '-3', 'x')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class LimitParameterTests(SimpleTestCase):
+    """Every view taking a limit rejects one that is not a positive integer"""
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def assert_limits_rejected(self, path, **params):
+        for limit in INVALID_LIMITS:
+            with self.subTest(limit=limit):
+                response = self.client.get(path, {**params, 'limit': limit})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Invalid limit')
+
+    def test_search_limit(self):
+        self.assert_limits_rejected('/api/v1/search', q='phone')
+
+    def test_related_products_limit(self):
+        self.assert_limits_rejected('/api/v1/products/1/related')
+
+    def test_best_sellers_limit(self):
+        self.assert_limits_rejected('/api/v1/products/best-sellers')
+
+    def test_analytics_limit(self):
+        rollups = [{'_id': str(n), 'units': 10 - n} for n in range(5)]
+        with mock.patch.object(views.order_rollups, 'get', return_value=rollups):
+            self.assert_limits_rejected('/api/v1/analytics/products')
+
+            response = self.client.get('/api/v1/analytics/products', {'limit': '2'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], rollups[:2])
+
+
+class CreateOrderTests(SimpleTestCase):
+    """An order that cannot be priced answers why"""
+
+    def setUp(self):
+        self.collection = FakeCollection([{
+            '_id': 'p1', 'name': 'Phone', 'brand': 'Acme', 'category': 'phones', 'price': 300,
+            'in_stock': True, 'stock_quantity': 5, 'specs': {}, 'images': [],
+        }])
+        for patcher in (
+            mock.patch.object(AstraDB, 'get_collection', return_value=self.collection),
+            mock.patch.object(views, 'Product', AstraProduct),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        shared_cache._shared_cache = None
+        self.addCleanup(setattr, shared_cache, '_shared_cache', None)
+        AstraProduct.refresh_cache(wait=True)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def order(self, *items):
+        return self.client.post('/api/v1/orders', {'items': list(items)}, format='json')
+
+    def test_changed_price_is_a_conflict_with_the_current_price(self):
+        response = self.order({'_id': 'p1', 'quantity': 1, 'price': 250})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['items'][0]['current_price'], 300)
+
+    def test_failed_lookup_is_unavailable_not_unknown(self):
+        with mock.patch.object(self.collection, 'find', side_effect=Exception('timed out')):
+            response = self.order({'_id': 'p1', 'quantity': 1}, {'_id': str(uuid.uuid4()), 'quantity': 1})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'Catalog unavailable')
@@ -6,9 +6,16 @@ from . import views
 
 urlpatterns = [
     path('health', views.health_check, name='health-check'),
+    path('metrics', views.cache_metrics, name='cache-metrics'),
     path('products', views.product_list, name='product-list'),
+    path('products/bulk', views.product_bulk, name='product-bulk'),
+    path('products/best-sellers', views.best_sellers, name='best-sellers'),
     path('products/<str:product_id>', views.product_detail, name='product-detail'),
+    path('products/<str:product_id>/images-status', views.product_images_status, name='product-images-status'),
+    path('products/<str:product_id>/related', views.related_products, name='related-products'),
     path('filter-options', views.filter_options, name='filter-options'),
+    path('search', views.search_products, name='search-products'),
     path('orders', views.create_order, name='create-order'),
     path('orders/user', views.get_user_orders, name='get-user-orders'),
+    path('analytics/<str:dimension>', views.order_analytics, name='order-analytics'),
 ]
@@ -1,41 +1,98 @@
 """
 API views for product management.
 """
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.decorators import api_view
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import ProductSerializer, CreateProductSerializer
+from .analytics import DIMENSIONS as ANALYTICS_DIMENSIONS, analytics_enabled, order_rollups
+from .backends import load_backend
+from .bulk import FORMATS as BULK_FORMATS, export_lines, import_products, read_rows
+from .catalog_index import SPEC_FACETS, SORT_OPTIONS
+from .encoders import encode, product_encoder
+from .image_validation import IMAGES_BROKEN, IMAGES_PENDING, IMAGES_VERIFIED, deferred_image_validation
+from .order_journal import get_order_journal, order_journal_enabled
+from .pricing import OrderPricingError, price_order
+from .recommendations import catalog_neighbours, recommendations
+from .stock import OutOfStockError, release_stock, reserve_stock
+from .response_cache import cache_response
 import logging
-import os
 
-# Choose the right model based on configuration
-if os.getenv('USE_MOCK_DB', 'false').lower() == 'true':
-    from .mock_models import MockProduct as Product
-    DB_TYPE = "mock"
-elif os.getenv('ASTRA_TOKEN') and os.getenv('ASTRA_API_ENDPOINT'):
+# The product backend named by PRODUCT_BACKEND
+Product = load_backend()
+DB_TYPE = Product.name
+
+logger = logging.getLogger(__name__)
+
+
+class ProductPagination(LimitOffsetPagination):
+    """Opt-in limit/offset pagination for product listings"""
+    max_limit = 100
+
+
+def _product_page(request, filters, fields):
+    """
+    Serve one page of a token-paged listing (page_size/page_token).
+    On Cassandra the page comes straight from a paged table scan, so the
+    catalog is never loaded as a whole.
+    """
+    if request.GET.get('sort') or request.GET.get('min_price') or request.GET.get('max_price'):
+        return Response(
+            {'error': 'Invalid query', 'message': 'sort and price filters cannot be combined with page tokens'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     try:
-        from .astra_models import AstraProduct as Product
-        DB_TYPE = "astra"
-    except ImportError:
-        from .mock_models import MockProduct as Product
-        DB_TYPE = "mock (astra unavailable)"
-else:
+        page_size = int(request.GET.get('page_size') or settings.PRODUCT_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'Invalid page_size', 'message': 'page_size must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    page_size = min(page_size, ProductPagination.max_limit)
+    
     try:
-        from .models import Product
-        DB_TYPE = "cassandra"
-    except Exception:
-        from .mock_models import MockProduct as Product
-        DB_TYPE = "mock (fallback)"
+        products, next_token = Product.get_page(
+            filters, page_size, request.GET.get('page_token') or None, exclude=_hidden_products()
+        )
+    except ValueError as e:
+        return Response(
+            {'error': 'Invalid page_token', 'message': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    logger.info(f"Retrieved page of {len(products)} products")
+    if _use_fast_encoder('product_list'):
+        envelope = encode({'next_page_token': next_token})
+        results = product_encoder.encode_products(products, fields=fields)
+        return _json_response(envelope[:-1] + b',"results":' + results + b'}')
+    serializer = ProductSerializer(products, many=True, fields=fields)
+    return Response({'next_page_token': next_token, 'results': serializer.data})
 
-logger = logging.getLogger(__name__)
 
-logger = logging.getLogger(__name__)
+def _use_fast_encoder(view_name):
+    """Whether a view should encode products directly instead of through ProductSerializer"""
+    encoder = settings.PRODUCT_ENCODER_OVERRIDES.get(view_name, settings.PRODUCT_ENCODER)
+    return encoder == 'fast'
+
+
+def _json_response(body, status_code=status.HTTP_200_OK):
+    """Wrap already-encoded JSON bytes in a response"""
+    return HttpResponse(body, content_type='application/json', status=status_code)
 
 
 @api_view(['GET', 'POST'])
+@cache_response('product_list', lambda: Product.get_version())
 def product_list(request):
     """
-    GET: List all products with optional filtering
+    GET: List all products with optional filtering, sorting, pagination
+         (limit/offset) and field selection (fields=name,price,...)
     POST: Create a new product
     """
     if request.method == 'GET':
@@ -48,67 +105,64 @@ def product_list(request):
         if request.GET.get('in_stock'):
             filters['in_stock'] = request.GET.get('in_stock').lower() == 'true'
         
+        # Comprehensive category filters stored in specs
+        for facet in SPEC_FACETS:
+            if request.GET.get(facet):
+                filters[facet] = request.GET.get(facet)
+        
         logger.info(f"Fetching products with filters: {filters}")
         
+        sort = request.GET.get('sort') or None
+        if sort is not None and sort not in SORT_OPTIONS:
+            return Response(
+                {'error': 'Invalid sort', 'message': f"sort must be one of: {', '.join(SORT_OPTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fields = None
+        if request.GET.get('fields'):
+            fields = [field.strip() for field in request.GET.get('fields').split(',') if field.strip()]
+        
+        if 'page_token' in request.GET or 'page_size' in request.GET:
+            try:
+                return _product_page(request, filters, fields)
+            except Exception as e:
+                logger.error(f"Error fetching product page: {str(e)}")
+                return Response(
+                    {'error': 'Failed to fetch products', 'message': str(e)},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+        
         try:
-            products = Product.get_all(filters)
-            
-            # Apply additional filtering based on specs (comprehensive categories)
-            filtered_products = products
-            
-            # Filter by price tier
-            if request.GET.get('price_tier'):
-                price_tier = request.GET.get('price_tier')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('price_tier') == price_tier]
+            min_price = int(request.GET.get('min_price')) if request.GET.get('min_price') else None
+            max_price = int(request.GET.get('max_price')) if request.GET.get('max_price') else None
             
-            # Filter by use case
-            if request.GET.get('use_case'):
-                use_case = request.GET.get('use_case')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('use_case') == use_case]
+            # Intersect the posting sets of the catalog index instead of scanning the catalog,
+            # and order the result from the index's presorted arrays
+            index = Product.get_index()
+            filtered_products = index.filter(filters, min_price, max_price, sort=sort, exclude=_hidden_products())
+            fast = _use_fast_encoder('product_list')
             
-            # Filter by form factor
-            if request.GET.get('form_factor'):
-                form_factor = request.GET.get('form_factor')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('form_factor') == form_factor]
+            # Only serialize the requested page; without a limit the full list is returned
+            paginator = ProductPagination()
+            page = paginator.paginate_queryset(filtered_products, request)
+            if page is not None:
+                logger.info(f"Retrieved page of {len(page)}/{len(filtered_products)} products after filtering")
+                if fast:
+                    envelope = encode({
+                        'count': paginator.count,
+                        'next': paginator.get_next_link(),
+                        'previous': paginator.get_previous_link(),
+                    })
+                    results = product_encoder.encode_products(page, index, fields)
+                    return _json_response(envelope[:-1] + b',"results":' + results + b'}')
+                serializer = ProductSerializer(page, many=True, fields=fields)
+                return paginator.get_paginated_response(serializer.data)
             
-            # Filter by software experience
-            if request.GET.get('software_experience'):
-                software_experience = request.GET.get('software_experience')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('software_experience') == software_experience]
-            
-            # Filter by chipset category
-            if request.GET.get('chipset_category'):
-                chipset_category = request.GET.get('chipset_category')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('chipset_category') == chipset_category]
-            
-            # Filter by market origin
-            if request.GET.get('market_origin'):
-                market_origin = request.GET.get('market_origin')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('market_origin') == market_origin]
-            
-            # Filter by target demographic
-            if request.GET.get('target_demographic'):
-                target_demographic = request.GET.get('target_demographic')
-                filtered_products = [p for p in filtered_products 
-                                   if p.get('specs', {}).get('target_demographic') == target_demographic]
-            
-            # Filter by price range
-            if request.GET.get('min_price'):
-                min_price = int(request.GET.get('min_price'))
-                filtered_products = [p for p in filtered_products if p.get('price', 0) >= min_price]
-            
-            if request.GET.get('max_price'):
-                max_price = int(request.GET.get('max_price'))
-                filtered_products = [p for p in filtered_products if p.get('price', 0) <= max_price]
-            
-            serializer = ProductSerializer(filtered_products, many=True)
             logger.info(f"Retrieved {len(filtered_products)} products after filtering")
+            if fast:
+                return _json_response(product_encoder.encode_products(filtered_products, index, fields))
+            serializer = ProductSerializer(filtered_products, many=True, fields=fields)
             return Response(serializer.data)
         except Exception as e:
             logger.error(f"Error fetching products: {str(e)}")
@@ -126,6 +180,21 @@ def product_list(request):
                 product = Product.create(serializer.validated_data)
                 response_serializer = ProductSerializer(product)
                 logger.info(f"Product created successfully: {product['_id']}")
+                
+                if product.get('images_status') == IMAGES_PENDING:
+                    # Saved before its images were checked; the client polls the status URL
+                    status_url = request.build_absolute_uri(
+                        reverse('product-images-status', args=[product['_id']])
+                    )
+                    return Response(
+                        {
+                            'message': 'Product created, image validation pending',
+                            'product': response_serializer.data,
+                            'status_url': status_url
+                        },
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': status_url}
+                    )
                 return Response(
                     {
                         'message': 'Product created successfully',
@@ -149,7 +218,68 @@ def product_list(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET', 'POST'])
+def product_bulk(request):
+    """
+    GET: Export the catalog as NDJSON (default) or CSV (type=csv), streamed row by row
+    POST: Import products from a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) body.
+          Rows are validated and written in chunks; errors are reported per row.
+          A row with an _id replaces the product stored under it.
+    """
+    if request.method == 'GET':
+        # 'format' is taken by DRF's format suffix negotiation
+        fmt = request.GET.get('type', 'ndjson')
+        if fmt not in BULK_FORMATS:
+            return Response(
+                {'error': 'Invalid type', 'message': f"type must be one of: {', '.join(BULK_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Products are streamed from the database as the response is written
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_lines(Product.iter_products(), fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+        return response
+    
+    content_type = request.content_type or ''
+    try:
+        if content_type.startswith('text/csv'):
+            rows = read_rows(request.body.decode('utf-8').splitlines(), 'csv')
+        elif content_type.startswith(('application/x-ndjson', 'application/jsonl')):
+            rows = read_rows(request.body.decode('utf-8').splitlines(), 'ndjson')
+        else:
+            rows = request.data
+            if not isinstance(rows, list):
+                return Response(
+                    {'error': 'Invalid payload', 'message': 'Expected a JSON array of products'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        validate_images = request.GET.get('validate_images', 'true').lower() != 'false'
+        result = import_products(Product, rows, validate_images=validate_images)
+    except UnicodeDecodeError as e:
+        return Response(
+            {'error': 'Invalid payload', 'message': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Error importing products: {str(e)}")
+        return Response(
+            {'error': 'Failed to import products', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    if not result.errors:
+        response_status = status.HTTP_201_CREATED
+    elif result.created:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response(result.as_dict(), status=response_status)
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
+@cache_response('product_detail', lambda: Product.get_version())
 def product_detail(request, product_id):
     """
     GET: Retrieve a single product
@@ -160,6 +290,8 @@ def product_detail(request, product_id):
         try:
             product = Product.get_by_id(product_id)
             if product:
+                if _use_fast_encoder('product_detail'):
+                    return _json_response(product_encoder.encode_product(product))
                 serializer = ProductSerializer(product)
                 return Response(serializer.data)
             else:
@@ -180,10 +312,7 @@ def product_detail(request, product_id):
         if serializer.is_valid():
             try:
                 # Disable image validation for updates (allow any URL)
-                if DB_TYPE == "astra":
-                    success = Product.update(product_id, serializer.validated_data, validate_images=False)
-                else:
-                    success = Product.update(product_id, serializer.validated_data)
+                success = Product.update(product_id, serializer.validated_data, validate_images=False)
                 
                 if success:
                     product = Product.get_by_id(product_id)
@@ -235,116 +364,223 @@ def product_detail(request, product_id):
 
 
 @api_view(['GET'])
+@cache_response('filter_options', lambda: Product.get_version())
 def filter_options(request):
     """Get all available filter options for the comprehensive categorization system"""
     try:
-        products = Product.get_all()
-        
-        filter_options = {
-            'brands': set(),
-            'price_tiers': set(),
-            'use_cases': set(),
-            'form_factors': set(),
-            'software_experiences': set(),
-            'chipset_categories': set(),
-            'market_origins': set(),
-            'target_demographics': set(),
-            'price_range': {'min': float('inf'), 'max': 0}
-        }
+        # The facet summary is maintained alongside the catalog index and
+        # keeps its encoded response until the catalog changes
+        summary = Product.get_index().summary
+        return HttpResponse(summary.as_json(), content_type='application/json')
+    
+    except Exception as e:
+        logger.error(f"Error getting filter options: {str(e)}")
+        return Response(
+            {'error': 'Failed to get filter options', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@cache_response('search_products', lambda: Product.get_version())
+def search_products(request):
+    """
+    Full-text product search over name, brand, specs and description.
+    Query parameters: q (required), limit (default 20, max 100), fields
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': 'Query parameter q is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    limit = _limit_param(request, 20)
+    if limit is None:
+        return Response(
+            {'error': 'Invalid limit', 'message': 'limit must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    fields = None
+    if request.GET.get('fields'):
+        fields = [field.strip() for field in request.GET.get('fields').split(',') if field.strip()]
+    
+    try:
+        index = Product.get_index()
+        results = index.search(query, limit=limit, exclude=_hidden_products())
+        logger.info(f"Search '{query}' matched {len(results)} products")
+        if _use_fast_encoder('search_products'):
+            envelope = encode({'query': query, 'count': len(results)})
+            body = product_encoder.encode_products(results, index, fields)
+            return _json_response(envelope[:-1] + b',"results":' + body + b'}')
+        serializer = ProductSerializer(results, many=True, fields=fields)
+        return Response({
+            'query': query,
+            'count': len(results),
+            'results': serializer.data
+        })
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        return Response(
+            {'error': 'Failed to search products', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def product_images_status(request, product_id):
+    """Report whether a product's images have been validated"""
+    product = Product.get_by_id(product_id)
+    if not product:
+        return Response(
+            {'error': 'Product not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    # Products saved with synchronous validation never carry a status
+    return Response({
+        '_id': product['_id'],
+        'images_status': product.get('images_status', IMAGES_VERIFIED),
+        'images_error': product.get('images_error'),
+    })
+
+
+def _hidden_products():
+    """Facet values whose products every listing leaves out, or None"""
+    if settings.IMAGE_VALIDATION_HIDE_BROKEN:
+        return {'images_status': IMAGES_BROKEN}
+    return None
+
+
+def _limit_param(request, default):
+    """Parse the limit query parameter; returns None if it is not a positive integer"""
+    try:
+        limit = int(request.GET.get('limit') or default)
+    except ValueError:
+        return None
+    return min(limit, ProductPagination.max_limit) if limit > 0 else None
+
+
+def _products_response(view_name, envelope, products, index):
+    """Respond with the envelope fields, a count and the products as results"""
+    envelope = {**envelope, 'count': len(products)}
+    if _use_fast_encoder(view_name):
+        body = product_encoder.encode_products(products, index)
+        return _json_response(encode(envelope)[:-1] + b',"results":' + body + b'}')
+    return Response({**envelope, 'results': ProductSerializer(products, many=True).data})
+
+
+@api_view(['GET'])
+def related_products(request, product_id):
+    """
+    Products frequently bought together with a product, from the precomputed
+    recommendation index. Products nobody has bought together yet are padded
+    with catalog neighbours of the same brand and price tier.
+    Query parameters: limit (default 10, at most 100)
+    """
+    limit = _limit_param(request, 10)
+    if limit is None:
+        return Response(
+            {'error': 'Invalid limit', 'message': 'limit must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        index = Product.get_index()
+        product = index.get(product_id) or Product.get_by_id(product_id)
+        if not product:
+            return Response(
+                {'error': 'Product not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        for product in products:
-            # Basic filters
-            filter_options['brands'].add(product.get('brand'))
-            
-            # Price range
-            price = product.get('price', 0)
-            if price > 0:
-                filter_options['price_range']['min'] = min(filter_options['price_range']['min'], price)
-                filter_options['price_range']['max'] = max(filter_options['price_range']['max'], price)
-            
-            # Comprehensive category filters from specs
-            specs = product.get('specs', {})
-            if specs.get('price_tier'):
-                filter_options['price_tiers'].add(specs['price_tier'])
-            if specs.get('use_case'):
-                filter_options['use_cases'].add(specs['use_case'])
-            if specs.get('form_factor'):
-                filter_options['form_factors'].add(specs['form_factor'])
-            if specs.get('software_experience'):
-                filter_options['software_experiences'].add(specs['software_experience'])
-            if specs.get('chipset_category'):
-                filter_options['chipset_categories'].add(specs['chipset_category'])
-            if specs.get('market_origin'):
-                filter_options['market_origins'].add(specs['market_origin'])
-            if specs.get('target_demographic'):
-                filter_options['target_demographics'].add(specs['target_demographic'])
+        try:
+            partners = recommendations.get_index().related(product_id)
+        except Exception as e:
+            logger.error(f"Recommendations unavailable, using catalog neighbours: {str(e)}")
+            partners = []
         
-        # Convert sets to sorted lists
-        response_data = {
-            'brands': sorted(list(filter_options['brands'])),
-            'price_tiers': sorted(list(filter_options['price_tiers'])),
-            'use_cases': sorted(list(filter_options['use_cases'])),
-            'form_factors': sorted(list(filter_options['form_factors'])),
-            'software_experiences': sorted(list(filter_options['software_experiences'])),
-            'chipset_categories': sorted(list(filter_options['chipset_categories'])),
-            'market_origins': sorted(list(filter_options['market_origins'])),
-            'target_demographics': sorted(list(filter_options['target_demographics'])),
-            'price_range': {
-                'min': int(filter_options['price_range']['min']) if filter_options['price_range']['min'] != float('inf') else 0,
-                'max': int(filter_options['price_range']['max'])
-            }
-        }
+        # Partners that left the catalog, sold out or are hidden are skipped
+        hidden = _hidden_products()
+        hidden_ids = index.excluded_ids(hidden)
+        catalog = index.get_many(partner_id for partner_id, _ in partners)
+        results = [
+            catalog[partner_id] for partner_id, _ in partners
+            if partner_id in catalog and partner_id not in hidden_ids
+            and catalog[partner_id].get('in_stock') is not False
+        ][:limit]
+        bought_together = len(results)
+        if len(results) < limit:
+            results += catalog_neighbours(
+                index, product, limit - len(results), exclude=[result['_id'] for result in results], hidden=hidden
+            )
         
-        return Response(response_data)
+        return _products_response(
+            'related_products', {'product_id': product_id, 'bought_together': bought_together}, results, index
+        )
+    except Exception as e:
+        logger.error(f"Error fetching products related to {product_id}: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch related products', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def best_sellers(request):
+    """
+    Products with the most units sold, from the precomputed recommendation index.
+    Query parameters: limit (default 10, at most 100)
+    """
+    limit = _limit_param(request, 10)
+    if limit is None:
+        return Response(
+            {'error': 'Invalid limit', 'message': 'limit must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
+    try:
+        index = Product.get_index()
+        ranked = recommendations.get_index().best_sellers()
+        hidden_ids = index.excluded_ids(_hidden_products())
+        results = []
+        for product_id, _, _ in ranked:
+            product = index.get(product_id)
+            if product is not None and product_id not in hidden_ids and product.get('in_stock') is not False:
+                results.append(product)
+                if len(results) == limit:
+                    break
+        return _products_response('best_sellers', {}, results, index)
     except Exception as e:
-        logger.error(f"Error getting filter options: {str(e)}")
+        logger.error(f"Error fetching best sellers: {str(e)}")
         return Response(
-            {'error': 'Failed to get filter options', 'message': str(e)},
+            {'error': 'Failed to fetch best sellers', 'message': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@api_view(['GET'])
+def cache_metrics(request):
+    """Product cache metrics: generation, staleness, refresh timings and failures"""
+    metrics = {
+        'database': DB_TYPE,
+        'product_cache': Product.cache_stats(),
+        'image_validation': deferred_image_validation.stats(),
+    }
+    if order_journal_enabled():
+        metrics['order_journal'] = get_order_journal().stats()
+    if analytics_enabled():
+        metrics['order_analytics'] = order_rollups.stats()
+    metrics['recommendations'] = recommendations.stats()
+    return Response(metrics)
+
+
 @api_view(['GET'])
 def health_check(request):
     """Health check endpoint"""
     try:
-        # Check database type and connection
-        if DB_TYPE == "mock":
-            return Response({
-                'status': 'healthy',
-                'database': 'mock (in-memory)',
-                'message': 'Django backend is running with mock database'
-            })
-        elif DB_TYPE == "astra":
-            # Test Astra connection
-            from .astra_models import AstraDB
-            database = AstraDB.get_database()
-            collections = database.list_collection_names()
-            
-            return Response({
-                'status': 'healthy',
-                'database': 'astra (connected)',
-                'message': 'Django backend is running with Astra database',
-                'collections': collections
-            })
-        elif DB_TYPE == "cassandra":
-            # Test Cassandra connection
-            from .models import CassandraDB
-            session = CassandraDB.get_session()
-            session.execute("SELECT now() FROM system.local")
-            
-            return Response({
-                'status': 'healthy',
-                'database': 'cassandra (connected)',
-                'message': 'Django backend is running with Cassandra'
-            })
-        else:
-            return Response({
-                'status': 'healthy',
-                'database': f'{DB_TYPE}',
-                'message': f'Django backend is running with {DB_TYPE} database'
-            })
+        return Response({'status': 'healthy', **Product.check_health()})
     except Exception as e:
         # Fallback response
         return Response({
@@ -358,7 +594,11 @@ def health_check(request):
 @api_view(['POST'])
 def create_order(request):
     """
-    Create a new order and save it to the database
+    Create a new order and save it to the database.
+    Items are priced from the catalog and their stock is reserved before the
+    order is written; an order showing a price that has since changed, or
+    asking for more than is in stock, is rejected with 409, and one that
+    cannot be priced because the catalog is unreachable with 503.
     """
     try:
         from .order_models import AstraOrder
@@ -373,8 +613,31 @@ def create_order(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Calculate total
-        total = sum(item.get('price', 0) * item.get('quantity', 0) for item in items)
+        # Price every line from the catalog in one lookup
+        try:
+            priced = price_order(Product, items)
+        except OrderPricingError as e:
+            return Response(
+                {'error': str(e), 'items': e.errors},
+                status=status.HTTP_409_CONFLICT if e.conflict else status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error pricing order: {str(e)}")
+            return Response(
+                {'error': 'Catalog unavailable', 'message': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        items = priced.items
+        total = priced.total
+        
+        # Take the stock before writing the order; all lines or none
+        try:
+            reservations = reserve_stock(Product, items)
+        except OutOfStockError as e:
+            return Response(
+                {'error': str(e), 'items': e.errors},
+                status=status.HTTP_409_CONFLICT
+            )
         
         # Create order in database
         order_data = {
@@ -384,7 +647,11 @@ def create_order(request):
             'total': total
         }
         
-        order = AstraOrder.create(order_data)
+        try:
+            order = AstraOrder.create(order_data)
+        except Exception:
+            release_stock(Product, reservations)
+            raise
         
         logger.info(f"Order created: {order['_id']}, Total: KES {total/100:.2f}")
         
@@ -409,7 +676,9 @@ def create_order(request):
 @api_view(['GET'])
 def get_user_orders(request):
     """
-    Get all orders for the authenticated user
+    Get one page of the authenticated user's orders, newest first.
+    Query parameters: email, page_size (default ORDER_PAGE_SIZE, at most 100)
+    and page_token (next_page_token of the previous page).
     """
     try:
         from .order_models import AstraOrder
@@ -423,18 +692,66 @@ def get_user_orders(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get orders for this user
-        orders = AstraOrder.get_by_user_email(user_email)
-        
-        # Sort by created_at descending (newest first)
-        orders.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        try:
+            page_size = int(request.GET.get('page_size') or settings.ORDER_PAGE_SIZE)
+            if page_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'Invalid page_size', 'message': 'page_size must be a positive integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = min(page_size, ProductPagination.max_limit)
         
-        logger.info(f"Retrieved {len(orders)} orders for {user_email}")
+        # The database sorts and pages the user's orders
+        try:
+            orders, next_token = AstraOrder.get_page_by_user_email(
+                user_email, page_size, request.GET.get('page_token') or None
+            )
+        except ValueError as e:
+            return Response(
+                {'error': 'Invalid page_token', 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(orders)
+        return Response({'next_page_token': next_token, 'results': orders})
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
         return Response(
             {'error': 'Failed to fetch orders', 'message': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+def order_analytics(request, dimension):
+    """
+    Order rollups: best-selling products, revenue per brand, sales per day or
+    orders per status. Served from a cached snapshot of the rollup counters.
+    Query parameters: limit (default 20, at most 100); for daily, the most recent days.
+    """
+    if dimension not in ANALYTICS_DIMENSIONS:
+        return Response(
+            {'error': 'Unknown analytics dimension', 'dimensions': list(ANALYTICS_DIMENSIONS)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    limit = _limit_param(request, 20)
+    if limit is None:
+        return Response(
+            {'error': 'Invalid limit', 'message': 'limit must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        rollups = order_rollups.get(dimension)
+    except Exception as e:
+        logger.error(f"Error fetching {dimension} analytics: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch analytics', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    # Days are kept in date order; the others are ranked best first
+    results = rollups[-limit:] if dimension == 'daily' else rollups[:limit]
+    return Response({'dimension': dimension, 'results': results})